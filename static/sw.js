@@ -1,12 +1,33 @@
 // Wedding App Service Worker
-const CACHE_NAME = 'wedding-app-v1';
-const urlsToCache = [
-    '/',
-    '/static/wedding/css/styles.css',
-    '/static/wedding/css/responsive.css',
-    '/static/wedding/css/table_map_responsive.css',
-    '/static/wedding/js/app.js',
-    '/static/wedding/js/table_map_leaflet.js',
+// self.PRECACHE_MANIFEST dokleja widok /sw.js: pliki statyczne z rewizjami (skrót treści)
+// i wersja cache liczona z tych rewizji - każde wdrożenie ze zmienionymi plikami daje nowy cache
+const PRECACHE = self.PRECACHE_MANIFEST || { version: 'dev', files: [] };
+const CACHE_PREFIX = 'wedding-app-';
+const CACHE_NAME = CACHE_PREFIX + PRECACHE.version;
+// Spis gości ma własny cache - przeżywa zmianę wersji aplikacji i trzyma tylko najnowszą wersję spisu
+const DIRECTORY_CACHE = 'wedding-guest-directory';
+const DIRECTORY_PATH = '/api/guest-directory/';
+// Strony tylko do odczytu: z cache od razu, odświeżane w tle (stale-while-revalidate)
+const PAGES_CACHE = 'wedding-pages';
+const PAGE_PATHS = ['/', '/gallery/', '/table-finder/', '/schedule/', '/menu/'];
+// Odświeżenie strony w tle oznaczamy nagłówkiem - serwer nie zużywa wtedy jednorazowych komunikatów
+// (django messages), tylko odpowiada "no-store", a my usuwamy starą kopię i przeładowujemy kartę
+const REVALIDATE_HEADER = 'X-SW-Revalidate';
+// AJAX/API: najpierw sieć, po NETWORK_TIMEOUT_MS ostatnia zapisana odpowiedź
+const AJAX_CACHE = 'wedding-ajax';
+const NETWORK_TIMEOUT_MS = 3000;
+// Miniatury zdjęć: LRU z księgowaniem w IndexedDB
+const THUMBNAIL_CACHE = 'wedding-thumbnails';
+const THUMBNAIL_DB = 'wedding-thumbnails';
+const THUMBNAIL_MAX_ENTRIES = 300;
+const THUMBNAIL_MAX_TOTAL_BYTES = 40 * 1024 * 1024;
+const THUMBNAIL_MAX_BYTES = 1024 * 1024;
+// Cache, które przeżywają zmianę wersji aplikacji (ich treść nie zależy od wdrożonych plików)
+const PERSISTENT_CACHES = [DIRECTORY_CACHE, PAGES_CACHE, AJAX_CACHE, THUMBNAIL_CACHE];
+// Pliki z precache mają rewizję w wersji cache - tylko one (i CDN) idą z cache bez pytania sieci
+const PRECACHE_PATHS = new Set(PRECACHE.files.map((file) => new URL(file.url, self.location.origin).pathname));
+// Biblioteki z CDN mają wersję w adresie - nie potrzebują rewizji
+const CDN_URLS = [
     'https://cdnjs.cloudflare.com/ajax/libs/bootstrap/4.6.2/css/bootstrap.min.css',
     'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css',
     'https://cdnjs.cloudflare.com/ajax/libs/jquery/3.6.0/jquery.min.js',
@@ -18,97 +39,328 @@ const urlsToCache = [
 // Install event - cache resources
 self.addEventListener('install', (event) => {
     event.waitUntil(
-        caches.open(CACHE_NAME)
-            .then((cache) => {
-                console.log('Caching wedding app resources');
-                return cache.addAll(urlsToCache);
-            })
-            .catch((error) => {
-                console.log('Cache failed:', error);
-            })
+        caches.open(CACHE_NAME).then(async (cache) => {
+            console.log(`Caching wedding app resources (${PRECACHE.version})`);
+            // cache: 'reload' omija cache HTTP przeglądarki - zapisujemy dokładnie wdrożone pliki.
+            // Błąd przy plikach aplikacji przerywa instalację (zostaje poprzednia wersja).
+            await cache.addAll(PRECACHE.files.map((file) => new Request(file.url, { cache: 'reload' })));
+            // Strona główna (fallback offline) zależy od sesji - zapisujemy ją tylko, gdy to właściwa
+            // strona (nie odmowa dostępu z "no-store" ani przekierowanie); CDN bez gwarancji
+            await precacheHomePage(cache).catch((error) => {
+                console.log('Home page precache failed:', error);
+            });
+            await cache.addAll(CDN_URLS).catch((error) => {
+                console.log('Optional precache failed:', error);
+            });
+            // Nowa wersja przejmuje stronę od razu, a nie dopiero po zamknięciu wszystkich kart
+            await self.skipWaiting();
+        })
     );
 });
 
-// Fetch event - serve cached content when offline
+// Fetch event - strategia zależna od rodzaju zasobu
 self.addEventListener('fetch', (event) => {
-    // Skip cross-origin requests and non-GET requests
-    if (!event.request.url.startsWith(self.location.origin) || event.request.method !== 'GET') {
+    const request = event.request;
+    if (request.method !== 'GET') {
         return;
     }
 
-    event.respondWith(
-        caches.match(event.request)
-            .then((response) => {
-                // Return cached version or fetch from network
-                if (response) {
-                    return response;
-                }
+    const url = new URL(request.url);
+    const sameOrigin = url.origin === self.location.origin;
 
-                return fetch(event.request).then((response) => {
-                    // Don't cache invalid responses
-                    if (!response || response.status !== 200 || response.type !== 'basic') {
-                        return response;
-                    }
+    if (request.destination === 'image' && (sameOrigin ? url.pathname.startsWith('/media/') : isCloudinaryUrl(url))) {
+        event.respondWith(thumbnailResponse(request));
+        return;
+    }
+    if (!sameOrigin) {
+        // Biblioteki z CDN mają wersję w adresie - z precache, reszta cross-origin bez zmian
+        if (CDN_URLS.includes(request.url)) {
+            event.respondWith(cacheFirst(request, CACHE_NAME));
+        }
+        return;
+    }
 
-                    // Clone the response
-                    const responseToCache = response.clone();
-
-                    // Cache static assets and important pages
-                    const url = event.request.url;
-                    const shouldCache = (
-                        url.includes('/static/') ||
-                        url.includes('/media/') ||
-                        url.match(/\.(css|js|png|jpg|jpeg|gif|svg|ico|woff|woff2|ttf)$/i) ||
-                        url.endsWith('/') ||
-                        url.includes('/gallery/') ||
-                        url.includes('/table-finder/') ||
-                        url.includes('/schedule/') ||
-                        url.includes('/menu/')
-                    );
-
-                    if (shouldCache) {
-                        caches.open(CACHE_NAME)
-                            .then((cache) => {
-                                cache.put(event.request, responseToCache);
-                            });
-                    }
+    if (url.pathname === DIRECTORY_PATH) {
+        event.respondWith(guestDirectoryResponse(request));
+        return;
+    }
+    if (url.pathname.startsWith('/api/') || url.pathname.startsWith('/ajax/')) {
+        // Strumień SSE obsługuje przeglądarka - service worker nie może go buforować
+        if (request.headers.get('Accept') === 'text/event-stream' || url.pathname === '/api/photos/stream/') {
+            return;
+        }
+        event.respondWith(networkFirst(request, AJAX_CACHE, NETWORK_TIMEOUT_MS));
+        return;
+    }
+    if (url.pathname.startsWith('/static/')) {
+        // Nazwy plików statycznych nie mają skrótu treści - spoza precache najpierw sieć
+        if (PRECACHE_PATHS.has(url.pathname)) {
+            event.respondWith(cacheFirst(request, CACHE_NAME));
+        } else {
+            event.respondWith(networkFirst(request, CACHE_NAME, NETWORK_TIMEOUT_MS));
+        }
+        return;
+    }
+    if (request.mode === 'navigate') {
+        if (PAGE_PATHS.includes(url.pathname)) {
+            event.respondWith(pageResponse(event));
+        } else {
+            event.respondWith(fetch(request).catch(() => offlinePage()));
+        }
+    }
+});
 
-                    return response;
-                }).catch(() => {
-                    // If both cache and network fail, provide fallback
-                    if (event.request.destination === 'document') {
-                        return caches.match('/');
-                    }
-                    
-                    // For images, provide a placeholder
-                    if (event.request.destination === 'image') {
-                        return new Response(
-                            '<svg width="300" height="200" xmlns="http://www.w3.org/2000/svg"><rect width="100%" height="100%" fill="#f5f0e8"/><text x="50%" y="50%" text-anchor="middle" dy=".3em" fill="#8b6f47">Zdjęcie niedostępne</text></svg>',
-                            {
-                                headers: {
-                                    'Content-Type': 'image/svg+xml'
-                                }
-                            }
-                        );
-                    }
-                });
-            })
+function isCloudinaryUrl(url) {
+    return url.hostname === 'res.cloudinary.com';
+}
+
+// Odpowiedzi, których nie zapisujemy: błędy, przekierowania (np. po tokenie) i "no-store"
+function isCacheable(response) {
+    return response && response.status === 200 && !response.redirected
+        && !(response.headers.get('Cache-Control') || '').includes('no-store');
+}
+
+async function cacheFirst(request, cacheName) {
+    const cached = await caches.match(request);
+    if (cached) {
+        return cached;
+    }
+    const response = await fetch(request);
+    if (isCacheable(response)) {
+        const cache = await caches.open(cacheName);
+        await cache.put(request, response.clone());
+    }
+    return response;
+}
+
+// Sieć z limitem czasu - po jego przekroczeniu (albo bez sieci) ostatnia zapisana odpowiedź
+async function networkFirst(request, cacheName, timeoutMs) {
+    const cache = await caches.open(cacheName);
+    const network = fetch(request).then(async (response) => {
+        if (isCacheable(response)) {
+            await cache.put(request, response.clone());
+        }
+        return response;
+    });
+
+    const timeout = new Promise((resolve) => setTimeout(resolve, timeoutMs));
+    const first = await Promise.race([network.catch(() => null), timeout]);
+    if (first) {
+        return first;
+    }
+    const cached = await cache.match(request);
+    if (cached) {
+        network.catch(() => null);  // odpowiedź z sieci i tak trafi do cache
+        return cached;
+    }
+    return network;
+}
+
+async function precacheHomePage(cache) {
+    const response = await fetch(new Request('/', { cache: 'reload', credentials: 'same-origin' }));
+    if (isCacheable(response)) {
+        await cache.put('/', response);
+    }
+}
+
+// Strony: z cache od razu, a w tle pobieramy nową wersję na następną wizytę (stale-while-revalidate).
+// Odpowiedź "no-store" na odświeżenie oznacza komunikat do pokazania (MessagesNoStoreMiddleware) -
+// stara kopia go nie ma, więc ją usuwamy, a karta przeładowuje się już z sieci
+async function pageResponse(event) {
+    const cache = await caches.open(PAGES_CACHE);
+    const cached = await cache.match(event.request);
+    if (!cached) {
+        return networkThenCache(event.request, PAGES_CACHE);
+    }
+
+    const revalidate = fetch(event.request.url, {
+        credentials: 'same-origin',
+        headers: { [REVALIDATE_HEADER]: '1' }
+    }).then(async (response) => {
+        if (isCacheable(response)) {
+            await cache.put(event.request, response);
+        } else if (response.ok) {
+            await cache.delete(event.request);
+            const client = await self.clients.get(event.resultingClientId);
+            if (client) {
+                client.postMessage({ type: 'page-outdated' });
+            }
+        }
+    });
+    event.waitUntil(revalidate.catch(() => null));
+    return cached;
+}
+
+async function networkThenCache(request, cacheName) {
+    const cache = await caches.open(cacheName);
+    try {
+        const response = await fetch(request);
+        if (isCacheable(response)) {
+            await cache.put(request, response.clone());
+        }
+        return response;
+    } catch (error) {
+        return (await cache.match(request)) || offlinePage();
+    }
+}
+
+async function offlinePage() {
+    return (await caches.match('/')) || Response.error();
+}
+
+function offlineImage() {
+    return new Response(
+        '<svg width="300" height="200" xmlns="http://www.w3.org/2000/svg"><rect width="100%" height="100%" fill="#f5f0e8"/><text x="50%" y="50%" text-anchor="middle" dy=".3em" fill="#8b6f47">Zdjęcie niedostępne</text></svg>',
+        {
+            headers: {
+                'Content-Type': 'image/svg+xml'
+            }
+        }
     );
-});
+}
+
+// --- Miniatury: cache LRU ograniczony liczbą i rozmiarem ---------------------
+// Cache API nie pamięta, kiedy ostatnio użyto wpisu, więc rozmiar i czas dostępu
+// każdej miniatury trzymamy w IndexedDB i stamtąd wybieramy wpisy do usunięcia.
+
+async function thumbnailResponse(request) {
+    const cache = await caches.open(THUMBNAIL_CACHE);
+    const cached = await cache.match(request);
+    if (cached) {
+        touchThumbnail(request.url).catch(() => null);
+        return cached;
+    }
+
+    let response;
+    try {
+        // Zdjęcia z Cloudinary pobieramy w trybie CORS - odpowiedź "opaque" ma nieznany rozmiar,
+        // a przeglądarka liczy ją do limitu miejsca jako kilka MB
+        response = await fetch(request.url, { mode: 'cors', credentials: 'omit' });
+    } catch (error) {
+        try {
+            return await fetch(request);
+        } catch (networkError) {
+            return offlineImage();
+        }
+    }
+
+    if (isCacheable(response)) {
+        const blob = await response.clone().blob();
+        // Pełnowymiarowe zdjęcia (np. lokalne /media/ bez miniatur) idą tylko z sieci
+        if (blob.size <= THUMBNAIL_MAX_BYTES) {
+            await cache.put(request, response.clone());
+            await recordThumbnail(request.url, blob.size);
+            await evictThumbnails(cache);
+        }
+    }
+    return response;
+}
+
+function openThumbnailDb() {
+    return new Promise((resolve, reject) => {
+        const open = indexedDB.open(THUMBNAIL_DB, 1);
+        open.onupgradeneeded = () => {
+            const store = open.result.createObjectStore('entries', { keyPath: 'url' });
+            store.createIndex('lastAccess', 'lastAccess');
+        };
+        open.onsuccess = () => resolve(open.result);
+        open.onerror = () => reject(open.error);
+    });
+}
+
+async function thumbnailStore(mode, callback) {
+    const db = await openThumbnailDb();
+    return new Promise((resolve, reject) => {
+        const transaction = db.transaction('entries', mode);
+        const result = callback(transaction.objectStore('entries'));
+        transaction.oncomplete = () => {
+            db.close();
+            resolve(result && 'result' in result ? result.result : undefined);
+        };
+        transaction.onerror = () => {
+            db.close();
+            reject(transaction.error);
+        };
+    });
+}
 
-// Activate event - clean up old caches
+function recordThumbnail(url, size) {
+    return thumbnailStore('readwrite', (store) => store.put({ url, size, lastAccess: Date.now() }));
+}
+
+function touchThumbnail(url) {
+    return thumbnailStore('readwrite', (store) => {
+        const get = store.get(url);
+        get.onsuccess = () => {
+            if (get.result) {
+                get.result.lastAccess = Date.now();
+                store.put(get.result);
+            }
+        };
+    });
+}
+
+// Usuwa najdawniej używane miniatury, dopóki cache przekracza limit liczby lub rozmiaru
+async function evictThumbnails(cache) {
+    const entries = await thumbnailStore('readonly', (store) => store.index('lastAccess').getAll());
+    let count = entries.length;
+    let bytes = entries.reduce((total, entry) => total + entry.size, 0);
+    const evicted = [];
+
+    for (const entry of entries) {  // rosnąco po lastAccess - najstarsze pierwsze
+        if (count <= THUMBNAIL_MAX_ENTRIES && bytes <= THUMBNAIL_MAX_TOTAL_BYTES) {
+            break;
+        }
+        evicted.push(entry.url);
+        count -= 1;
+        bytes -= entry.size;
+    }
+    if (evicted.length === 0) {
+        return;
+    }
+
+    await Promise.all(evicted.map((url) => cache.delete(url)));
+    await thumbnailStore('readwrite', (store) => evicted.forEach((url) => store.delete(url)));
+}
+
+// Spis gości: adres z ?v=<wersja> z cache, nowa wersja z sieci (stare usuwamy), bez sieci - ostatni spis
+async function guestDirectoryResponse(request) {
+    const cache = await caches.open(DIRECTORY_CACHE);
+    const cached = await cache.match(request);
+    if (cached) {
+        return cached;
+    }
+
+    try {
+        const response = await fetch(request);
+        if (response.ok) {
+            const keys = await cache.keys();
+            await Promise.all(keys.map((key) => cache.delete(key)));
+            await cache.put(request, response.clone());
+        }
+        return response;
+    } catch (error) {
+        const fallback = await cache.match(request, { ignoreSearch: true });
+        if (fallback) {
+            return fallback;
+        }
+        throw error;
+    }
+}
+
+// Activate event - clean up old caches (poprzednie wersje aplikacji i stare nazwy cache)
 self.addEventListener('activate', (event) => {
     event.waitUntil(
         caches.keys().then((cacheNames) => {
             return Promise.all(
                 cacheNames.map((cacheName) => {
-                    if (cacheName !== CACHE_NAME) {
+                    if (cacheName !== CACHE_NAME && !PERSISTENT_CACHES.includes(cacheName)) {
                         console.log('Deleting old cache:', cacheName);
                         return caches.delete(cacheName);
                     }
                 })
             );
-        })
+        }).then(() => self.clients.claim())
     );
 });
 
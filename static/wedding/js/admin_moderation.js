@@ -0,0 +1,331 @@
+// Kolejka moderacji zdjęć z klawiatury - decyzje zbierane lokalnie i wysyłane paczkami
+
+const FLUSH_DELAY = 1500;
+const FLUSH_SIZE = 50;
+const PREFETCH_AHEAD = 30;
+
+class ModerationQueue {
+    constructor(element, initial) {
+        this.element = element;
+        this.queueUrl = element.dataset.queueUrl;
+        this.decisionsUrl = element.dataset.decisionsUrl;
+        this.csrfToken = element.dataset.csrfToken;
+
+        this.grid = element.querySelector('.moderation-grid');
+        this.pendingElement = element.querySelector('.moderation-pending');
+        this.statusElement = element.querySelector('.moderation-status');
+        this.emptyElement = element.querySelector('.moderation-empty');
+        this.preview = element.querySelector('.moderation-preview');
+
+        this.photos = new Map();        // id -> dane zdjęcia z API
+        this.decisions = new Map();     // id -> akcja, jeszcze niewysłane
+        this.sending = new Map();       // id -> akcja, w trakcie wysyłania
+        this.history = [];              // kolejność decyzji do cofania
+        this.current = null;
+        this.pendingCount = parseInt(this.pendingElement.textContent, 10) || 0;
+        this.nextAfter = initial.next_after;
+        this.hasMore = initial.has_more;
+        this.loading = null;
+        this.flushTimer = null;
+
+        this.append(initial.photos);
+    }
+
+    start() {
+        document.addEventListener('keydown', event => this.handleKey(event));
+        this.grid.addEventListener('click', event => {
+            const card = event.target.closest('.moderation-card');
+            if (card) {
+                this.select(card);
+            }
+        });
+        this.preview.addEventListener('click', () => this.preview.classList.remove('open'));
+        // Niewysłane decyzje przy zamknięciu karty - keepalive pozwala dokończyć żądanie
+        window.addEventListener('pagehide', () => this.flush(true));
+        document.addEventListener('visibilitychange', () => {
+            if (document.visibilityState === 'hidden') {
+                this.flush(true);
+            }
+        });
+
+        this.select(this.nextUndecided(null));
+        this.prefetch();
+    }
+
+    append(photos) {
+        const fragment = document.createDocumentFragment();
+        photos.forEach(photo => {
+            if (this.photos.has(photo.id)) {
+                return;
+            }
+            this.photos.set(photo.id, photo);
+
+            const card = document.createElement('div');
+            card.className = 'moderation-card';
+            card.dataset.id = photo.id;
+
+            // Obrazki dodajemy od razu (bez loading="lazy") - następna strona ładuje się, zanim do niej dojdziemy
+            const img = document.createElement('img');
+            img.src = photo.thumbnail_url;
+            img.alt = photo.title;
+            img.decoding = 'async';
+            card.appendChild(img);
+
+            const caption = document.createElement('div');
+            caption.className = 'moderation-caption';
+            caption.textContent = `${photo.uploader} · ${photo.category}`;
+            caption.title = photo.title;
+            card.appendChild(caption);
+
+            if (photo.duplicate_of) {
+                const badge = document.createElement('span');
+                badge.className = 'moderation-duplicate';
+                badge.textContent = `♊ #${photo.duplicate_of}`;
+                card.appendChild(badge);
+            }
+            fragment.appendChild(card);
+        });
+        this.grid.appendChild(fragment);
+        this.updateEmpty();
+    }
+
+    handleKey(event) {
+        if (event.ctrlKey || event.metaKey || event.altKey || event.target.matches('input, textarea, select')) {
+            return;
+        }
+        const key = event.key.toLowerCase();
+        let handled = true;
+
+        if (key === 'a' && event.shiftKey) {
+            this.decideVisible('approve');
+        } else if (key === 'a' || key === 'enter') {
+            this.decide('approve');
+        } else if (key === 'f') {
+            this.decide('feature');
+        } else if (key === 'r' || key === 'x' || key === 'delete') {
+            this.decide('reject');
+        } else if (key === 'arrowright' || key === 'j') {
+            this.select(this.current && this.current.nextElementSibling);
+        } else if (key === 'arrowleft' || key === 'k') {
+            this.select(this.current && this.current.previousElementSibling);
+        } else if (key === 'z' || key === 'backspace') {
+            this.undo();
+        } else if (key === ' ') {
+            this.togglePreview();
+        } else if (key === 'escape') {
+            this.preview.classList.remove('open');
+        } else {
+            handled = false;
+        }
+
+        if (handled) {
+            event.preventDefault();
+        }
+    }
+
+    select(card) {
+        if (!card) {
+            return;
+        }
+        if (this.current) {
+            this.current.classList.remove('current');
+        }
+        this.current = card;
+        card.classList.add('current');
+        card.scrollIntoView({block: 'nearest'});
+        if (this.preview.classList.contains('open')) {
+            this.showPreview();
+        }
+    }
+
+    nextUndecided(card) {
+        let next = card ? card.nextElementSibling : this.grid.firstElementChild;
+        while (next && next.classList.contains('decided')) {
+            next = next.nextElementSibling;
+        }
+        return next;
+    }
+
+    decide(action, card = this.current) {
+        if (!card) {
+            return;
+        }
+        const id = parseInt(card.dataset.id, 10);
+        this.mark(card, action);
+        this.decisions.set(id, action);
+        this.history.push(id);
+
+        if (card === this.current) {
+            this.select(this.nextUndecided(card) || card);
+        }
+        this.scheduleFlush();
+        this.prefetch();
+    }
+
+    decideVisible(action) {
+        // Wszystkie niezdecydowane karty widoczne na ekranie - szybkie zatwierdzenie oczywistych zdjęć
+        const viewport = window.innerHeight;
+        this.grid.querySelectorAll('.moderation-card:not(.decided)').forEach(card => {
+            const rect = card.getBoundingClientRect();
+            if (rect.bottom > 0 && rect.top < viewport) {
+                this.decide(action, card);
+            }
+        });
+        this.select(this.nextUndecided(this.current) || this.current);
+    }
+
+    mark(card, action) {
+        card.classList.remove('decided-approve', 'decided-feature', 'decided-reject');
+        card.classList.add('decided', `decided-${action}`);
+    }
+
+    undo() {
+        // Cofnąć można tylko decyzje, które nie poszły jeszcze do serwera
+        while (this.history.length) {
+            const id = this.history.pop();
+            if (!this.decisions.has(id)) {
+                continue;
+            }
+            this.decisions.delete(id);
+            const card = this.grid.querySelector(`.moderation-card[data-id="${id}"]`);
+            if (card) {
+                card.classList.remove('decided', 'decided-approve', 'decided-feature', 'decided-reject');
+                this.select(card);
+            }
+            return;
+        }
+        this.setStatus('Nie ma czego cofnąć - zapisane decyzje zmienisz w panelu admina');
+    }
+
+    scheduleFlush() {
+        this.updateCount();
+        if (this.decisions.size >= FLUSH_SIZE) {
+            this.flush();
+            return;
+        }
+        clearTimeout(this.flushTimer);
+        this.flushTimer = setTimeout(() => this.flush(), FLUSH_DELAY);
+    }
+
+    async flush(keepalive = false) {
+        clearTimeout(this.flushTimer);
+        if (this.decisions.size === 0 || (this.sending.size > 0 && !keepalive)) {
+            return;
+        }
+
+        const batch = new Map(this.decisions);
+        this.decisions.clear();
+        batch.forEach((action, id) => this.sending.set(id, action));
+
+        try {
+            const response = await fetch(this.decisionsUrl, {
+                method: 'POST',
+                credentials: 'same-origin',
+                keepalive,
+                headers: {'Content-Type': 'application/json', 'X-CSRFToken': this.csrfToken},
+                body: JSON.stringify({
+                    decisions: [...batch].map(([id, action]) => ({id, action})),
+                }),
+            });
+            const data = await response.json();
+            if (!response.ok || !data.success) {
+                throw new Error(data.message || `HTTP ${response.status}`);
+            }
+            batch.forEach((_action, id) => this.removeCard(id));
+            this.pendingCount = data.pending_count;
+            this.setStatus(`Zapisano ${batch.size}`);
+            this.prefetch();
+        } catch (error) {
+            console.log('Saving moderation decisions failed:', error);
+            // Decyzje wracają do kolejki (chyba że w międzyczasie zmieniono je ponownie)
+            batch.forEach((action, id) => {
+                if (!this.decisions.has(id)) {
+                    this.decisions.set(id, action);
+                }
+            });
+            this.setStatus('Błąd zapisu - ponowię za chwilę');
+            this.flushTimer = setTimeout(() => this.flush(), FLUSH_DELAY * 4);
+        } finally {
+            batch.forEach((_action, id) => this.sending.delete(id));
+            this.updateCount();
+            if (this.decisions.size >= FLUSH_SIZE) {
+                this.flush();
+            }
+        }
+    }
+
+    removeCard(id) {
+        // Zapisane karty znikają z siatki, żeby DOM nie rósł przy setkach zdjęć
+        if (this.decisions.has(id)) {
+            return;
+        }
+        const card = this.grid.querySelector(`.moderation-card[data-id="${id}"]`);
+        if (!card) {
+            return;
+        }
+        if (card === this.current) {
+            this.current = null;
+            this.select(this.nextUndecided(card) || card.previousElementSibling);
+        }
+        card.remove();
+        this.photos.delete(id);
+        this.updateEmpty();
+    }
+
+    prefetch() {
+        if (!this.hasMore || this.loading) {
+            return;
+        }
+        const ahead = this.grid.querySelectorAll('.moderation-card:not(.decided)').length;
+        if (ahead > PREFETCH_AHEAD) {
+            return;
+        }
+
+        this.loading = fetch(`${this.queueUrl}?after=${this.nextAfter}`, {credentials: 'same-origin'})
+            .then(response => response.json())
+            .then(page => {
+                this.nextAfter = page.next_after;
+                this.hasMore = page.has_more;
+                this.append(page.photos);
+                if (!this.current) {
+                    this.select(this.nextUndecided(null));
+                }
+            })
+            .catch(error => console.log('Loading moderation queue failed:', error))
+            .finally(() => {
+                this.loading = null;
+            });
+    }
+
+    togglePreview() {
+        if (this.preview.classList.contains('open')) {
+            this.preview.classList.remove('open');
+        } else {
+            this.showPreview();
+        }
+    }
+
+    showPreview() {
+        const photo = this.current && this.photos.get(parseInt(this.current.dataset.id, 10));
+        if (!photo) {
+            return;
+        }
+        this.preview.querySelector('img').src = photo.full_url;
+        this.preview.classList.add('open');
+    }
+
+    updateCount() {
+        // Liczba z serwera minus decyzje, których serwer jeszcze nie zna
+        this.pendingElement.textContent = Math.max(0, this.pendingCount - this.decisions.size - this.sending.size);
+    }
+
+    updateEmpty() {
+        this.emptyElement.style.display = this.grid.children.length === 0 && !this.hasMore ? '' : 'none';
+    }
+
+    setStatus(message) {
+        this.statusElement.textContent = message;
+    }
+}
+
+window.ModerationQueue = ModerationQueue;
@@ -94,54 +94,6 @@ $(document).ready(function() {
         }
     });
     
-    // Infinite scroll for gallery
-    if ($('.photo-grid').length) {
-        let loading = false;
-        let page = 2;
-        const category = new URLSearchParams(window.location.search).get('category') || '';
-        
-        $(window).scroll(function() {
-            if (loading) return;
-            
-            if ($(window).scrollTop() + $(window).height() > $(document).height() - 1000) {
-                loading = true;
-                $('.loading-indicator').show();
-                
-                $.get('/api/photos/', {page: page, category: category})
-                    .done(function(data) {
-                        if (data.photos.length > 0) {
-                            data.photos.forEach(function(photo) {
-                                const photoHtml = `
-                                    <div class="photo-item" data-toggle="modal" data-target="#photoModal${photo.id}">
-                                        <img src="${photo.image_url || photo.full_image_url || '/static/wedding/images/no-photo.jpg'}" 
-                                             alt="${photo.title}" 
-                                             loading="lazy"
-                                             onerror="this.onerror=null; this.src='${photo.full_image_url || '/static/wedding/images/no-photo.jpg'}';">
-                                        <div class="photo-overlay">
-                                            <h6>${photo.title}</h6>
-                                            <small>${photo.uploaded_by}</small>
-                                        </div>
-                                    </div>
-                                `;
-                                $('.photo-grid').append(photoHtml);
-                            });
-                            page++;
-                        }
-                        
-                        if (!data.has_next) {
-                            $('.loading-indicator').html('Wszystkie zdjęcia zostały załadowane').show();
-                        }
-                    })
-                    .always(function() {
-                        loading = false;
-                        if ($('.photo-grid .photo-item').length > 0) {
-                            $('.loading-indicator').hide();
-                        }
-                    });
-            }
-        });
-    }
-    
     // Progressive Web App features
     if ('serviceWorker' in navigator) {
         navigator.serviceWorker.register('/sw.js')
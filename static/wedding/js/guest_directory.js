@@ -0,0 +1,102 @@
+// Spis gości w przeglądarce - wyszukiwanie stolika bez zapytań do serwera (działa także offline)
+
+class GuestDirectory {
+    constructor(versionUrl, directoryUrl) {
+        this.versionUrl = versionUrl;
+        this.directoryUrl = directoryUrl;
+        this.data = null;
+        this.tokenKeys = [];
+    }
+
+    /**
+     * Sprawdza wersję spisu i pobiera go tylko, gdy się zmieniła. Adres z numerem wersji
+     * service worker trzyma w cache, a bez sieci oddaje ostatnio zapisany spis.
+     */
+    async load() {
+        let url = this.directoryUrl;
+        try {
+            const response = await fetch(this.versionUrl, {credentials: 'same-origin', cache: 'no-store'});
+            const info = await response.json();
+            if (this.data && this.data.version === info.version) {
+                return this.data;
+            }
+            url = info.url;
+        } catch (error) {
+            // Brak sieci - spróbujemy spisu z cache service workera
+            console.log('Guest directory version check failed:', error);
+        }
+
+        const response = await fetch(url, {credentials: 'same-origin'});
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+        this.data = await response.json();
+        this.tokenKeys = Object.keys(this.data.tokens);
+        return this.data;
+    }
+
+    get ready() {
+        return this.data !== null;
+    }
+
+    // Ta sama normalizacja co normalize_tokens() w wedding/guest_directory.py
+    static normalize(text) {
+        const folded = (text || '')
+            .replace(/[\u0142\u0141]/g, 'l').replace(/\u00f8/g, 'o').replace(/\u0111/g, 'd').replace(/\u00df/g, 'ss')
+            .normalize('NFKD')
+            .replace(/[\u0300-\u036f]/g, '')
+            .toLowerCase();
+        return folded.split(/[^0-9a-z]+/).filter(token => token);
+    }
+
+    /**
+     * Goście pasujący do zapytania: każde słowo zapytania musi być początkiem któregoś
+     * słowa imienia lub nazwiska. Najpierw pełne dopasowania, potem alfabetycznie.
+     */
+    search(query, limit = 10) {
+        if (!this.data) {
+            return [];
+        }
+        const words = GuestDirectory.normalize(query);
+        if (words.length === 0) {
+            return [];
+        }
+
+        let candidates = null;
+        const exactHits = new Map();
+        words.forEach(word => {
+            const matched = new Set();
+            this.tokenKeys.forEach(token => {
+                if (token.startsWith(word)) {
+                    this.data.tokens[token].forEach(index => {
+                        matched.add(index);
+                        if (token === word) {
+                            exactHits.set(index, (exactHits.get(index) || 0) + 1);
+                        }
+                    });
+                }
+            });
+            candidates = candidates === null
+                ? matched
+                : new Set([...candidates].filter(index => matched.has(index)));
+        });
+
+        return [...candidates]
+            .sort((a, b) => (exactHits.get(b) || 0) - (exactHits.get(a) || 0) || a - b)
+            .slice(0, limit)
+            .map(index => this.guest(index));
+    }
+
+    guest(index) {
+        const [id, name, tableNumber, chairPosition] = this.data.guests[index];
+        return {
+            id,
+            name,
+            table_number: tableNumber,
+            table_name: tableNumber ? this.data.tables[tableNumber] || '' : '',
+            chair_position: chairPosition,
+        };
+    }
+}
+
+window.GuestDirectory = GuestDirectory;
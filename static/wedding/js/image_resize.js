@@ -0,0 +1,124 @@
+// Zmniejszanie zdjęć w przeglądarce przed wysłaniem - 12 Mpx oryginał to kilka MB na słabym Wi-Fi sali
+
+const ImageResize = {
+    /**
+     * Zwraca plik zmniejszony do maxSize px (dłuższy bok) albo null, gdy przeglądarka nie umie
+     * go zdekodować (np. HEIC) - wtedy wysyłamy oryginał, a zmniejszy go serwer.
+     */
+    async downscale(file, maxSize, quality) {
+        let bitmap;
+        try {
+            bitmap = await this.decode(file);
+        } catch (error) {
+            console.log(`Cannot decode ${file.name} in the browser:`, error);
+            return null;
+        }
+
+        const scale = Math.min(1, maxSize / Math.max(bitmap.width, bitmap.height));
+        const width = Math.round(bitmap.width * scale);
+        const height = Math.round(bitmap.height * scale);
+        const type = file.type === 'image/png' ? 'image/png' : 'image/jpeg';
+
+        const canvas = document.createElement('canvas');
+        canvas.width = width;
+        canvas.height = height;
+        const context = canvas.getContext('2d');
+        context.imageSmoothingQuality = 'high';
+        context.drawImage(bitmap, 0, 0, width, height);
+        if (bitmap.close) {
+            bitmap.close();
+        }
+
+        let blob = await new Promise(resolve => canvas.toBlob(resolve, type, quality));
+        if (!blob) {
+            return null;
+        }
+        if (type === 'image/jpeg' && file.type === 'image/jpeg') {
+            blob = await this.copyExif(file, blob);
+        }
+        // Mniejsze zdjęcie, które po ponownej kompresji urosło - zostawiamy oryginał
+        if (scale === 1 && blob.size >= file.size) {
+            return file;
+        }
+
+        const name = type === 'image/jpeg' ? file.name.replace(/\.[^.]+$/, '') + '.jpg' : file.name;
+        return new File([blob], name, {type, lastModified: file.lastModified});
+    },
+
+    // Obrót z EXIF (Orientation) nakłada już dekoder - canvas dostaje zdjęcie we właściwej pozycji
+    async decode(file) {
+        if (window.createImageBitmap) {
+            return createImageBitmap(file, {imageOrientation: 'from-image'});
+        }
+        const url = URL.createObjectURL(file);
+        try {
+            const img = new Image();
+            img.src = url;
+            await img.decode();
+            return img;
+        } finally {
+            URL.revokeObjectURL(url);
+        }
+    },
+
+    /**
+     * Canvas gubi metadane - przenosimy segment EXIF (data wykonania, aparat) z oryginału.
+     * Orientation ustawiamy na 1, bo obrót jest już zapisany w pikselach.
+     */
+    async copyExif(original, resized) {
+        const source = new Uint8Array(await original.slice(0, 256 * 1024).arrayBuffer());
+        const segment = this.findExifSegment(source);
+        if (!segment) {
+            return resized;
+        }
+        this.resetOrientation(segment);
+
+        const target = new Uint8Array(await resized.arrayBuffer());
+        // Wstawiamy APP1 zaraz po znaczniku SOI (FFD8)
+        return new Blob([target.slice(0, 2), segment, target.slice(2)], {type: resized.type});
+    },
+
+    findExifSegment(bytes) {
+        if (bytes[0] !== 0xFF || bytes[1] !== 0xD8) {
+            return null;
+        }
+        let offset = 2;
+        while (offset + 4 <= bytes.length && bytes[offset] === 0xFF) {
+            const marker = bytes[offset + 1];
+            const length = (bytes[offset + 2] << 8) | bytes[offset + 3];
+            if (marker === 0xDA) {  // początek danych obrazu - dalej nie ma metadanych
+                return null;
+            }
+            const isExif = marker === 0xE1
+                && String.fromCharCode(...bytes.slice(offset + 4, offset + 8)) === 'Exif';
+            if (isExif) {
+                return offset + 2 + length <= bytes.length ? bytes.slice(offset, offset + 2 + length) : null;
+            }
+            offset += 2 + length;
+        }
+        return null;
+    },
+
+    resetOrientation(segment) {
+        const tiff = 10;  // FFE1 + długość (2) + "Exif\0\0" (6)
+        const view = new DataView(segment.buffer, segment.byteOffset, segment.byteLength);
+        const little = view.getUint16(tiff) === 0x4949;  // "II" - little endian
+        const ifd = tiff + view.getUint32(tiff + 4, little);
+        if (ifd + 2 > segment.length) {
+            return;
+        }
+        const entries = view.getUint16(ifd, little);
+        for (let i = 0; i < entries; i++) {
+            const entry = ifd + 2 + i * 12;
+            if (entry + 12 > segment.length) {
+                return;
+            }
+            if (view.getUint16(entry, little) === 0x0112) {  // Orientation (SHORT)
+                view.setUint16(entry + 8, 1, little);
+                return;
+            }
+        }
+    },
+};
+
+window.ImageResize = ImageResize;
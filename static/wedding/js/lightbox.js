@@ -0,0 +1,319 @@
+// Jeden wspólny lightbox dla siatek zdjęć - zamiast osobnego modala z pełnymi adresami dla każdego zdjęcia.
+// Strona podaje dane zdjęć (json_script), pełne zdjęcie pobieramy dopiero po otwarciu, a sąsiednie z wyprzedzeniem.
+// Siatka z data-api-url pozwala przechodzić dalej (i wstecz) poza bieżącą stronę przez /api/photos/.
+
+const SWIPE_DISTANCE = 50;
+const LOAD_MARGIN = 2;      // tyle zdjęć przed końcem listy dociągamy kolejną stronę
+
+class PhotoCollection {
+    constructor(grid, photos) {
+        this.grid = grid;
+        this.photos = photos;
+        this.ids = new Set(photos.map(photo => photo.id));
+        this.apiUrl = grid.dataset.apiUrl || '';
+        this.category = grid.dataset.category || '';
+        this.sort = grid.dataset.sort || '';
+        this.loading = {next: null, previous: null};
+
+        // Parametry API sąsiednich stron - null, gdy w tym kierunku nie ma więcej zdjęć
+        const page = parseInt(grid.dataset.page, 10) || 0;
+        if (!this.apiUrl) {
+            this.edges = {next: null, previous: null};
+        } else if (this.sort === 'taken') {
+            this.edges = {
+                next: grid.dataset.nextCursor ? {after: grid.dataset.nextCursor} : null,
+                previous: grid.dataset.previousCursor ? {after: grid.dataset.previousCursor, order: 'desc'} : null,
+            };
+        } else {
+            this.edges = {
+                next: page && grid.dataset.hasNext ? {page: page + 1} : null,
+                previous: page > 1 ? {page: page - 1} : null,
+            };
+        }
+    }
+
+    indexOf(id) {
+        return this.photos.findIndex(photo => photo.id === id);
+    }
+
+    hasMore(direction) {
+        return this.edges[direction] !== null;
+    }
+
+    // Dociąga sąsiednią stronę i dopisuje ją na końcu albo na początku listy
+    load(direction) {
+        if (!this.hasMore(direction)) {
+            return Promise.resolve();
+        }
+        if (this.loading[direction]) {
+            return this.loading[direction];
+        }
+
+        const params = new URLSearchParams(Object.assign({}, this.edges[direction]));
+        if (this.category) {
+            params.set('category', this.category);
+        }
+        if (this.sort) {
+            params.set('sort', this.sort);
+        }
+
+        this.loading[direction] = fetch(`${this.apiUrl}?${params}`, {credentials: 'same-origin'})
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`HTTP ${response.status}`);
+                }
+                return response.json();
+            })
+            .then(data => {
+                this.edges[direction] = this.nextEdge(data, direction);
+                // Nowe zdjęcia przesuwają numerowane strony - pomijamy te, które już mamy
+                let photos = data.photos.filter(photo => !this.ids.has(photo.id));
+                photos.forEach(photo => this.ids.add(photo.id));
+                if (direction === 'next') {
+                    this.photos.push(...photos);
+                } else {
+                    // ?order=desc zwraca je od najbliższego
+                    this.photos.unshift(...(this.sort === 'taken' ? photos.reverse() : photos));
+                }
+            })
+            .catch(error => console.log('Lightbox page loading failed:', error))
+            .finally(() => {
+                this.loading[direction] = null;
+            });
+        return this.loading[direction];
+    }
+
+    nextEdge(data, direction) {
+        if (this.sort === 'taken') {
+            if (!data.next_cursor) {
+                return null;
+            }
+            return direction === 'next' ? {after: data.next_cursor} : {after: data.next_cursor, order: 'desc'};
+        }
+        if (direction === 'next') {
+            return data.has_next ? {page: data.current_page + 1} : null;
+        }
+        return data.has_previous ? {page: data.current_page - 1} : null;
+    }
+}
+
+class PhotoLightbox {
+    constructor(element) {
+        this.element = element;
+        this.stage = element.querySelector('.lightbox-stage');
+        this.image = element.querySelector('.lightbox-image');
+        this.title = element.querySelector('.lightbox-title');
+        this.description = element.querySelector('.lightbox-description');
+        this.uploader = element.querySelector('.lightbox-uploader');
+        this.date = element.querySelector('.lightbox-date');
+        this.dateIcon = element.querySelector('.lightbox-date-icon');
+        this.category = element.querySelector('.lightbox-category');
+        this.download = element.querySelector('.lightbox-download');
+        this.prevButton = element.querySelector('.lightbox-prev');
+        this.nextButton = element.querySelector('.lightbox-next');
+
+        this.collection = null;
+        this.current = null;
+        this.index = 0;
+        this.isOpen = false;
+        this.prefetched = new Set();
+        this.touchStart = null;
+    }
+
+    start() {
+        document.querySelectorAll('.photo-grid[data-lightbox]').forEach(grid => {
+            const data = document.getElementById(grid.dataset.lightbox);
+            const collection = new PhotoCollection(grid, data ? JSON.parse(data.textContent) : []);
+            grid.addEventListener('click', event => this.openFromTile(collection, event));
+            grid.addEventListener('keydown', event => {
+                if (event.key === 'Enter') {
+                    this.openFromTile(collection, event);
+                }
+            });
+        });
+
+        this.prevButton.addEventListener('click', () => this.step(-1));
+        this.nextButton.addEventListener('click', () => this.step(1));
+        document.addEventListener('keydown', event => this.handleKey(event));
+        this.stage.addEventListener('touchstart', event => {
+            const touch = event.changedTouches[0];
+            this.touchStart = {x: touch.clientX, y: touch.clientY};
+        }, {passive: true});
+        this.stage.addEventListener('touchend', event => this.handleSwipe(event), {passive: true});
+
+        $(this.element)
+            .on('shown.bs.modal', () => { this.isOpen = true; })
+            .on('hidden.bs.modal', () => {
+                this.isOpen = false;
+                this.image.removeAttribute('src');
+            });
+    }
+
+    openFromTile(collection, event) {
+        const tile = event.target.closest('.photo-item[data-photo-id]');
+        if (!tile) {
+            return;
+        }
+        const index = collection.indexOf(parseInt(tile.dataset.photoId, 10));
+        if (index < 0) {
+            return;
+        }
+        event.preventDefault();
+        this.collection = collection;
+        this.show(index);
+        $(this.element).modal('show');
+    }
+
+    show(index) {
+        const photo = this.collection.photos[index];
+        this.index = index;
+        this.current = photo;
+
+        this.title.textContent = photo.title;
+        this.description.textContent = photo.description || '';
+        this.description.style.display = photo.description ? '' : 'none';
+        this.uploader.textContent = photo.uploaded_by;
+        this.date.textContent = this.formatDate(photo.taken_at || photo.upload_date);
+        this.dateIcon.className = `fas ${photo.taken_at ? 'fa-camera' : 'fa-clock'} lightbox-date-icon`;
+        this.category.textContent = photo.category_display || '';
+        this.category.style.display = photo.category_display ? '' : 'none';
+        this.download.href = photo.full_image_url || '#';
+        this.download.style.display = photo.full_image_url ? '' : 'none';
+
+        this.showImage(photo);
+        this.updateButtons();
+        this.prefetchAround();
+    }
+
+    showImage(photo) {
+        // Kolor i podgląd 16 px pod obrazem, zanim cokolwiek dojdzie
+        this.stage.style.backgroundColor = photo.dominant_color || '';
+        this.stage.style.backgroundImage = photo.placeholder ? `url(${photo.placeholder})` : '';
+        this.image.alt = photo.title;
+        if (photo.width && photo.height) {
+            this.image.width = photo.width;
+            this.image.height = photo.height;
+        } else {
+            this.image.removeAttribute('width');
+            this.image.removeAttribute('height');
+        }
+        this.image.onerror = () => {
+            this.image.onerror = null;
+            this.image.src = '/static/wedding/images/no-photo.jpg';
+        };
+
+        const fullUrl = photo.full_image_url;
+        if (!fullUrl) {
+            this.image.src = '/static/wedding/images/no-photo.jpg';
+            return;
+        }
+        if (this.prefetched.has(fullUrl) || !photo.image_url || photo.image_url === fullUrl) {
+            this.prefetched.add(fullUrl);
+            this.image.src = fullUrl;
+            return;
+        }
+        // Zdjęcie z kafelka jest już w cache - pokazujemy je od razu i podmieniamy na pełne po pobraniu
+        this.image.src = photo.image_url;
+        this.prefetched.add(fullUrl);
+        const full = new Image();
+        full.onload = () => {
+            if (this.current === photo) {
+                this.image.src = fullUrl;
+            }
+        };
+        full.src = fullUrl;
+    }
+
+    prefetchAround() {
+        const photos = this.collection.photos;
+        [this.index + 1, this.index - 1].forEach(index => {
+            const photo = photos[index];
+            if (photo && photo.full_image_url && !this.prefetched.has(photo.full_image_url)) {
+                this.prefetched.add(photo.full_image_url);
+                new Image().src = photo.full_image_url;
+            }
+        });
+
+        if (this.index >= photos.length - 1 - LOAD_MARGIN) {
+            this.collection.load('next').then(() => this.updateButtons());
+        }
+        if (this.index <= LOAD_MARGIN) {
+            this.collection.load('previous').then(() => this.updateButtons());
+        }
+    }
+
+    // Zdjęcia dopisane na początku listy przesuwają indeks bieżącego
+    syncIndex() {
+        this.index = this.collection.photos.indexOf(this.current);
+    }
+
+    step(delta) {
+        if (!this.collection) {
+            return;
+        }
+        this.syncIndex();
+        const target = this.index + delta;
+        if (target >= 0 && target < this.collection.photos.length) {
+            this.show(target);
+            return;
+        }
+        // Koniec wczytanych zdjęć - dociągamy sąsiednią stronę i dopiero wtedy przechodzimy
+        const direction = delta > 0 ? 'next' : 'previous';
+        this.collection.load(direction).then(() => {
+            this.syncIndex();
+            const index = this.index + delta;
+            if (index >= 0 && index < this.collection.photos.length) {
+                this.show(index);
+            }
+        });
+    }
+
+    updateButtons() {
+        this.syncIndex();
+        const photos = this.collection.photos;
+        this.prevButton.disabled = this.index <= 0 && !this.collection.hasMore('previous');
+        this.nextButton.disabled = this.index >= photos.length - 1 && !this.collection.hasMore('next');
+    }
+
+    handleKey(event) {
+        if (!this.isOpen) {
+            return;
+        }
+        if (event.key === 'ArrowRight') {
+            event.preventDefault();
+            this.step(1);
+        } else if (event.key === 'ArrowLeft') {
+            event.preventDefault();
+            this.step(-1);
+        }
+    }
+
+    handleSwipe(event) {
+        if (!this.touchStart) {
+            return;
+        }
+        const touch = event.changedTouches[0];
+        const dx = touch.clientX - this.touchStart.x;
+        const dy = touch.clientY - this.touchStart.y;
+        this.touchStart = null;
+        if (Math.abs(dx) >= SWIPE_DISTANCE && Math.abs(dx) > Math.abs(dy)) {
+            this.step(dx < 0 ? 1 : -1);
+        }
+    }
+
+    formatDate(value) {
+        if (!value) {
+            return '';
+        }
+        return new Date(value).toLocaleString('pl-PL', {
+            day: 'numeric', month: 'long', year: 'numeric', hour: '2-digit', minute: '2-digit',
+        });
+    }
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    const element = document.getElementById('photoLightbox');
+    if (element) {
+        new PhotoLightbox(element).start();
+    }
+});
@@ -0,0 +1,87 @@
+// Live feed nowych zdjęć - jedno połączenie SSE zamiast ciągłego odświeżania galerii
+
+class PhotoFeed {
+    constructor(element) {
+        this.element = element;
+        this.streamUrl = element.dataset.streamUrl;
+        this.eventsUrl = element.dataset.eventsUrl;
+        this.lastEventId = parseInt(element.dataset.lastEventId, 10) || 0;
+        this.kinds = (element.dataset.kinds || 'approved').split(',');
+        this.category = element.dataset.category || '';
+        this.pollInterval = 15000;
+        this.seenPhotos = new Set();
+        this.newPhotos = [];
+
+        this.countElement = element.querySelector('.photo-feed-count');
+        this.thumbsElement = element.querySelector('.photo-feed-thumbs');
+        element.querySelector('.photo-feed-show').addEventListener('click', () => {
+            window.location.href = element.dataset.showUrl || window.location.href;
+        });
+    }
+
+    start() {
+        if (window.EventSource) {
+            this.connect();
+        } else {
+            this.poll();
+        }
+    }
+
+    connect() {
+        // Last-Event-ID przy wznowieniu ustawia sama przeglądarka, parametr służy tylko pierwszemu połączeniu
+        const source = new EventSource(`${this.streamUrl}?last_event_id=${this.lastEventId}`);
+        this.kinds.forEach(kind => {
+            source.addEventListener(kind, event => this.handle(JSON.parse(event.data)));
+        });
+    }
+
+    poll() {
+        fetch(`${this.eventsUrl}?after=${this.lastEventId}`, {credentials: 'same-origin'})
+            .then(response => response.json())
+            .then(data => {
+                data.events
+                    .filter(event => this.kinds.includes(event.kind))
+                    .forEach(event => this.handle(event));
+                this.lastEventId = data.last_event_id;
+            })
+            .catch(error => console.log('Photo feed polling failed:', error))
+            .finally(() => setTimeout(() => this.poll(), this.pollInterval));
+    }
+
+    handle(event) {
+        this.lastEventId = Math.max(this.lastEventId, event.id);
+        const photo = event.photo;
+        if (this.category && photo.category !== this.category) {
+            return;
+        }
+        if (this.seenPhotos.has(photo.id)) {
+            return;
+        }
+        this.seenPhotos.add(photo.id);
+        this.newPhotos.unshift(photo);
+        this.render();
+    }
+
+    render() {
+        this.countElement.textContent = this.newPhotos.length;
+        this.thumbsElement.innerHTML = '';
+        this.newPhotos.slice(0, 4).forEach(photo => {
+            if (!photo.thumbnail_url) {
+                return;
+            }
+            const img = document.createElement('img');
+            img.src = photo.thumbnail_url;
+            img.alt = photo.title;
+            img.loading = 'lazy';
+            this.thumbsElement.appendChild(img);
+        });
+        this.element.style.display = 'flex';
+    }
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    const element = document.getElementById('photoFeed');
+    if (element) {
+        new PhotoFeed(element).start();
+    }
+});
@@ -6,8 +6,34 @@ document.addEventListener('DOMContentLoaded', function() {
     initializeAnimations();
 });
 
+let tableVersionsLoaded = null;
+
+// Wersje stołów z planu sali - znaczniki .table-circle ich nie niosą, a bez nich każdy zapis kończy się 409
+function loadTableVersions() {
+    if (!tableVersionsLoaded) {
+        tableVersionsLoaded = fetch('/api/seating-plan/', {credentials: 'same-origin'})
+            .then(response => response.json())
+            .then(plan => {
+                plan.tables.forEach(table => {
+                    const circle = document.querySelector(`.table-circle[data-table="${table.number}"]`);
+                    if (circle && circle.dataset.version === undefined) {
+                        circle.dataset.version = table.version;
+                    }
+                });
+            })
+            .catch(error => {
+                tableVersionsLoaded = null;
+                throw error;
+            });
+    }
+    return tableVersionsLoaded;
+}
+
 function initializeTableMap() {
     const tableCircles = document.querySelectorAll('.table-circle');
+    if (tableCircles.length) {
+        loadTableVersions().catch(error => console.error('Błąd wczytywania planu sali:', error));
+    }
     
     tableCircles.forEach((circle, index) => {
         // Add entrance animation with staggered delay
@@ -573,7 +599,7 @@ function snapToChairPosition(avatar, tableCircle, x, y) {
     avatar.dataset.chairPosition = bestPosition + 1;
     
     // Update in database
-    updateChairPositionInDatabase(avatar.dataset.guestId, bestPosition + 1);
+    updateChairPositionInDatabase(tableCircle, avatar.dataset.guestId, bestPosition + 1);
 }
 
 function calculateChairPositions(tableShape, tableWidth, tableHeight, totalChairs) {
@@ -620,24 +646,34 @@ function calculateChairPositions(tableShape, tableWidth, tableHeight, totalChair
     return positions;
 }
 
-function updateChairPositionInDatabase(guestId, chairPosition) {
+// Zapis przez zbiorczy endpoint z kontrolą wersji stołu - przy równoległej zmianie serwer zwraca 409
+function updateChairPositionInDatabase(tableCircle, guestId, chairPosition) {
     if (!guestId) return;
     
-    fetch('/ajax/update-chair-position/', {
+    const tableNumber = tableCircle.dataset.table;
+    loadTableVersions()
+    .then(() => fetch('/ajax/update-chair-positions/', {
         method: 'POST',
+        credentials: 'same-origin',
         headers: {
             'Content-Type': 'application/json',
+            'X-CSRFToken': getCSRFToken()
         },
         body: JSON.stringify({
-            guest_id: guestId,
-            chair_position: chairPosition
+            moves: [{guest_id: guestId, chair_position: chairPosition}],
+            versions: {[tableNumber]: tableCircle.dataset.version}
         })
-    })
-    .then(response => response.json())
-    .then(data => {
+    }))
+    .then(response => response.json().then(data => ({status: response.status, data})))
+    .then(({status, data}) => {
+        if (data.versions && data.versions[tableNumber] !== undefined) {
+            tableCircle.dataset.version = data.versions[tableNumber];
+        }
         if (data.success) {
             console.log('Pozycja krzesła zaktualizowana:', data.message);
             showNotification('✅ Pozycja gościa została zapisana', 'success');
+        } else if (status === 409) {
+            showNotification('⚠️ ' + data.message + ' - odśwież stronę', 'error');
         } else {
             console.error('Błąd aktualizacji:', data.message);
             showNotification('❌ Błąd zapisywania pozycji', 'error');
@@ -649,6 +685,11 @@ function updateChairPositionInDatabase(guestId, chairPosition) {
     });
 }
 
+function getCSRFToken() {
+    const match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+    return match ? decodeURIComponent(match[1]) : '';
+}
+
 function showNotification(message, type = 'info') {
     const notification = document.createElement('div');
     notification.className = `notification notification-${type}`;
@@ -8,6 +8,8 @@ class WeddingTableMap {
         this.currentHighlighted = null;
         this.searchTimeout = null;
         this.currentGuestInfo = window.weddingData?.currentGuestInfo || null;
+        // Organizatorzy widzą gości przy stołach i mogą przeciągać ich na inne krzesła
+        this.canEditSeats = Boolean(window.weddingData?.canEditSeats);
         this.mapBounds = { width: 900, height: 600 }; // Virtual coordinates
         
         // Mobile responsiveness
@@ -21,16 +23,118 @@ class WeddingTableMap {
 
     init() {
         this.createMap();
-        this.addTables();
         this.setupSearch();
         this.setupEventListeners();
+        this.loadDirectory();
         
-        // Highlight current guest's table if found
-        if (this.currentGuestInfo && this.currentGuestInfo.table_number) {
-            setTimeout(() => {
-                this.highlightTable(this.currentGuestInfo.table_number);
-            }, 1000);
+        this.loadPlan().then(() => {
+            // Highlight current guest's table if found
+            if (this.currentGuestInfo && this.currentGuestInfo.table_number) {
+                setTimeout(() => {
+                    this.highlightTable(this.currentGuestInfo.table_number);
+                }, 1000);
+            }
+        });
+    }
+
+    /**
+     * Pobiera plan sali z API. Odpowiedź ma ETag i "Cache-Control: no-cache", więc przeglądarka
+     * przy kolejnych wizytach wysyła If-None-Match i dostaje 304 bez ponownego pobierania planu.
+     */
+    async loadPlan() {
+        const planUrl = window.weddingData?.planUrl;
+        if (planUrl) {
+            try {
+                const response = await fetch(planUrl, {credentials: 'same-origin'});
+                if (!response.ok) {
+                    throw new Error(`HTTP ${response.status}`);
+                }
+                const plan = await response.json();
+                window.weddingData.tables = plan.tables;
+                window.weddingData.planVersion = plan.version;
+            } catch (error) {
+                console.error('Seating plan loading failed:', error);
+            }
+        }
+
+        if (this.tableMarkers && Object.keys(this.tableMarkers).length) {
+            // Ponowne wczytanie (np. po konflikcie wersji) - rysujemy mapę od nowa
+            this.createMap();
+        }
+        this.addTables();
+        this.renderTableCards();
+    }
+
+    loadDirectory() {
+        const data = window.weddingData || {};
+        if (!window.GuestDirectory || !data.directoryUrl) {
+            return;
+        }
+        this.directory = new GuestDirectory(data.directoryVersionUrl, data.directoryUrl);
+        this.directory.load()
+            .then(directory => console.log(`📒 Guest directory v${directory.version}: ${directory.guests.length} guests`))
+            .catch(error => console.log('Guest directory unavailable, using server search:', error));
+    }
+
+    escapeHtml(value) {
+        const div = document.createElement('div');
+        div.textContent = value == null ? '' : String(value);
+        return div.innerHTML;
+    }
+
+    renderTableCards() {
+        const container = document.getElementById('table-cards');
+        const tables = window.weddingData?.tables || [];
+        if (!container || tables.length === 0) {
+            return;
         }
+
+        const current = this.currentGuestInfo;
+        container.innerHTML = tables.map(table => {
+            const isOwn = current && current.table_number === table.number;
+            const occupancy = table.capacity ? Math.round(table.guests_count * 100 / table.capacity) : 0;
+            const guests = table.guest_list.map(guest => {
+                const isCurrent = current && guest.id === current.id;
+                return `
+                    <span class="badge badge-light mr-1 mb-1${isCurrent ? ' badge-warning' : ''}" style="font-size: 0.8rem;">
+                        ${isCurrent ? '<i class="fas fa-star"></i> ' : ''}${this.escapeHtml(guest.full_name)}
+                    </span>`;
+            }).join('');
+
+            return `
+                <div class="col-md-6 col-xl-4 mb-3">
+                    <div class="card card-custom table-card${isOwn ? ' highlighted-card' : ''}" data-table-card="${table.number}">
+                        <div class="card-header d-flex justify-content-between align-items-center" style="background: linear-gradient(135deg, #f8f5f0, #ede8dd);">
+                            <h6 class="mb-0">
+                                <i class="fas fa-chair"></i>
+                                Stół ${table.number}
+                                ${table.number <= 3 ? '<small class="badge badge-info ml-1">prostokątny</small>' : ''}
+                                ${isOwn ? '<span class="badge badge-warning ml-2"><i class="fas fa-star"></i> Twój stół</span>' : ''}
+                            </h6>
+                            <div class="text-right">
+                                <div class="progress" style="width: 60px; height: 8px;">
+                                    <div class="progress-bar" style="width: ${occupancy}%" title="${table.guests_count}/${table.capacity} miejsc"></div>
+                                </div>
+                                <small class="text-muted">${table.guests_count}/${table.capacity}</small>
+                            </div>
+                        </div>
+                        <div class="card-body">
+                            <h6 class="card-title text-primary">${this.escapeHtml(table.name)}</h6>
+                            <p class="card-text">
+                                <small class="text-muted">${this.escapeHtml(table.description)}</small>
+                            </p>
+                            ${guests ? `
+                            <div class="mt-3">
+                                <h6 style="font-size: 0.9rem; color: #8b6f47;">
+                                    <i class="fas fa-users"></i> Goście:
+                                </h6>
+                                <div class="guest-list">${guests}</div>
+                            </div>` : ''}
+                        </div>
+                    </div>
+                </div>`;
+        }).join('');
+        document.getElementById('table-details').style.display = '';
     }
 
     createMap() {
@@ -41,6 +145,7 @@ class WeddingTableMap {
         if (this.map) {
             this.map.remove();
         }
+        this.guestMarkers = {};
 
         // Calculate responsive scaling factors
         this.mobileScale = isMobile ? (isSmallMobile ? 0.6 : 0.75) : 1.0;
@@ -240,10 +345,10 @@ class WeddingTableMap {
         // Setup interactions - ONLY on the label to prevent jumping
         this.setupTableInteractions(table.number, labelMarker);
 
-        // Add guest avatars if zoom level allows
-        // if (table.guest_list && table.guest_list.length > 0) {
-        //     this.addGuestAvatars(table, coords, shape, size);
-        // }
+        // Awatary gości tylko w trybie edycji miejsc - dla gości mapa pokazuje same stoły
+        if (this.canEditSeats) {
+            this.addGuestAvatars(table, coords, shape, size);
+        }
     }
 
     setupTableInteractions(tableNumber, labelMarker) {
@@ -407,7 +512,8 @@ class WeddingTableMap {
         }
 
         const guests = table.guest_list;
-        const totalGuests = guests.length;
+        // Każde krzesło ma własne miejsce na obwodzie - wolne krzesła zostają pustymi lukami
+        const totalGuests = this.seatCount(table);
         
         // Use the passed coords directly - they are already correctly calculated and scaled
         const actualCenter = coords;
@@ -536,9 +642,14 @@ class WeddingTableMap {
                 iconAnchor: [avatarSize/2, avatarSize/2]
             }),
             interactive: true,
+            draggable: this.canEditSeats,
             zIndexOffset: isCurrent ? 1000 : 100
         }).addTo(this.map);
 
+        if (this.canEditSeats) {
+            avatarMarker.on('dragend', () => this.moveGuestToNearestSeat(guest, tableNumber, avatarMarker.getLatLng()));
+        }
+
         // Click interaction for guest modal
         avatarMarker.on('click', (e) => {
             e.originalEvent?.stopPropagation();
@@ -561,6 +672,92 @@ class WeddingTableMap {
         return avatarMarker;
     }
 
+    seatCount(table) {
+        return Math.max(table.capacity || 0, table.guest_list.length);
+    }
+
+    seatCoordinates(tableData, seatNumber) {
+        const table = tableData.table;
+        const shape = table.shape || 'circular';
+        if (shape === 'rectangular' || shape === 'square') {
+            return this.calculateRectangularAvatarPosition(tableData.coords, tableData.size, seatNumber - 1, this.seatCount(table));
+        }
+        return this.calculateCircularAvatarPosition(tableData.coords, seatNumber - 1, this.seatCount(table));
+    }
+
+    redrawGuestAvatars(tableNumber) {
+        const tableData = this.tableMarkers[tableNumber];
+        (this.guestMarkers[tableNumber] || []).forEach(marker => marker.remove());
+        this.guestMarkers[tableNumber] = [];
+        this.addGuestAvatars(tableData.table, tableData.coords, tableData.table.shape || 'circular', tableData.size);
+    }
+
+    /**
+     * Upuszczony awatar trafia na najbliższe krzesło jego stołu. Zajęte krzesło oznacza zamianę miejsc -
+     * oba przesunięcia idą jednym żądaniem z wersją stołu, a przy konflikcie wczytujemy plan od nowa.
+     */
+    moveGuestToNearestSeat(guest, tableNumber, latLng) {
+        const tableData = this.tableMarkers[tableNumber];
+        const table = tableData.table;
+        const seats = table.capacity || this.seatCount(table);
+
+        let target = null;
+        let bestDistance = Infinity;
+        for (let seat = 1; seat <= seats; seat++) {
+            const [y, x] = this.seatCoordinates(tableData, seat);
+            const distance = Math.hypot(latLng.lat - y, latLng.lng - x);
+            if (distance < bestDistance) {
+                bestDistance = distance;
+                target = seat;
+            }
+        }
+        if (!target || target === guest.chair_position) {
+            this.redrawGuestAvatars(tableNumber);
+            return;
+        }
+
+        const occupant = table.guest_list.find(other => other.id !== guest.id && other.chair_position === target);
+        const moves = [{guest_id: guest.id, chair_position: target}];
+        if (occupant) {
+            moves.push({guest_id: occupant.id, chair_position: guest.chair_position || null});
+        }
+
+        fetch(window.weddingData.chairPositionsUrl, {
+            method: 'POST',
+            credentials: 'same-origin',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': this.getCSRFToken()
+            },
+            body: JSON.stringify({moves: moves, versions: {[table.number]: table.version}})
+        })
+        .then(response => response.json().then(data => ({status: response.status, data: data})))
+        .then(({status, data}) => {
+            if (data.success) {
+                if (occupant) {
+                    occupant.chair_position = guest.chair_position || null;
+                }
+                guest.chair_position = target;
+                table.version = data.versions[table.number];
+                this.redrawGuestAvatars(tableNumber);
+                this.renderTableCards();
+                this.showNotification(`${guest.full_name} - stół ${table.number}, miejsce ${target}`, 'success');
+            } else if (status === 409) {
+                // Ktoś zmienił ten stół w międzyczasie - pokazujemy aktualny układ
+                this.showNotification(`${data.message}. Wczytuję aktualny plan sali.`, 'warning');
+                this.loadPlan();
+            } else {
+                this.showNotification(data.message || 'Nie udało się zapisać miejsca', 'error');
+                this.redrawGuestAvatars(tableNumber);
+            }
+        })
+        .catch(error => {
+            console.error('Chair move failed:', error);
+            this.showNotification('Nie udało się zapisać miejsca', 'error');
+            this.redrawGuestAvatars(tableNumber);
+        });
+    }
+
     getCSRFToken() {
         // Get CSRF token from cookie or meta tag
         const tokenElement = document.querySelector('[name=csrfmiddlewaretoken]');
@@ -621,6 +818,23 @@ class WeddingTableMap {
     performSearch(query) {
         console.log(`🔍 Searching for: "${query}"`);
         
+        // Lokalny spis gości - bez zapytania do serwera, działa także bez sieci
+        if (this.directory && this.directory.ready) {
+            const guest = this.directory.search(query, 1)[0];
+            if (guest) {
+                this.handleSearchSuccess({
+                    found: true,
+                    guest_id: guest.id,
+                    guest_name: guest.name,
+                    table_number: guest.table_number || 'Nie przypisano',
+                    table_name: guest.table_name,
+                });
+            } else {
+                this.handleSearchNoResults(query);
+            }
+            return;
+        }
+        
         // AJAX search
         fetch(`/ajax/table-search/?q=${encodeURIComponent(query)}`)
             .then(response => response.json())
@@ -1,7 +1,12 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.http import Http404, HttpResponse
+from django.urls import path, reverse
 from django.utils.html import format_html
-from django.db.models import Count
-from .models import WeddingInfo, Guest, Table, Photo, ScheduleEvent, MenuItem
+from django.db.models import Count, OuterRef, Q, Subquery
+from .models import WeddingInfo, Guest, Table, Photo, PhotoBlob, StorageDeletion, ScheduleEvent, MenuItem
+from .layout import LayoutError, auto_layout
+from .seating import SeatingConflict, bump_table_versions, solve_seating
+from .sprites import assign_sprite_tiles, sprite_sheet
 
 @admin.register(WeddingInfo)
 class WeddingInfoAdmin(admin.ModelAdmin):
@@ -11,20 +16,22 @@ class WeddingInfoAdmin(admin.ModelAdmin):
 @admin.register(Guest)
 class GuestAdmin(admin.ModelAdmin):
     list_display = ['full_name', 'user', 'table_number', 'chair_position', 'confirmed', 'plus_one']
-    list_filter = ['table_number', 'confirmed', 'plus_one', 'chair_position']
+    list_filter = ['table_number', 'confirmed', 'plus_one', 'seat_pinned', 'chair_position']
     search_fields = ['user__first_name', 'user__last_name', 'user__email']
     list_editable = ['table_number', 'chair_position', 'confirmed']
+    raw_id_fields = ['companion_of']
+    actions = ['solve_seating_selected']
     
     fieldsets = (
         ('Podstawowe Informacje', {
             'fields': ('user', 'phone_number', 'guest_type', 'dietary_requirements')
         }),
         ('Miejsce przy stole', {
-            'fields': ('table_number', 'chair_position'),
+            'fields': ('table_number', 'chair_position', 'seat_pinned'),
             'description': 'Pozycja krzesła przy stole - numery od 1 do liczby miejsc przy stole'
         }),
         ('Dodatkowe opcje', {
-            'fields': ('plus_one', 'confirmed'),
+            'fields': ('plus_one', 'companion_of', 'confirmed'),
             'classes': ('collapse',)
         })
     )
@@ -32,6 +39,32 @@ class GuestAdmin(admin.ModelAdmin):
     def full_name(self, obj):
         return f"{obj.user.first_name} {obj.user.last_name}"
     full_name.short_description = 'Imię i nazwisko'
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Zmiana miejsca z panelu unieważnia otwarte mapy rozsadzenia
+        if change and {'table_number', 'chair_position'} & set(form.changed_data):
+            bump_table_versions([obj.table_number, form.initial.get('table_number')])
+    
+    def solve_seating_selected(self, request, queryset):
+        """Rozsadza zaznaczonych gości - pozostali zostają na swoich miejscach"""
+        try:
+            changes, unplaced = solve_seating(
+                movable_ids=queryset.values_list('id', flat=True),
+                incremental=True,
+            )
+        except SeatingConflict as e:
+            self.message_user(request, f'{e} - spróbuj ponownie.', level=messages.WARNING)
+            return
+        
+        self.message_user(request, f'Przesadzono {len(changes)} gości.')
+        if unplaced:
+            self.message_user(
+                request,
+                f'Brak wolnych miejsc dla {len(unplaced)} gości: ' + ', '.join(g.full_name for g in unplaced),
+                level=messages.WARNING,
+            )
+    solve_seating_selected.short_description = "🪑 Rozsadź automatycznie wybranych gości"
 
 @admin.register(Table)
 class TableAdmin(admin.ModelAdmin):
@@ -39,6 +72,7 @@ class TableAdmin(admin.ModelAdmin):
     list_filter = ['shape', 'capacity']
     list_editable = ['name', 'capacity', 'shape']
     ordering = ['number']
+    actions = ['auto_layout_selected']
     
     fieldsets = (
         ('Podstawowe Informacje', {
@@ -71,6 +105,21 @@ class TableAdmin(admin.ModelAdmin):
         return f"({obj.map_x}, {obj.map_y})"
     position_display.short_description = 'Pozycja (X, Y)'
     
+    def auto_layout_selected(self, request, queryset):
+        """Rozmieszcza wybrane stoły - niezaznaczone (np. stół Pary Młodej) zostają na miejscu"""
+        selected = list(queryset)
+        fixed = Table.objects.exclude(pk__in=[table.pk for table in selected])
+        try:
+            scale = auto_layout(selected, fixed_tables=fixed)
+        except LayoutError as e:
+            self.message_user(request, str(e), level=messages.ERROR)
+            return
+        
+        self.message_user(request, f'Rozmieszczono {len(selected)} stołów.')
+        if scale < 1:
+            self.message_user(request, f'Stoły zmniejszono do {scale:.0%}, żeby zmieściły się na sali.', level=messages.WARNING)
+    auto_layout_selected.short_description = "📐 Rozmieść wybrane stoły automatycznie"
+    
     class Media:
         css = {
             'all': ('wedding/css/admin_table_positioning.css',)
@@ -79,11 +128,15 @@ class TableAdmin(admin.ModelAdmin):
 
 @admin.register(Photo)
 class PhotoAdmin(admin.ModelAdmin):
-    list_display = ['title', 'image_preview', 'uploader_display', 'category', 'approved', 'featured', 'upload_date', 'same_batch']
-    list_filter = ['category', 'approved', 'featured', 'upload_date', 'uploader_name']
+    list_display = ['title', 'image_preview', 'uploader_display', 'category', 'approved', 'featured', 'upload_date', 'same_batch', 'duplicate_badge']
+    # Bez filtra po uploader_name - DISTINCT po wszystkich zdjęciach przy każdym wczytaniu listy (jest wyszukiwarka)
+    list_filter = ['category', 'approved', 'featured', 'rejected', 'renditions_ready', ('duplicate_of', admin.EmptyFieldListFilter), 'upload_date']
+    raw_id_fields = ['duplicate_of']
     search_fields = ['title', 'description', 'uploaded_by__username', 'uploader_name']
     list_editable = ['approved', 'featured']
     ordering = ['-upload_date']
+    list_per_page = 100
+    list_select_related = ['uploaded_by']
     actions = ['approve_selected', 'feature_selected', 'approve_batch']
     
     fieldsets = (
@@ -95,11 +148,53 @@ class PhotoAdmin(admin.ModelAdmin):
             'description': 'Automatycznie wypełniane na podstawie danych z formularza'
         }),
         ('Moderacja', {
-            'fields': ('approved', 'featured'),
+            'fields': ('approved', 'featured', 'rejected', 'duplicate_of'),
+        }),
+        ('Metadane', {
+            'fields': ('taken_at', 'captured_at', 'dimensions', 'camera'),
+            'description': 'Odczytane z EXIF przy wysyłaniu zdjęcia',
+            'classes': ('collapse',)
         })
     )
     
+    def get_urls(self):
+        return [
+            path('sprite/<slug:key>/', self.admin_site.admin_view(self.sprite_view, cacheable=True), name='wedding_photo_sprite'),
+        ] + super().get_urls()
+    
+    def get_changelist_instance(self, request):
+        changelist = super().get_changelist_instance(request)
+        # Jeden arkusz miniatur na stronę listy zamiast osobnego obrazka w każdym wierszu
+        assign_sprite_tiles(changelist.result_list)
+        return changelist
+    
+    def sprite_view(self, request, key):
+        """Arkusz miniatur strony listy (?ids= w kolejności wierszy)"""
+        try:
+            photo_ids = [int(photo_id) for photo_id in request.GET.get('ids', '').split(',') if photo_id]
+        except ValueError:
+            raise Http404
+        actual_key, body = sprite_sheet(photo_ids)
+        if not body:
+            raise Http404
+        
+        response = HttpResponse(body, content_type='image/webp')
+        if actual_key == key:
+            # Klucz wynika z id i plików zdjęć - pod tym adresem treść się nie zmieni
+            response['Cache-Control'] = 'private, max-age=31536000, immutable'
+        else:
+            response['Cache-Control'] = 'private, no-cache'
+        return response
+    
     def image_preview(self, obj):
+        tile = getattr(obj, 'sprite_tile', None)
+        if tile:
+            url, x, y, width, height = tile
+            return format_html(
+                '<span style="display: inline-block; width: 60px; height: 60px; border-radius: 8px; '
+                'box-shadow: 0 2px 5px rgba(0,0,0,0.1); background: url({}) {}px {}px / {}px {}px no-repeat;"></span>',
+                url, x, y, width, height
+            )
         if obj.image:
             # Użyj wysokiej jakości thumbnail dla podglądu w adminie
             thumbnail_url = obj.get_thumbnail_url() if hasattr(obj, 'get_thumbnail_url') else obj.image.url
@@ -119,68 +214,97 @@ class PhotoAdmin(admin.ModelAdmin):
             return f"👥 {display}"
     uploader_display.short_description = 'Przesłane przez'
     
+    def get_queryset(self, request):
+        # Wielkość partii liczona w tym samym zapytaniu co lista - bez osobnego zapytania na wiersz
+        batch_sizes = (
+            Photo.objects.filter(batch_id=OuterRef('batch_id'))
+            .order_by()
+            .values('batch_id')
+            .annotate(size=Count('id'))
+            .values('size')
+        )
+        return super().get_queryset(request).annotate(batch_size=Subquery(batch_sizes))
+    
     def same_batch(self, obj):
-        """Pokazuje czy zdjęcie było przesłane w tej samej partii co inne"""
-        if obj.uploader_name:
-            # Znajdź zdjęcia przesłane w tym samym czasie (±5 minut) przez tę samą osobę
-            from django.utils import timezone
-            from datetime import timedelta
-            
-            time_window = timedelta(minutes=5)
-            similar_photos = Photo.objects.filter(
-                uploader_name=obj.uploader_name,
-                upload_date__range=[
-                    obj.upload_date - time_window,
-                    obj.upload_date + time_window
-                ]
-            ).exclude(id=obj.id)
-            
-            count = similar_photos.count()
-            if count > 0:
-                return f"📸 +{count}"
+        """Pokazuje ile innych zdjęć przesłano w tej samej partii"""
+        count = (getattr(obj, 'batch_size', None) or 1) - 1
+        if count > 0:
+            return f"📸 +{count}"
         return ""
     same_batch.short_description = 'Partia'
+    same_batch.admin_order_field = 'batch_size'
+    
+    def duplicate_badge(self, obj):
+        """Link do zdjęcia, którego to zdjęcie jest powtórzeniem"""
+        if obj.duplicate_of_id:
+            return format_html(
+                '<a href="{}" title="Duplikat zdjęcia #{}">♊ #{}</a>',
+                reverse('admin:wedding_photo_change', args=[obj.duplicate_of_id]),
+                obj.duplicate_of_id,
+                obj.duplicate_of_id,
+            )
+        return ""
+    duplicate_badge.short_description = 'Duplikat'
+    
+    def dimensions(self, obj):
+        if obj.width and obj.height:
+            return f'{obj.width} × {obj.height} px'
+        return '-'
+    dimensions.short_description = 'Wymiary'
     
     def get_readonly_fields(self, request, obj=None):
+        metadata = ['taken_at', 'captured_at', 'dimensions', 'camera']
         # Jeśli zdjęcie ma już przypisanego użytkownika, nie pozwalaj na zmianę
         if obj and obj.uploaded_by:
-            return ['uploaded_by']
-        return []
+            return ['uploaded_by'] + metadata
+        return metadata
     
     # Custom actions
     def approve_selected(self, request, queryset):
-        count = queryset.update(approved=True)
+        count = queryset.approve()
         self.message_user(request, f'Zatwierdzono {count} zdjęć.')
     approve_selected.short_description = "✅ Zatwierdź wybrane zdjęcia"
     
     def feature_selected(self, request, queryset):
-        count = queryset.update(featured=True, approved=True)  # Wyróżnione musi być zatwierdzone
+        count = queryset.feature()  # Wyróżnione musi być zatwierdzone
         self.message_user(request, f'Wyróżniono {count} zdjęć.')
     feature_selected.short_description = "⭐ Wyróż wybrane zdjęcia"
     
     def approve_batch(self, request, queryset):
-        """Zatwierdza wszystkie zdjęcia od tych samych osób w tym samym czasie"""
-        approved_count = 0
-        
-        for photo in queryset:
-            if photo.uploader_name:
-                from django.utils import timezone
-                from datetime import timedelta
-                
-                time_window = timedelta(minutes=10)  # Szersze okno dla partii
-                batch_photos = Photo.objects.filter(
-                    uploader_name=photo.uploader_name,
-                    upload_date__range=[
-                        photo.upload_date - time_window,
-                        photo.upload_date + time_window
-                    ],
-                    approved=False
-                )
-                approved_count += batch_photos.update(approved=True)
+        """Zatwierdza całe partie wybranych zdjęć jednym UPDATE (zdjęcia bez partii - pojedynczo)"""
+        batch_photos = Photo.objects.filter(
+            Q(batch_id__in=queryset.exclude(batch_id=None).values('batch_id'))
+            | Q(id__in=queryset.filter(batch_id=None).values('id'))
+        )
+        approved_count = batch_photos.approve()
         
         self.message_user(request, f'Zatwierdzono {approved_count} zdjęć w partiach.')
     approve_batch.short_description = "📸 Zatwierdź całe partie zdjęć"
 
+@admin.register(PhotoBlob)
+class PhotoBlobAdmin(admin.ModelAdmin):
+    """Podgląd plików współdzielonych przez identyczne zdjęcia - licznikami zarządza wedding/blobs.py"""
+    list_display = ['sha256', 'name', 'size', 'ref_count', 'created_at']
+    search_fields = ['sha256', 'name']
+    readonly_fields = ['sha256', 'name', 'size', 'ref_count', 'created_at']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(StorageDeletion)
+class StorageDeletionAdmin(admin.ModelAdmin):
+    """Kolejka plików do usunięcia ze storage - przetwarza ją komenda gc_media"""
+    list_display = ['name', 'reason', 'created_at', 'attempts', 'last_error']
+    list_filter = ['reason']
+    search_fields = ['name']
+    readonly_fields = ['name', 'reason', 'created_at', 'attempts', 'last_error']
+    
+    def has_add_permission(self, request):
+        return False
+
 @admin.register(ScheduleEvent)
 class ScheduleEventAdmin(admin.ModelAdmin):
     list_display = ['title', 'start_time', 'end_time', 'location', 'order']
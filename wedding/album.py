@@ -0,0 +1,145 @@
+"""Archiwum ZIP całego albumu do pobrania przez gości.
+
+ZIP składamy strumieniowo: pliki bez kompresji (JPEG i tak się nie zmniejszy),
+czytane ze storage kawałkami i od razu wysyłane, więc pobieranie startuje
+natychmiast, a zużycie pamięci nie zależy od wielkości albumu. Rozmiar
+i CRC zapisujemy w deskryptorze za danymi pliku - strumień nie wymaga
+cofania się w pliku.
+
+Przy pierwszym pobraniu archiwum zapisujemy równolegle na dysk. Nazwa pliku
+zawiera skrót listy zatwierdzonych zdjęć (id i plików), więc kolejni goście
+dostają gotowy plik, dopóki zestaw zatwierdzonych zdjęć się nie zmieni.
+"""
+import hashlib
+import os
+import uuid
+import zipfile
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .backup import CHUNK_SIZE, open_source
+from .models import Photo
+
+
+class ZipStream:
+    """Plik tylko do zapisu dla zipfile - zebrane bajty odbiera generator przez drain()"""
+
+    def __init__(self):
+        self.chunks = []
+        self.offset = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def album_photos(category='', uploader=''):
+    # Kolejność zrobienia zdjęć - w archiwum (i przeglądarce plików) album idzie przebiegiem dnia
+    photos = Photo.objects.filter(approved=True).exclude(image='').order_by('captured_at', 'id')
+    if category:
+        photos = photos.filter(category=category)
+    if uploader:
+        photos = photos.filter(Q(uploader_name__iexact=uploader) | Q(uploaded_by__username=uploader))
+    return photos
+
+
+def album_version(photos):
+    """Skrót zestawu zdjęć - zmienia się przy zatwierdzeniu, usunięciu lub podmianie pliku"""
+    digest = hashlib.sha256()
+    for photo_id, name in photos.values_list('id', 'image'):
+        digest.update(f'{photo_id}:{name}\n'.encode())
+    return digest.hexdigest()[:20]
+
+
+def archive_name(category, uploader, version):
+    scope = hashlib.sha1(f'{category}|{uploader.lower()}'.encode()).hexdigest()[:10]
+    return f'album-{scope}-{version}.zip'
+
+
+def cache_dir():
+    return str(getattr(settings, 'PHOTO_ARCHIVE_CACHE_DIR', settings.BASE_DIR / 'cache' / 'albums'))
+
+
+def cached_archive(name):
+    path = os.path.join(cache_dir(), name)
+    return path if os.path.exists(path) else None
+
+
+def entry_name(photo):
+    return f'{photo.category}/{photo.id}_{os.path.basename(photo.image.name)}'
+
+
+def stream_zip(photos):
+    """Generator kolejnych kawałków archiwum ZIP (bez kompresji) ze zdjęciami"""
+    stream = ZipStream()
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for photo in photos.iterator():
+            try:
+                source = open_source(photo.image.name)
+            except Exception as e:
+                print(f"Pominięto zdjęcie {photo.id} w archiwum: {e}")
+                continue
+            info = zipfile.ZipInfo(entry_name(photo), date_time=timezone.localtime(photo.captured_at).timetuple()[:6])
+            info.compress_type = zipfile.ZIP_STORED
+            try:
+                # force_zip64 - rozmiar nie jest znany z góry, a plik może przekroczyć 2 GB
+                with archive.open(info, 'w', force_zip64=True) as target:
+                    while True:
+                        chunk = source.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        target.write(chunk)
+                        yield stream.drain()
+            finally:
+                source.close()
+            yield stream.drain()
+    # Katalog centralny dopisuje zamknięcie archiwum
+    yield stream.drain()
+
+
+def stream_and_cache(photos, name):
+    """Strumień archiwum zapisywany jednocześnie do cache; plik trafia do cache tylko w całości"""
+    directory = cache_dir()
+    os.makedirs(directory, exist_ok=True)
+    final_path = os.path.join(directory, name)
+    part_path = f'{final_path}.{uuid.uuid4().hex}.part'
+    completed = False
+    try:
+        with open(part_path, 'wb') as cache_file:
+            for chunk in stream_zip(photos):
+                if chunk:
+                    cache_file.write(chunk)
+                    yield chunk
+        os.replace(part_path, final_path)
+        completed = True
+        remove_stale_archives(name)
+    finally:
+        # Przerwane pobieranie (GeneratorExit) - niepełnego archiwum nie zostawiamy
+        if not completed and os.path.exists(part_path):
+            os.remove(part_path)
+
+
+def remove_stale_archives(current_name):
+    """Usuwa starsze wersje archiwum tego samego zakresu (kategoria, osoba)"""
+    prefix = current_name.rsplit('-', 1)[0] + '-'
+    directory = cache_dir()
+    for name in os.listdir(directory):
+        if name.startswith(prefix) and name.endswith('.zip') and name != current_name:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
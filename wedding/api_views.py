@@ -1,37 +1,59 @@
-from django.http import JsonResponse
-from django.views.decorators.http import require_GET
+from django.urls import reverse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition, require_GET, require_POST
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from datetime import datetime, timezone
+import json
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.core.paginator import Paginator
 from .models import Photo, Guest
+from . import live_feed
+from .exif import CursorError, capture_page
+from .guest_directory import guest_directory_json
+from .moderation import ModerationError, apply_decisions, parse_decisions, pending_photos, queue_page
+from .renditions import NotificationError, handle_notification
+from .seating import PLAN_CACHE_TIMEOUT, seating_plan_version
+from .views import build_tables_data
 
 @require_GET
 def api_photos(request):
-    """API endpoint for photos with pagination"""
+    """API endpoint for photos with pagination
+    
+    ?sort=taken - chronologicznie według czasu zrobienia, strony po kluczu: ?after=<next_cursor>
+    (?order=desc od najpóźniejszych). Bez sort - jak dotąd, najnowsze przesłane z numerami stron.
+    """
     page = request.GET.get('page', 1)
     category = request.GET.get('category', '')
     
-    photos = Photo.objects.filter(approved=True).order_by('-upload_date')
+    photos = Photo.objects.filter(approved=True).select_related('uploaded_by')
     
     if category:
         photos = photos.filter(category=category)
     
-    paginator = Paginator(photos, 12)
+    if request.GET.get('sort') == 'taken':
+        try:
+            limit = int(request.GET.get('limit', 0)) or 12
+            page_photos, next_cursor = capture_page(
+                photos, request.GET.get('after', ''), limit, descending=request.GET.get('order') == 'desc'
+            )
+        except (CursorError, ValueError):
+            return JsonResponse({'success': False, 'message': 'Nieprawidłowy kursor'}, status=400)
+        return JsonResponse({
+            'photos': [photo.as_payload() for photo in page_photos],
+            'next_cursor': next_cursor,
+            'has_next': bool(next_cursor),
+        })
+    
+    paginator = Paginator(photos.order_by('-upload_date'), 12)
     page_obj = paginator.get_page(page)
     
     data = {
-        'photos': [
-            {
-                'id': photo.id,
-                'title': photo.title,
-                'description': photo.description,
-                'image_url': photo.get_optimized_url() or photo.image.url if photo.image else None,
-                'full_image_url': photo.get_full_size_url() or photo.get_optimized_url() or photo.image.url if photo.image else None,
-                'category': photo.category,
-                'uploaded_by': photo.uploader_display_name,
-                'upload_date': photo.upload_date.isoformat(),
-            }
-            for photo in page_obj
-        ],
+        'photos': [photo.as_payload() for photo in page_obj],
         'has_next': page_obj.has_next(),
         'has_previous': page_obj.has_previous(),
         'num_pages': paginator.num_pages,
@@ -64,4 +86,144 @@ def api_guest_search(request):
         for guest in guests
     ]
     
-    return JsonResponse({'results': results})
\ No newline at end of file
+    return JsonResponse({'results': results})
+
+@require_GET
+def api_photo_events(request):
+    """Polling fallback dla live feedu - zdarzenia nowsze niż ?after="""
+    last_id = live_feed.parse_last_event_id(request)
+    if last_id is None:
+        return JsonResponse({'events': [], 'last_event_id': live_feed.latest_event_id()})
+    
+    events = live_feed.events_after(last_id)
+    return JsonResponse({
+        'events': events,
+        'last_event_id': events[-1]['id'] if events else last_id,
+    })
+
+@require_GET
+def api_photo_stream(request):
+    """Server-Sent Events z nowo zatwierdzonymi i wyróżnionymi zdjęciami"""
+    last_id = live_feed.parse_last_event_id(request)
+    if last_id is None:
+        last_id = live_feed.latest_event_id()
+    
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(live_feed.stream_events(last_id), content_type='text/event-stream')
+    else:
+        # Pod WSGI długie połączenie blokowałoby wątek workera - oddajemy zaległe
+        # zdarzenia i zamykamy, a EventSource wznowi połączenie po czasie "retry"
+        body = live_feed.format_preamble(last_id)
+        body += ''.join(live_feed.format_event(payload) for payload in live_feed.events_after(last_id))
+        response = HttpResponse(body, content_type='text/event-stream')
+    
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx nie może buforować strumienia
+    return response
+
+def seating_plan_etag(request):
+    return f'"plan-{seating_plan_version()}"'
+
+def seating_plan_last_modified(request):
+    return datetime.fromtimestamp(seating_plan_version() / 1000, tz=timezone.utc)
+
+@require_GET
+@gzip_page
+@condition(etag_func=seating_plan_etag, last_modified_func=seating_plan_last_modified)
+def api_seating_plan(request):
+    """Plan sali (stoły, pozycje, goście przy stołach) dla mapy w table_finder.
+    
+    Przy niezmienionym planie odpowiada 304 na If-None-Match, a zserializowany plan trzyma
+    w cache pod kluczem z wersją - zmiana gościa lub stołu podbija wersję i unieważnia oba.
+    """
+    version = seating_plan_version()
+    cache_key = f'seating_plan:{version}'
+    body = cache.get(cache_key)
+    if body is None:
+        _tables, tables_data = build_tables_data()
+        body = json.dumps({'version': version, 'tables': tables_data}, cls=DjangoJSONEncoder)
+        cache.set(cache_key, body, PLAN_CACHE_TIMEOUT)
+    
+    response = HttpResponse(body, content_type='application/json')
+    # Zawsze rewalidacja - plan zmienia się przy przesadzaniu gości, a 304 jest tanie
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+@require_GET
+def api_guest_directory_version(request):
+    """Bieżąca wersja spisu gości - klient pobiera spis tylko, gdy wersja się zmieniła"""
+    version = seating_plan_version()
+    response = JsonResponse({
+        'version': version,
+        'url': f"{reverse('wedding:api_guest_directory')}?v={version}",
+    })
+    response['Cache-Control'] = 'no-store'
+    return response
+
+@require_GET
+@gzip_page
+@condition(etag_func=seating_plan_etag, last_modified_func=seating_plan_last_modified)
+def api_guest_directory(request):
+    """Kompaktowy spis gości (słowa imienia i nazwiska -> stół i miejsce) do wyszukiwania offline"""
+    version, body = guest_directory_json()
+    response = HttpResponse(body, content_type='application/json; charset=utf-8')
+    if request.GET.get('v') == str(version):
+        # Adres z numerem wersji nigdy nie zmienia treści
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    else:
+        response['Cache-Control'] = 'private, no-cache'
+    return response
+
+@require_GET
+@staff_member_required
+def api_moderation_queue(request):
+    """Kolejna strona kolejki moderacji - oczekujące zdjęcia o id > ?after="""
+    try:
+        after = int(request.GET.get('after', 0))
+        limit = int(request.GET.get('limit', 0)) or None
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Nieprawidłowy kursor'}, status=400)
+    
+    page = queue_page(after, limit) if limit else queue_page(after)
+    response = JsonResponse(page)
+    response['Cache-Control'] = 'no-store'
+    return response
+
+@require_POST
+@staff_member_required
+def api_moderation_decisions(request):
+    """Paczka decyzji moderatora zapisywana jednym UPDATE
+    
+    Oczekuje JSON: {"decisions": [{"id": 12, "action": "approve" | "feature" | "reject"}]}
+    """
+    try:
+        data = json.loads(request.body)
+        decisions = parse_decisions(data.get('decisions'))
+    except (json.JSONDecodeError, AttributeError):
+        return JsonResponse({'success': False, 'message': 'Nieprawidłowe dane JSON'}, status=400)
+    except ModerationError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    
+    applied = apply_decisions(decisions)
+    return JsonResponse({
+        'success': True,
+        'applied': applied,
+        'pending_count': pending_photos().count(),
+    })
+
+@csrf_exempt
+@require_POST
+def api_cloudinary_notification(request):
+    """Webhook Cloudinary - warianty zdjęcia zamówione przy uploadzie są gotowe
+    
+    Dostęp bez tokenu gościa, więc każde powiadomienie musi mieć ważny podpis (X-Cld-Signature).
+    """
+    try:
+        updated = handle_notification(
+            request.body,
+            request.headers.get('X-Cld-Timestamp'),
+            request.headers.get('X-Cld-Signature'),
+        )
+    except NotificationError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    return JsonResponse({'success': True, 'updated': updated})
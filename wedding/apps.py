@@ -4,3 +4,7 @@ class WeddingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'wedding'
     verbose_name = 'Aplikacja Weselna'
+
+    def ready(self):
+        # Rejestruje odbiorniki sygnałów unieważniające plan sali i zwalniające pliki zdjęć
+        from . import blobs, seating  # noqa: F401
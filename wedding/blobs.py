@@ -0,0 +1,85 @@
+"""Przechowywanie zdjęć adresowane treścią.
+
+Przy zapisie nowego pliku liczymy strumieniowo SHA-256 jego bajtów i plik
+trafia do storage pod nazwą ze skrótu (photos/sha256/ab/cd/<skrót>.jpg).
+Jeśli ten sam plik został już kiedyś przesłany, nie wysyłamy go ponownie
+(ani lokalnie, ani do Cloudinary) i nie przetwarzamy - nowe zdjęcie wskazuje
+na istniejący PhotoBlob, a licznik referencji rośnie o jeden. Plik usuwamy ze
+storage dopiero, gdy zniknie ostatnie zdjęcie, które go używa (przez kolejkę
+StorageDeletion i komendę gc_media).
+
+Skrót dotyczy przesłanych bajtów - lokalnie zapisany plik może być potem
+zmniejszony przez optimize_local_image, ale kolejne przesłanie tego samego
+oryginału nadal trafi w ten sam PhotoBlob.
+"""
+import hashlib
+import os
+
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import Photo, PhotoBlob, StorageDeletion
+from .renditions import derived_files
+
+BLOB_PREFIX = 'photos/sha256'
+
+
+def content_digest(file):
+    """SHA-256 pliku liczony po kawałkach - duże zdjęcia nie trafiają w całości do pamięci"""
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def blob_name(digest, filename):
+    extension = os.path.splitext(filename or '')[1].lower()[:5] or '.jpg'
+    return f'{BLOB_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+
+def acquire_blob(file):
+    """PhotoBlob z treścią pliku i flaga, czy plik został właśnie zapisany; zwiększa licznik referencji"""
+    digest = content_digest(file)
+    with transaction.atomic():
+        blob = PhotoBlob.objects.select_for_update().filter(sha256=digest).first()
+        if blob is not None:
+            PhotoBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+            return blob, False
+
+    # Zapis do storage poza transakcją - wysyłka do Cloudinary potrafi trwać kilka sekund
+    name = default_storage.save(blob_name(digest, file.name), file)
+    try:
+        with transaction.atomic():
+            return PhotoBlob.objects.create(sha256=digest, name=name, size=file.size, ref_count=1), True
+    except IntegrityError:
+        # Ten sam plik zapisało w międzyczasie inne żądanie - zostajemy przy jego kopii
+        default_storage.delete(name)
+        return acquire_blob(file)
+
+
+def release_blob(blob_id):
+    """Zmniejsza licznik referencji; przy ostatniej usuwa wiersz, a plik dopisuje do kolejki gc_media"""
+    with transaction.atomic():
+        blob = PhotoBlob.objects.select_for_update().filter(pk=blob_id).first()
+        if blob is None:
+            return
+        if blob.ref_count > 1:
+            PhotoBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') - 1)
+            return
+        # Sam plik usuwa później gc_media - usuwanie zdjęcia nie czeka na storage
+        StorageDeletion.queue([blob.name, *derived_files(blob.name)])
+        blob.delete()
+
+
+@receiver(post_delete, sender=Photo)
+def photo_deleted(sender, instance, **kwargs):
+    # Sygnał zamiast Photo.delete() - obejmuje też usuwanie querysetem (akcje admina, komendy)
+    if instance.blob_id:
+        release_blob(instance.blob_id)
+    elif instance.image:
+        StorageDeletion.queue([instance.image.name, *derived_files(instance.image.name)])
@@ -0,0 +1,171 @@
+"""Wykrywanie powtórzonych zdjęć (ten sam kadr wysłany kilka razy).
+
+Każde zdjęcie dostaje 64-bitowy dHash: obraz zmniejszony do 9x8 w skali
+szarości, bit = czy piksel jest jaśniejszy od sąsiada z prawej. Zdjęcia
+różniące się tylko kompresją, rozdzielczością czy lekką korektą mają hashe
+różniące się na kilku bitach (odległość Hamminga).
+
+Podobne hashe wyszukujemy indeksem wieloblokowym (multi-index hashing)
+trzymanym w pamięci procesu: hash dzielimy na max_distance + 1 bloków, a z
+zasady szufladkowej hash w odległości <= max_distance zgadza się z zapytaniem
+na co najmniej jednym całym bloku. Porównujemy więc tylko zdjęcia z tych
+samych kubełków, a nie wszystkie w bazie. (Drzewo BK przy progu 6 z 64 bitów
+odwiedzało znaczną część węzłów - ok. 15 ms na zapytanie przy 30 tys. zdjęć,
+indeks blokowy - ułamek milisekundy.)
+"""
+import threading
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from PIL import Image, ImageOps
+
+HASH_SIZE = 8
+DEFAULT_MAX_DISTANCE = 6
+INDEX_GENERATION_CACHE_KEY = 'photo_hashes:generation'
+
+
+def dhash(source):
+    """dHash obrazu (ścieżka, plik albo obiekt Image) jako liczba 64-bitowa"""
+    image = source if isinstance(source, Image.Image) else Image.open(source)
+    # JPEG dekodujemy od razu w zmniejszonej skali (draft) - wielokrotnie szybciej niż pełne zdjęcie
+    image.draft('L', (HASH_SIZE * 16, HASH_SIZE * 16))
+    image = ImageOps.exif_transpose(image).convert('L').resize(
+        (HASH_SIZE + 1, HASH_SIZE), Image.Resampling.LANCZOS
+    )
+    pixels = list(image.getdata())
+
+    value = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def format_hash(value):
+    return f'{value:016x}'
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+def max_distance():
+    return getattr(settings, 'PHOTO_DUPLICATE_DISTANCE', DEFAULT_MAX_DISTANCE)
+
+
+class MultiIndexHash:
+    """Indeks hashy 64-bitowych: max_distance + 1 słowników blok -> [(hash, element)]"""
+
+    def __init__(self, max_distance, bits=HASH_SIZE * HASH_SIZE):
+        self.max_distance = max_distance
+        blocks = max_distance + 1
+        bounds = [round(index * bits / blocks) for index in range(blocks + 1)]
+        self.blocks = [(low, (1 << (high - low)) - 1) for low, high in zip(bounds, bounds[1:])]
+        self.tables = [{} for _ in self.blocks]
+        self.size = 0
+
+    def keys(self, value):
+        return [(value >> shift) & mask for shift, mask in self.blocks]
+
+    def add(self, value, item):
+        self.size += 1
+        for table, key in zip(self.tables, self.keys(value)):
+            table.setdefault(key, []).append((value, item))
+
+    def search(self, value):
+        """Lista (odległość, element) dla hashy w odległości <= max_distance"""
+        found = []
+        seen = set()
+        for table, key in zip(self.tables, self.keys(value)):
+            for other, item in table.get(key, ()):
+                if item in seen:
+                    continue
+                seen.add(item)
+                distance = hamming(value, other)
+                if distance <= self.max_distance:
+                    found.append((distance, item))
+        return found
+
+
+class PhotoHashIndex:
+    """Indeks hashy zdjęć-oryginałów, uzupełniany przyrostowo o nowe zdjęcia z bazy"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset(None)
+
+    def reset(self, generation):
+        self.index = MultiIndexHash(max_distance())
+        self.last_id = 0
+        self.generation = generation
+
+    def refresh(self):
+        from .models import Photo
+
+        generation = cache.get(INDEX_GENERATION_CACHE_KEY)
+        if generation != self.generation or self.index.max_distance != max_distance():
+            # Hashe przeliczone poza tym procesem (manage_photos --find-duplicates) - budujemy od nowa
+            self.reset(generation)
+
+        rows = (
+            Photo.objects.filter(id__gt=self.last_id, duplicate_of__isnull=True)
+            .exclude(perceptual_hash='')
+            .order_by('id')
+            .values_list('id', 'perceptual_hash')
+        )
+        for photo_id, value in rows.iterator():
+            self.index.add(int(value, 16), photo_id)
+            self.last_id = photo_id
+
+    def find(self, value):
+        """Id najbliższego istniejącego zdjęcia w odległości <= PHOTO_DUPLICATE_DISTANCE albo None"""
+        from .models import Photo
+
+        with self.lock:
+            self.refresh()
+            matches = sorted(self.index.search(value))
+        if not matches:
+            return None
+        # Usunięte zdjęcia zostają w indeksie - sprawdzamy, które jeszcze istnieją
+        existing = set(Photo.objects.filter(id__in=[photo_id for _, photo_id in matches]).values_list('id', flat=True))
+        for _distance, photo_id in matches:
+            if photo_id in existing:
+                return photo_id
+        return None
+
+
+photo_hash_index = PhotoHashIndex()
+
+
+def invalidate_hash_index():
+    cache.set(INDEX_GENERATION_CACHE_KEY, time.time_ns(), None)
+
+
+def check_duplicate(uploaded_file):
+    """Hash wysyłanego pliku i id zdjęcia, którego jest duplikatem (albo None)"""
+    try:
+        value = dhash(uploaded_file)
+    except Exception as e:
+        print(f"Nie udało się policzyć hasha zdjęcia: {e}")
+        return '', None
+    finally:
+        uploaded_file.seek(0)
+    return format_hash(value), photo_hash_index.find(value)
+
+
+def hash_photo_source(job):
+    """(id, hash, błąd) zdjęcia z pliku lokalnego albo adresu URL (uruchamiane w puli procesów)"""
+    photo_id, source = job
+    try:
+        if source.startswith(('http://', 'https://')):
+            import requests
+
+            response = requests.get(source, timeout=30)
+            response.raise_for_status()
+            source = BytesIO(response.content)
+        return photo_id, format_hash(dhash(source)), None
+    except Exception as e:
+        return photo_id, None, str(e)
@@ -0,0 +1,157 @@
+"""Metadane zdjęć z EXIF i kolejność według czasu zrobienia.
+
+Nagłówek pliku czytamy raz przy wysyłaniu (bez dekodowania pikseli) i zapisujemy
+w polach Photo: czas zrobienia, wymiary po obrocie, orientację i aparat.
+Widoki i admin biorą wymiary z bazy - nie otwierają już plików.
+
+Galeria i API mogą sortować po captured_at (czas z EXIF, a bez niego czas
+przesłania), więc ceremonia wrzucona przez gościa o północy trafia na swoje
+miejsce. Strony pobieramy po kluczu (captured_at, id) - kursor to czas
+w mikrosekundach i id ostatniego zdjęcia.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import BytesIO
+
+from django.utils import timezone
+from PIL import Image
+
+ORIENTATION = 0x0112
+MAKE = 0x010F
+MODEL = 0x0110
+DATETIME = 0x0132
+EXIF_IFD = 0x8769
+DATETIME_ORIGINAL = 0x9003
+DATETIME_DIGITIZED = 0x9004
+OFFSET_TIME_ORIGINAL = 0x9011
+OFFSET_TIME = 0x9010
+
+ROTATED_ORIENTATIONS = (5, 6, 7, 8)    # zdjęcie zapisane w poziomie, wyświetlane w pionie (i odwrotnie)
+EARLIEST_CAPTURE = datetime(1990, 1, 1, tzinfo=dt_timezone.utc)
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+CAPTURE_PAGE_SIZE = 12
+MAX_CAPTURE_PAGE_SIZE = 100
+METADATA_FIELDS = ['taken_at', 'captured_at', 'width', 'height', 'orientation', 'camera']
+
+
+class CursorError(ValueError):
+    """Nieprawidłowy kursor strony"""
+
+
+def clean_text(value):
+    if isinstance(value, bytes):
+        value = value.decode('utf-8', 'ignore')
+    return str(value or '').replace('\x00', '').strip()
+
+
+def parse_exif_datetime(value, offset=None):
+    """'2024:06:15 18:30:00' (+ opcjonalnie '+02:00') jako datetime ze strefą albo None"""
+    value = clean_text(value)
+    try:
+        taken = datetime.strptime(value[:19], '%Y:%m:%d %H:%M:%S')
+    except ValueError:
+        return None
+
+    offset = clean_text(offset)
+    try:
+        sign = -1 if offset.startswith('-') else 1
+        hours, minutes = offset.lstrip('+-').split(':')
+        taken = taken.replace(tzinfo=dt_timezone(sign * timedelta(hours=int(hours), minutes=int(minutes))))
+    except ValueError:
+        # Bez przesunięcia w EXIF aparat zapisuje czas lokalny - przyjmujemy strefę wesela
+        taken = timezone.make_aware(taken)
+
+    # Aparaty z nieustawionym zegarem zapisują np. 2000-01-01 albo datę z przyszłości
+    if not EARLIEST_CAPTURE <= taken <= timezone.now() + timedelta(days=1):
+        return None
+    return taken
+
+
+def camera_name(make, model):
+    make, model = clean_text(make), clean_text(model)
+    if make and model.lower().startswith(make.split()[0].lower()):
+        return model[:100]
+    return f'{make} {model}'.strip()[:100]
+
+
+def read_metadata(source):
+    """Metadane z nagłówka obrazu (plik, ścieżka albo strumień) - piksele nie są dekodowane"""
+    try:
+        with Image.open(source) as image:
+            width, height = image.size
+            exif = image.getexif()
+    finally:
+        if hasattr(source, 'seek'):
+            source.seek(0)
+
+    orientation = exif.get(ORIENTATION, 1)
+    if orientation not in range(1, 9):
+        orientation = 1
+    if orientation in ROTATED_ORIENTATIONS:
+        # Zapisujemy wymiary wyświetlanego zdjęcia, nie pikseli w pliku
+        width, height = height, width
+
+    details = exif.get_ifd(EXIF_IFD)
+    taken_at = (
+        parse_exif_datetime(details.get(DATETIME_ORIGINAL), details.get(OFFSET_TIME_ORIGINAL))
+        or parse_exif_datetime(details.get(DATETIME_DIGITIZED), details.get(OFFSET_TIME_ORIGINAL))
+        or parse_exif_datetime(exif.get(DATETIME), details.get(OFFSET_TIME))
+    )
+    return {
+        'taken_at': taken_at,
+        'width': width,
+        'height': height,
+        'orientation': orientation,
+        'camera': camera_name(exif.get(MAKE), exif.get(MODEL)),
+    }
+
+
+def apply_metadata(photo, metadata):
+    """Przepisuje metadane na zdjęcie; captured_at to czas z EXIF albo (bez niego) czas przesłania"""
+    for field, value in metadata.items():
+        setattr(photo, field, value)
+    photo.captured_at = metadata['taken_at'] or photo.upload_date or photo.captured_at or timezone.now()
+
+
+def read_stored_metadata(name):
+    """Metadane zapisanego pliku (storage albo stary pełny adres URL) - do uzupełniania starych zdjęć"""
+    from .backup import open_source
+
+    source = open_source(name)
+    try:
+        # Strumień z sieci nie wspiera seek(), a Pillow go potrzebuje
+        return read_metadata(BytesIO(source.read()))
+    finally:
+        source.close()
+
+
+def capture_cursor(photo):
+    # Całkowite mikrosekundy - float z timestamp() potrafi zgubić jedną i zdjęcie na granicy stron
+    return f'{(photo.captured_at - EPOCH) // MICROSECOND}.{photo.id}'
+
+
+def parse_cursor(value):
+    """(captured_at, id) z kursora 'mikrosekundy.id'"""
+    try:
+        micros, photo_id = value.split('.')
+        captured_at = EPOCH + int(micros) * MICROSECOND
+        return captured_at, int(photo_id)
+    except (ValueError, OverflowError, OSError):
+        raise CursorError('Nieprawidłowy kursor')
+
+
+def capture_page(photos, after='', limit=CAPTURE_PAGE_SIZE, descending=False):
+    """Strona zdjęć w kolejności zrobienia (po kluczu, bez OFFSET) i kursor następnej strony"""
+    limit = max(1, min(limit, MAX_CAPTURE_PAGE_SIZE))
+    if after:
+        captured_at, photo_id = parse_cursor(after)
+        # Zakres captured_at >= kursor (bez OR) - baza czyta indeks od kursora, już w kolejności
+        if descending:
+            photos = photos.filter(captured_at__lte=captured_at).exclude(captured_at=captured_at, id__gte=photo_id)
+        else:
+            photos = photos.filter(captured_at__gte=captured_at).exclude(captured_at=captured_at, id__lte=photo_id)
+    ordering = ('-captured_at', '-id') if descending else ('captured_at', 'id')
+    page = list(photos.order_by(*ordering)[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+    return page, capture_cursor(page[-1]) if has_more else ''
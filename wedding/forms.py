@@ -1,6 +1,8 @@
 from django import forms
+from django.conf import settings
 from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Layout, Submit, Row, Column, Field, HTML
+from .imaging import image_size, max_pixels
 from .models import Photo
 
 class MultipleFileInput(forms.ClearableFileInput):
@@ -60,6 +62,9 @@ class MultiPhotoUploadForm(forms.Form):
         label="Komentarz (opcjonalnie)"
     )
     
+    # Przeglądarka zmniejszyła zdjęcia do PHOTO_MAX_DIMENSION - serwer nie musi tego robić ponownie
+    client_resized = forms.BooleanField(required=False, widget=forms.HiddenInput)
+    
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.helper = FormHelper()
@@ -83,8 +88,34 @@ class MultiPhotoUploadForm(forms.Form):
                    css_class='btn btn-custom-primary btn-lg btn-block', 
                    id='upload-button'),
             HTML('<div id="upload-progress" class="mt-3" style="display: none;"></div>'),
-            HTML('</div>')
+            HTML('</div>'),
+            Field('client_resized'),
         )
+    
+    def clean(self):
+        """Deklaracji przeglądarki nie ufamy - każdy plik musi naprawdę mieścić się w limicie wymiarów"""
+        cleaned_data = super().clean()
+        photos = cleaned_data.get('photos') or []
+        if not isinstance(photos, list):
+            photos = [photos]
+        
+        for uploaded_file in photos:
+            # Limit pikseli z nagłówka - taki plik zająłby setki MB pamięci przy dekodowaniu
+            size = image_size(uploaded_file)
+            if size and size[0] * size[1] > max_pixels():
+                raise forms.ValidationError(
+                    f'Zdjęcie {uploaded_file.name} jest za duże ({size[0]}x{size[1]}, '
+                    f'limit {max_pixels() / 1_000_000:g} MP).'
+                )
+            uploaded_file.presized = bool(cleaned_data.get('client_resized')) and fits_dimensions(
+                uploaded_file, settings.PHOTO_MAX_DIMENSION
+            )
+        return cleaned_data
+
+def fits_dimensions(uploaded_file, max_dimension):
+    """Czy obraz mieści się w max_dimension (czyta tylko nagłówek pliku)"""
+    size = image_size(uploaded_file)
+    return size is not None and max(size) <= max_dimension
 
 class TableSearchForm(forms.Form):
     search_query = forms.CharField(
@@ -0,0 +1,69 @@
+"""Kompaktowy spis gości do wyszukiwania stolika w przeglądarce (także bez sieci).
+
+Spis zawiera tylko to, czego potrzebuje wyszukiwarka: imię i nazwisko, stół
+i miejsce oraz indeks znormalizowanych słów imienia i nazwiska. Przeglądarka
+pobiera go raz, service worker trzyma go w cache, a każde wyszukiwanie
+rozwiązywane jest lokalnie. Wersją spisu jest wersja planu sali - zmienia się
+przy każdej zmianie gości, stołów i miejsc, więc klient pobiera spis ponownie
+tylko wtedy, gdy lista gości rzeczywiście się zmieniła.
+
+Format (JSON):
+    {"version": 1718000000000,
+     "guests": [[id, "Jan Kowalski", numer_stołu, miejsce], ...],
+     "tokens": {"jan": [0], "kowalski": [0, 7], ...},   # słowo -> indeksy w "guests"
+     "tables": {"3": "Stół Rodziny"}}
+"""
+import json
+import re
+import unicodedata
+
+from django.core.cache import cache
+
+from .seating import PLAN_CACHE_TIMEOUT, seating_plan_version
+
+# Litery, których NFKD nie rozkłada na literę bazową i znak diakrytyczny
+_EXTRA_FOLDING = str.maketrans({'ł': 'l', 'Ł': 'l', 'ø': 'o', 'đ': 'd', 'ß': 'ss'})
+_TOKEN_SPLIT = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_tokens(text):
+    """Słowa bez polskich znaków i wielkich liter - tak samo normalizuje guest_directory.js"""
+    text = unicodedata.normalize('NFKD', (text or '').translate(_EXTRA_FOLDING))
+    text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+    return [token for token in _TOKEN_SPLIT.split(text) if token]
+
+
+def build_guest_directory(version):
+    from .models import Guest, Table
+
+    guests = []
+    tokens = {}
+    queryset = (
+        Guest.objects.select_related('user')
+        .order_by('user__last_name', 'user__first_name', 'id')
+        .only('id', 'table_number', 'chair_position', 'user__first_name', 'user__last_name')
+    )
+    for index, guest in enumerate(queryset):
+        guests.append([guest.id, guest.full_name, guest.table_number, guest.chair_position])
+        for token in set(normalize_tokens(guest.full_name)):
+            tokens.setdefault(token, []).append(index)
+
+    tables = {str(number): name for number, name in Table.objects.values_list('number', 'name')}
+    return {
+        'version': version,
+        'guests': guests,
+        'tokens': tokens,
+        'tables': tables,
+    }
+
+
+def guest_directory_json():
+    """Zserializowany spis - budowany raz na wersję i trzymany w cache"""
+    version = seating_plan_version()
+    cache_key = f'guest_directory:{version}'
+    body = cache.get(cache_key)
+    if body is None:
+        # Wersja odczytana przed budowaniem - przy równoległej zmianie klient i tak pobierze nowszą
+        body = json.dumps(build_guest_directory(version), ensure_ascii=False, separators=(',', ':'))
+        cache.set(cache_key, body, PLAN_CACHE_TIMEOUT)
+    return version, body
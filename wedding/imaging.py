@@ -0,0 +1,232 @@
+"""Szybkie zmniejszanie zdjęć.
+
+Zdjęcie z telefonu (12-50 MP) zdekodowane w całości do RGB to 36-150 MB
+w pamięci workera i kilkaset ms pracy, nawet gdy potrzebujemy miniatury
+300x300. Dlatego:
+
+- liczbę pikseli sprawdzamy z nagłówka, zanim cokolwiek zdekodujemy
+  (PHOTO_MAX_PIXELS) - zbyt duży plik kończy się ImageTooLarge,
+- JPEG dekodujemy od razu w skali 1/2, 1/4 albo 1/8 (draft) - najmniejszej,
+  która nadal daje co najmniej docelowy rozmiar,
+- inne formaty najpierw tanio zmniejsza reduce() (średnia z bloków pikseli),
+  a LANCZOS dostaje tylko końcówkę,
+- obrót według EXIF robimy na już zmniejszonym obrazie.
+
+Czas i największy bufor obrazu każdej operacji trafiają do STATS, a paczki
+zdjęć (komendy) przetwarza pula procesów ograniczona przez
+PHOTO_PROCESS_WORKERS, więc szczyt pamięci to co najwyżej liczba procesów
+razy jedno zdjęcie.
+"""
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+from .exif import ROTATED_ORIENTATIONS
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_MAX_PIXELS = 64_000_000         # aparaty 50 MP mieszczą się z zapasem
+DEFAULT_PROCESS_WORKERS = 4
+REDUCING_GAP = 2.0                      # reduce() zostawia LANCZOS-owi co najmniej 2x docelowego rozmiaru
+
+
+class ImageTooLarge(ValueError):
+    """Obraz ma więcej pikseli niż PHOTO_MAX_PIXELS - nie dekodujemy go"""
+
+
+class ImageStats:
+    """Liczniki czasu i pamięci operacji na obrazach w bieżącym procesie"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.source_pixels = 0
+        self.decoded_pixels = 0
+        self.peak_bytes = 0
+        self.peak_rss = None
+        self.last = None
+
+    def record(self, seconds, source_pixels, decoded_pixels, peak_bytes):
+        self.last = {
+            'seconds': seconds,
+            'source_pixels': source_pixels,
+            'decoded_pixels': decoded_pixels,
+            'peak_bytes': peak_bytes,
+        }
+        self.merge(self.last)
+
+    def merge(self, record):
+        """Dolicza pojedynczy pomiar - także zwrócony przez proces z puli"""
+        self.calls += 1
+        self.seconds += record['seconds']
+        self.source_pixels += record['source_pixels']
+        self.decoded_pixels += record['decoded_pixels']
+        self.peak_bytes = max(self.peak_bytes, record['peak_bytes'])
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'total_ms': round(self.seconds * 1000, 1),
+            'mean_ms': round(self.seconds * 1000 / self.calls, 2) if self.calls else 0.0,
+            # Ile pikseli faktycznie zdekodowaliśmy względem pełnych zdjęć
+            'decoded_ratio': round(self.decoded_pixels / self.source_pixels, 3) if self.source_pixels else 0.0,
+            'peak_image_mb': round(self.peak_bytes / 1024 / 1024, 1),
+            'peak_rss_mb': self.peak_rss if self.peak_rss is not None else peak_rss_mb(),
+        }
+
+
+STATS = ImageStats()
+
+
+def peak_rss_mb(children=False):
+    """Szczyt pamięci procesu albo największego zakończonego procesu potomnego (None, gdy system go nie podaje)"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # macOS podaje bajty, Linux kilobajty
+    return round(usage / 1024 / 1024 if sys.platform == 'darwin' else usage / 1024, 1)
+
+
+def max_pixels():
+    return getattr(settings, 'PHOTO_MAX_PIXELS', DEFAULT_MAX_PIXELS)
+
+
+def image_bytes(image):
+    return image.width * image.height * len(image.getbands())
+
+
+def open_image(source):
+    """Otwiera obraz (czyta tylko nagłówek) i odrzuca zbyt duże przed dekodowaniem"""
+    image = Image.open(source)
+    if image.width * image.height > max_pixels():
+        image.close()
+        raise ImageTooLarge(
+            f'Obraz {image.width}x{image.height} przekracza limit {max_pixels() / 1_000_000:g} MP'
+        )
+    return image
+
+
+def image_size(source):
+    """(szerokość, wysokość) z nagłówka albo None, gdy to nie jest obraz"""
+    try:
+        with Image.open(source) as image:
+            return image.size
+    except Exception:
+        return None
+    finally:
+        if hasattr(source, 'seek'):
+            source.seek(0)
+
+
+def fitted_size(size, max_size):
+    """Rozmiar po zmniejszeniu do max_size z zachowaniem proporcji (bez powiększania)"""
+    scale = min(max_size[0] / size[0], max_size[1] / size[1], 1.0)
+    return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
+
+def target_mode(image, mode):
+    if mode:
+        return mode
+    return 'RGBA' if image.has_transparency_data else 'RGB'
+
+
+def load_downscaled(source, max_size, mode='RGB'):
+    """Obraz zmniejszony do max_size (po obrocie EXIF), dekodowany w najmniejszej wystarczającej skali
+
+    mode=None zachowuje przezroczystość (RGBA), inaczej obraz jest konwertowany do podanego trybu.
+    """
+    started = time.perf_counter()
+    with open_image(source) as image:
+        source_pixels = image.width * image.height
+        orientation = image.getexif().get(0x0112, 1)
+        # Zmniejszamy przed obrotem - docelowy rozmiar liczymy w orientacji zapisanej w pliku
+        box = (max_size[1], max_size[0]) if orientation in ROTATED_ORIENTATIONS else max_size
+        target = fitted_size(image.size, box)
+
+        image.draft('L' if mode == 'L' else None, target)
+        image.load()
+        decoded_pixels = image.width * image.height
+        peak = image_bytes(image)
+
+        working_mode = target_mode(image, mode)
+        if image.mode != working_mode:
+            image = image.convert(working_mode)
+            peak = max(peak, image_bytes(image))
+
+        factor = int(min(image.width / (target[0] * REDUCING_GAP), image.height / (target[1] * REDUCING_GAP)))
+        if factor > 1:
+            image = image.reduce(factor)
+        if image.size != target:
+            image = image.resize(target, Image.Resampling.LANCZOS)
+        image = ImageOps.exif_transpose(image)
+
+    STATS.record(time.perf_counter() - started, source_pixels, decoded_pixels, peak)
+    return image
+
+
+def save_downscaled(source, target, max_size, quality=90, format=None, mode=None, only_if_larger=False, **save_options):
+    """Zmniejsza obraz i zapisuje go do target (ścieżka albo plik); zwraca False, gdy nic nie zapisano
+
+    Przy only_if_larger obraz mieszczący się w max_size zostaje nietknięty (bez dekodowania).
+    Zachowujemy EXIF (z poprawioną orientacją) i profil kolorów.
+    """
+    if only_if_larger:
+        size = image_size(source)
+        if size is not None and size[0] <= max_size[0] and size[1] <= max_size[1]:
+            return False
+
+    image = load_downscaled(source, max_size, mode=mode)
+    if format is None and isinstance(target, str):
+        format = Image.registered_extensions().get(os.path.splitext(target)[1].lower())
+    if format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    for key in ('exif', 'icc_profile'):
+        if image.info.get(key):
+            save_options.setdefault(key, image.info[key])
+    image.save(target, format=format, quality=quality, **save_options)
+    return True
+
+
+def process_workers(workers=None):
+    limit = getattr(settings, 'PHOTO_PROCESS_WORKERS', DEFAULT_PROCESS_WORKERS)
+    return max(1, min(workers or limit, limit, os.cpu_count() or 1))
+
+
+def downscale_job(job):
+    """Zadanie dla puli procesów: (źródło, cel, max_size, jakość) -> (cel, zapisano, błąd, pomiar)"""
+    source, target, max_size, quality = job
+    try:
+        saved = save_downscaled(source, target, max_size, quality=quality, only_if_larger=True, optimize=True)
+    except Exception as e:
+        return target, False, str(e), None
+    return target, saved, None, STATS.last if saved else None
+
+
+def downscale_batch(jobs, workers=None, progress=None):
+    """Zmniejsza paczkę plików w ograniczonej puli procesów; zwraca (zapisane, błędy, ImageStats)"""
+    stats = ImageStats()
+    saved, errors = [], []
+    with ProcessPoolExecutor(max_workers=process_workers(workers)) as executor:
+        for done, (target, was_saved, error, record) in enumerate(
+            executor.map(downscale_job, jobs, chunksize=4), start=1
+        ):
+            if error:
+                errors.append((target, error))
+            elif was_saved:
+                saved.append(target)
+                stats.merge(record)
+            if progress:
+                progress(done, len(jobs))
+    # Po zamknięciu puli - szczyt pamięci liczy się dla procesów, które faktycznie dekodowały zdjęcia
+    stats.peak_rss = peak_rss_mb(children=True)
+    return saved, errors, stats
@@ -0,0 +1,179 @@
+"""Automatyczne rozmieszczanie stołów na planie sali (mapa 900x600).
+
+Stoły układamy półkami (rzędami) od lewego górnego rogu. Kolizje ze stołami
+już postawionymi i z elementami stałymi (stół Pary Młodej, parkiet) sprawdza
+siatka przestrzenna, więc każdy test dotyczy tylko kilku sąsiednich komórek.
+Jeśli stoły się nie mieszczą, zmniejszamy je proporcjonalnie (wyszukiwanie
+binarne skali), zachowując minimalny odstęp przejść między nimi.
+"""
+
+ROOM_WIDTH = 900
+ROOM_HEIGHT = 600
+DEFAULT_AISLE = 30
+DEFAULT_MARGIN = 20
+MIN_SCALE = 0.3
+
+
+class LayoutError(ValueError):
+    """Stoły nie mieszczą się na sali nawet po zmniejszeniu"""
+
+
+class SpatialGrid:
+    """Siatka kubełków - każdy prostokąt trafia do wszystkich komórek, które przykrywa"""
+
+    def __init__(self, cell_size):
+        self.cell_size = max(cell_size, 1)
+        self.cells = {}
+
+    def _cells(self, left, top, right, bottom):
+        size = self.cell_size
+        for cx in range(int(left // size), int(right // size) + 1):
+            for cy in range(int(top // size), int(bottom // size) + 1):
+                yield cx, cy
+
+    def insert(self, rect):
+        for cell in self._cells(*rect):
+            self.cells.setdefault(cell, []).append(rect)
+
+    def collision(self, rect):
+        """Pierwszy prostokąt nachodzący na rect albo None"""
+        left, top, right, bottom = rect
+        for cell in self._cells(*rect):
+            for other in self.cells.get(cell, ()):
+                if left < other[2] and other[0] < right and top < other[3] and other[1] < bottom:
+                    return other
+        return None
+
+
+def _bounds(x, y, width, height, padding=0):
+    """Prostokąt (left, top, right, bottom) ze środka i wymiarów, powiększony o padding"""
+    return (x - width / 2 - padding, y - height / 2 - padding,
+            x + width / 2 + padding, y + height / 2 + padding)
+
+
+def _pack(items, anchors, scale, room, aisle, margin):
+    """Jedna próba ułożenia przy danej skali - zwraca {klucz: (x, y)} albo None"""
+    room_width, room_height = room
+    sizes = {key: (width * scale, height * scale) for key, width, height in items}
+    largest = max(max(size) for size in sizes.values())
+    grid = SpatialGrid(largest + aisle)
+    # Każdy prostokąt powiększamy o pół przejścia - dwa sąsiednie dają razem pełny odstęp "aisle"
+    for x, y, width, height in anchors:
+        grid.insert(_bounds(x, y, width, height, aisle / 2))
+
+    positions = {}
+    rows = []
+    row = []
+    cursor_x, row_top, row_height = margin, margin, 0
+
+    for key, _width, _height in items:
+        width, height = sizes[key]
+        while True:
+            if cursor_x + width > room_width - margin:
+                # Nowa półka
+                if row:
+                    rows.append(row)
+                row = []
+                row_top += row_height + aisle
+                cursor_x, row_height = margin, 0
+            if row_top + height > room_height - margin:
+                return None
+
+            x, y = cursor_x + width / 2, row_top + height / 2
+            rect = _bounds(x, y, width, height, aisle / 2)
+            obstacle = grid.collision(rect)
+            if obstacle is None:
+                break
+            # Przeskakujemy za przeszkodę (jej prawa krawędź ma już doliczone pół przejścia)
+            cursor_x = max(cursor_x + 1, obstacle[2] + aisle / 2)
+
+        grid.insert(rect)
+        positions[key] = (x, y)
+        row.append(key)
+        cursor_x += width + aisle
+        row_height = max(row_height, height)
+    if row:
+        rows.append(row)
+
+    _justify(rows, positions, sizes, anchors, room, aisle, margin)
+    return positions
+
+
+def _justify(rows, positions, sizes, anchors, room, aisle, margin):
+    """Rozkłada półki równomiernie w pionie i centruje je w poziomie, jeśli nic nie koliduje"""
+    room_width, room_height = room
+    bottom = max(positions[key][1] + sizes[key][1] / 2 for key in positions)
+    extra_y = max(room_height - margin - bottom, 0)
+    step_y = extra_y / len(rows) if len(rows) > 1 else extra_y / 2
+
+    # Od dołu, żeby przesuwany rząd nie wjechał na nieprzesunięty jeszcze rząd poniżej
+    for index, row in reversed(list(enumerate(rows))):
+        right = max(positions[key][0] + sizes[key][0] / 2 for key in row)
+        shift_x = max(room_width - margin - right, 0) / 2
+        shift_y = step_y * (index + 0.5) if len(rows) > 1 else step_y
+        candidate = {key: (positions[key][0] + shift_x, positions[key][1] + shift_y) for key in row}
+
+        # Sprawdzamy przesunięty rząd względem elementów stałych i pozostałych stołów
+        grid = SpatialGrid(max(max(sizes[key]) for key in positions) + aisle)
+        for x, y, width, height in anchors:
+            grid.insert(_bounds(x, y, width, height, aisle / 2))
+        for key, (x, y) in positions.items():
+            if key not in candidate:
+                grid.insert(_bounds(x, y, sizes[key][0], sizes[key][1], aisle / 2))
+        if all(grid.collision(_bounds(x, y, sizes[key][0], sizes[key][1], aisle / 2)) is None
+               for key, (x, y) in candidate.items()):
+            positions.update(candidate)
+
+
+def layout_tables(items, anchors=(), room=(ROOM_WIDTH, ROOM_HEIGHT), aisle=DEFAULT_AISLE, margin=DEFAULT_MARGIN):
+    """Liczy pozycje stołów bez nakładania się.
+
+    items - lista (klucz, szerokość, wysokość) w kolejności układania (np. wg numeru stołu)
+    anchors - elementy stałe (x, y, szerokość, wysokość): stoły, których nie ruszamy, parkiet
+    Zwraca (skala, {klucz: (x, y, szerokość, wysokość)}).
+    """
+    items = list(items)
+    if not items:
+        return 1.0, {}
+
+    positions = _pack(items, anchors, 1.0, room, aisle, margin)
+    scale = 1.0
+    if positions is None:
+        # Największa skala, przy której wszystko się mieści
+        low, high = MIN_SCALE, 1.0
+        if _pack(items, anchors, low, room, aisle, margin) is None:
+            raise LayoutError(f'{len(items)} stołów nie mieści się na sali nawet po zmniejszeniu')
+        for _ in range(12):
+            middle = (low + high) / 2
+            if _pack(items, anchors, middle, room, aisle, margin) is None:
+                high = middle
+            else:
+                low = middle
+        scale = low
+        positions = _pack(items, anchors, scale, room, aisle, margin)
+
+    sizes = {key: (width * scale, height * scale) for key, width, height in items}
+    return scale, {
+        key: (round(x, 1), round(y, 1), round(sizes[key][0], 1), round(sizes[key][1], 1))
+        for key, (x, y) in positions.items()
+    }
+
+
+def auto_layout(tables, fixed_tables=(), extra_anchors=(), aisle=DEFAULT_AISLE):
+    """Rozmieszcza stoły (modele Table) i zapisuje je jednym bulk_update"""
+    from .models import Table
+    from .seating import invalidate_seating_plan
+
+    tables = sorted(tables, key=lambda table: table.number)
+    anchors = [(t.map_x, t.map_y, t.map_width, t.map_height) for t in fixed_tables]
+    anchors.extend(extra_anchors)
+    scale, positions = layout_tables(
+        [(table.number, table.map_width, table.map_height) for table in tables],
+        anchors=anchors,
+        aisle=aisle,
+    )
+    for table in tables:
+        table.map_x, table.map_y, table.map_width, table.map_height = positions[table.number]
+    Table.objects.bulk_update(tables, ['map_x', 'map_y', 'map_width', 'map_height'])
+    invalidate_seating_plan()
+    return scale
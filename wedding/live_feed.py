@@ -0,0 +1,97 @@
+"""Live feed nowo zatwierdzonych i wyróżnionych zdjęć (Server-Sent Events).
+
+Źródłem prawdy jest tabela PhotoEvent - id rekordu to numer zdarzenia, od
+którego klient wznawia połączenie (nagłówek Last-Event-ID). Numer ostatniego
+zdarzenia trzymamy dodatkowo w cache, żeby setki otwartych połączeń nie
+odpytywały bazy co kilka sekund - do bazy idziemy dopiero, gdy licznik się
+przesunie.
+"""
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models import Max
+
+SEQUENCE_CACHE_KEY = 'photo_events:last_id'
+# Licznik w cache wygasa szybko - procesy bez wspólnego cache i tak zobaczą nowe zdarzenia
+SEQUENCE_CACHE_TIMEOUT = 5
+POLL_INTERVAL = 2
+HEARTBEAT_INTERVAL = 15
+# Poniżej typowych timeoutów proxy (Heroku/nginx) - przeglądarka sama wznowi połączenie
+STREAM_DURATION = 50
+# Jak długo przeglądarka czeka z ponownym połączeniem (ms), gdy serwer nie trzyma strumienia
+RETRY_MS = 10000
+MAX_EVENTS = 50
+
+
+def bump_event_sequence():
+    """Odświeża licznik po zapisaniu nowych zdarzeń"""
+    cache.delete(SEQUENCE_CACHE_KEY)
+    latest_event_id()
+
+
+def latest_event_id():
+    """Numer ostatniego zdarzenia (z cache, a przy braku - z bazy)"""
+    from .models import PhotoEvent
+
+    last_id = cache.get(SEQUENCE_CACHE_KEY)
+    if last_id is None:
+        last_id = PhotoEvent.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+        cache.set(SEQUENCE_CACHE_KEY, last_id, SEQUENCE_CACHE_TIMEOUT)
+    return last_id
+
+
+def events_after(last_id, limit=MAX_EVENTS):
+    """Zdarzenia nowsze niż last_id jako słowniki gotowe do wysłania"""
+    from .models import PhotoEvent
+
+    if latest_event_id() <= last_id:
+        return []
+    # Zdjęcie mogło zostać od tamtej pory wycofane z galerii - takich zdarzeń już nie wysyłamy
+    events = (
+        PhotoEvent.objects.filter(id__gt=last_id, photo__approved=True)
+        .select_related('photo', 'photo__uploaded_by')
+        .order_by('id')[:limit]
+    )
+    return [event.as_payload() for event in events]
+
+
+def parse_last_event_id(request):
+    """Numer zdarzenia, od którego wznawiamy - nagłówek ma pierwszeństwo przed parametrem"""
+    raw = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id') or request.GET.get('after')
+    try:
+        return max(int(raw), 0)
+    except (TypeError, ValueError):
+        # Pierwsze połączenie bez numeru - nie odtwarzamy historii
+        return None
+
+
+def format_event(payload):
+    return f"id: {payload['id']}\nevent: {payload['kind']}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def format_preamble(last_id):
+    # Samo "id:" ustawia numer wznowienia w przeglądarce, nawet jeśli nic nie przyszło
+    return f"retry: {RETRY_MS}\nid: {last_id}\n\n"
+
+
+async def stream_events(last_id, duration=STREAM_DURATION):
+    """Asynchroniczny strumień SSE - jedno połączenie trzyma tylko korutynę, nie wątek"""
+    yield format_preamble(last_id)
+
+    started = time.monotonic()
+    last_write = started
+    while time.monotonic() - started < duration:
+        payloads = await sync_to_async(events_after)(last_id)
+        if payloads:
+            for payload in payloads:
+                last_id = payload['id']
+                yield format_event(payload)
+            last_write = time.monotonic()
+            continue
+        if time.monotonic() - last_write >= HEARTBEAT_INTERVAL:
+            yield ': ping\n\n'
+            last_write = time.monotonic()
+        await asyncio.sleep(POLL_INTERVAL)
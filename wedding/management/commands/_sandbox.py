@@ -0,0 +1,62 @@
+"""Tymczasowe środowisko dla narzędzi wydajnościowych (loadtest, benchmarki).
+
+Tworzy osobną bazę testową i katalog mediów w katalogu tymczasowym, żeby
+pomiary nigdy nie dotykały prawdziwych danych ani Cloudinary.
+"""
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.db import connections
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+from wedding.renditions import wait_for_local_renditions
+
+
+@contextmanager
+def sandbox(verbosity=0):
+    """Uruchamia blok kodu na świeżej bazie i lokalnym storage'u mediów"""
+    tmp_dir = tempfile.mkdtemp(prefix='wedding_sandbox_')
+    media_root = os.path.join(tmp_dir, 'media')
+    storages = {
+        'default': {
+            'BACKEND': 'django.core.files.storage.FileSystemStorage',
+            'OPTIONS': {'location': media_root, 'base_url': '/media/'},
+        },
+        'staticfiles': {
+            'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+        },
+    }
+
+    connection = connections['default']
+    old_test_name = connection.settings_dict['TEST'].get('NAME')
+    if connection.vendor == 'sqlite':
+        # Baza w pliku zamiast w pamięci - wątki klientów muszą ją współdzielić
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tmp_dir, 'db.sqlite3')
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(
+        verbosity=verbosity, autoclobber=True, serialize=False
+    )
+    try:
+        with override_settings(
+            USE_CLOUDINARY=False,
+            MEDIA_ROOT=media_root,
+            MEDIA_URL='/media/',
+            STORAGES=storages,
+        ):
+            try:
+                yield tmp_dir
+            finally:
+                # Warianty renderowane w tle muszą skończyć, zanim zniknie baza i katalog mediów
+                wait_for_local_renditions()
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        connection.settings_dict['TEST']['NAME'] = old_test_name
+        teardown_test_environment()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -1,76 +1,82 @@
-import os
-import shutil
-from datetime import datetime
-from django.core.management.base import BaseCommand
-from django.conf import settings
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from wedding.backup import prune_backup, run_backup, write_archive
 from wedding.models import Photo
 
+
 class Command(BaseCommand):
-    help = 'Backup all wedding photos'
+    help = (
+        'Incremental backup of all wedding photos. Files are read through the storage API '
+        '(local disk or Cloudinary), and a manifest in the destination directory lets reruns '
+        'fetch only new or changed photos.'
+    )
 
     def add_arguments(self, parser):
         parser.add_argument(
             '--destination',
             type=str,
-            help='Destination directory for backup',
-            default=f'backup_photos_{datetime.now().strftime("%Y%m%d_%H%M%S")}'
+            help='Backup directory - keep the same one between runs so only changes are copied',
+            default='backup_photos'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Parallel downloads (default: 8)'
+        )
+        parser.add_argument(
+            '--archive',
+            type=str,
+            help='Also write a single archive of the backup (.zip, .tar or .tar.gz)'
+        )
+        parser.add_argument(
+            '--approved-only',
+            action='store_true',
+            help='Back up approved photos only'
+        )
+        parser.add_argument(
+            '--prune',
+            action='store_true',
+            help='Remove photos deleted from the database from the backup'
         )
 
     def handle(self, *args, **options):
         destination = options['destination']
-        
-        # Create backup directory
-        if not os.path.exists(destination):
-            os.makedirs(destination)
-            self.stdout.write(f'Created backup directory: {destination}')
+        archive = options['archive']
+        if archive and not archive.endswith(('.zip', '.tar', '.tar.gz', '.tgz')):
+            raise CommandError('--archive must end with .zip, .tar or .tar.gz')
+
+        photos = Photo.objects.select_related('uploaded_by', 'blob').order_by('id')
+        if options['approved_only']:
+            photos = photos.filter(approved=True)
 
-        photos = Photo.objects.all()
-        copied_count = 0
-        error_count = 0
+        started = time.perf_counter()
+        result = run_backup(destination, photos, workers=options['workers'], progress=self.progress)
 
-        for photo in photos:
-            if photo.image and os.path.exists(photo.image.path):
-                try:
-                    # Create subdirectory by upload date
-                    date_dir = photo.upload_date.strftime('%Y-%m')
-                    dest_dir = os.path.join(destination, date_dir)
-                    
-                    if not os.path.exists(dest_dir):
-                        os.makedirs(dest_dir)
-                    
-                    # Copy file
-                    filename = os.path.basename(photo.image.path)
-                    dest_path = os.path.join(dest_dir, f"{photo.id}_{filename}")
-                    
-                    shutil.copy2(photo.image.path, dest_path)
-                    copied_count += 1
-                    
-                    # Create info file
-                    info_path = os.path.join(dest_dir, f"{photo.id}_{filename}.txt")
-                    with open(info_path, 'w', encoding='utf-8') as f:
-                        f.write(f"Title: {photo.title}\n")
-                        f.write(f"Description: {photo.description}\n")
-                        f.write(f"Category: {photo.get_category_display()}\n")
-                        f.write(f"Uploaded by: {photo.uploaded_by.get_full_name()}\n")
-                        f.write(f"Upload date: {photo.upload_date}\n")
-                        f.write(f"Approved: {photo.approved}\n")
-                    
-                except Exception as e:
-                    self.stdout.write(
-                        self.style.ERROR(f'Error copying {photo.title}: {e}')
-                    )
-                    error_count += 1
-            else:
-                self.stdout.write(
-                    self.style.WARNING(f'File not found for photo: {photo.title}')
-                )
-                error_count += 1
+        for photo, error in result.errors:
+            self.stdout.write(self.style.ERROR(f'Error copying {photo.title} (#{photo.id}): {error}'))
+
+        pruned = 0
+        if options['prune']:
+            pruned = prune_backup(destination, set(Photo.objects.values_list('id', flat=True)))
 
         self.stdout.write(
             self.style.SUCCESS(
-                f'Backup completed!\n'
-                f'Copied: {copied_count} files\n'
-                f'Errors: {error_count}\n'
+                f'Backup completed in {time.perf_counter() - started:.1f}s!\n'
+                f'Copied: {result.copied} files ({result.bytes / 1024 / 1024:.1f} MB)\n'
+                f'Unchanged: {result.skipped}\n'
+                f'Removed: {pruned}\n'
+                f'Errors: {len(result.errors)}\n'
                 f'Destination: {destination}'
             )
-        )
\ No newline at end of file
+        )
+
+        if archive:
+            count = write_archive(destination, archive)
+            self.stdout.write(self.style.SUCCESS(f'Archive written: {archive} ({count} files)'))
+
+    def progress(self, done, total):
+        if done % 100 == 0 or done == total:
+            self.stdout.write(f'  {done}/{total}')
@@ -0,0 +1,313 @@
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from io import StringIO
+
+import django
+import PIL
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+
+from ._sandbox import sandbox
+from .generate_fixture_data import render_photo
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Stałe wejścia - zmiana któregokolwiek unieważnia porównania z wcześniejszymi wynikami
+INPUT_SEED = 7
+LARGE_PHOTO = (4032, 3024)
+MEDIUM_PHOTO = (2048, 1536)
+FILENAMES = [
+    'IMG_20240615_183012.jpg', 'DSC_0042.JPG', 'pierwszy-taniec.jpeg', 'PHOTO_7781.png',
+    'tort_weselny_2024.jpg', '1718469012345.jpg', 'PIC-12-oczepiny.heic', 'WhatsApp Image 2024-06-15.jpeg',
+    'rodzina_panny_mlodej.jpg', 'zabawa do rana (2).jpg',
+] * 100
+SEARCH_QUERIES = ['an', 'nowak', 'Anna Now', 'kowalsk', 'Łucja', 'żak', 'zz', 'Piotr Kamiński', 'ska', 'Jó']
+FIXTURE_GUESTS = 300
+FIXTURE_TABLES = 30
+
+
+class Benchmark:
+    """Pojedynczy pomiar: setup() raz, before_each() przed każdym (bez pomiaru), run() mierzone"""
+
+    name = ''
+    description = ''
+    ops_per_call = 1
+
+    def __init__(self, work_dir):
+        self.work_dir = work_dir
+
+    def setup(self):
+        pass
+
+    def before_each(self):
+        pass
+
+    def run(self):
+        raise NotImplementedError
+
+
+class ImageBenchmark(Benchmark):
+    size = LARGE_PHOTO
+    orientation = 6
+
+    def setup(self):
+        name, _size = render_photo((
+            self.work_dir, f'input_{self.name}.jpg', INPUT_SEED, self.size[0], self.size[1],
+            self.orientation, '2024:06:15 18:30:00', ('Apple', 'iPhone 13'),
+        ))
+        self.source_path = os.path.join(self.work_dir, name)
+        self.target_path = os.path.join(self.work_dir, f'target_{self.name}.jpg')
+        with open(self.source_path, 'rb') as f:
+            self.source_bytes = f.read()
+
+    def before_each(self):
+        # Funkcje nadpisują plik w miejscu - każda iteracja dostaje świeżą kopię
+        shutil.copyfile(self.source_path, self.target_path)
+
+
+class CreateThumbnailBenchmark(ImageBenchmark):
+    name = 'utils.create_thumbnail'
+    description = '12 MP JPEG -> 300x300 thumbnail saved to storage'
+
+    def run(self):
+        from wedding.utils import create_thumbnail
+
+        image_file = ContentFile(self.source_bytes, name='benchmark.jpg')
+        if not create_thumbnail(image_file):
+            raise RuntimeError('create_thumbnail failed')
+
+
+class ResizeImageBenchmark(ImageBenchmark):
+    name = 'utils.resize_image'
+    description = '12 MP JPEG resized in place to 1200x1200'
+
+    def run(self):
+        from wedding.utils import resize_image
+
+        resize_image(type('ImageField', (), {'path': self.target_path})())
+
+
+class PhotoSaveResizeBenchmark(ImageBenchmark):
+    name = 'Photo.save resize'
+    description = '12 MP JPEG optimized in place to 2400px (local storage path of Photo.save)'
+
+    def run(self):
+        from wedding.utils import optimize_local_image
+
+        optimize_local_image(self.target_path, max_size=(2400, 2400), quality=95)
+
+
+class PhotoSaveMediumBenchmark(PhotoSaveResizeBenchmark):
+    name = 'Photo.save resize (3 MP)'
+    description = '3 MP JPEG passed through the Photo.save optimization (no resize needed)'
+    size = MEDIUM_PHOTO
+    orientation = 1
+
+
+class TitleBenchmark(Benchmark):
+    name = 'generate_title_from_filename'
+    description = f'{len(FILENAMES)} typical phone/camera filenames'
+    ops_per_call = len(FILENAMES)
+
+    def run(self):
+        from wedding.views import generate_title_from_filename
+
+        for filename in FILENAMES:
+            generate_title_from_filename(filename)
+
+
+class SeatingJsonBenchmark(Benchmark):
+    name = 'table_finder seating JSON'
+    description = f'build_tables_data + json.dumps for {FIXTURE_TABLES} tables / {FIXTURE_GUESTS} guests'
+
+    def run(self):
+        from wedding.views import build_tables_data
+
+        _tables, tables_data = build_tables_data()
+        json.dumps(tables_data, cls=DjangoJSONEncoder)
+
+
+class GuestSearchBenchmark(Benchmark):
+    name = 'guest search matching'
+    description = f'search_guests() first match for {len(SEARCH_QUERIES)} queries over {FIXTURE_GUESTS} guests'
+    ops_per_call = len(SEARCH_QUERIES)
+
+    def run(self):
+        from wedding.views import search_guests
+
+        for query in SEARCH_QUERIES:
+            search_guests(query).first()
+
+
+BENCHMARKS = [
+    CreateThumbnailBenchmark,
+    ResizeImageBenchmark,
+    PhotoSaveResizeBenchmark,
+    PhotoSaveMediumBenchmark,
+    TitleBenchmark,
+    SeatingJsonBenchmark,
+    GuestSearchBenchmark,
+]
+
+
+def max_rss_kb():
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS podaje bajty, Linux kilobajty
+    return usage // 1024 if sys.platform == 'darwin' else usage
+
+
+def measure(benchmark, min_time, min_iterations):
+    """Mierzy jeden benchmark - wywoływane w osobnym procesie, żeby szczyt RSS dotyczył tylko jego"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        rss_before = max_rss_kb()
+        benchmark.before_each()
+        benchmark.run()  # rozgrzewka
+
+        timings = []
+        deadline = time.perf_counter() + min_time
+        while len(timings) < min_iterations or time.perf_counter() < deadline:
+            benchmark.before_each()
+            started = time.perf_counter()
+            benchmark.run()
+            timings.append(time.perf_counter() - started)
+        rss_after = max_rss_kb()
+
+        # tracemalloc spowalnia kod, więc liczymy go w osobnej, niemierzonej iteracji
+        benchmark.before_each()
+        tracemalloc.start()
+        benchmark.run()
+        _current, peak_python = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    connections.close_all()
+    total = sum(timings)
+    return {
+        'description': benchmark.description,
+        'iterations': len(timings),
+        'ops_per_call': benchmark.ops_per_call,
+        'ops_per_sec': benchmark.ops_per_call * len(timings) / total if total else 0.0,
+        'mean_ms': statistics.mean(timings) * 1000,
+        'median_ms': statistics.median(timings) * 1000,
+        'min_ms': min(timings) * 1000,
+        'stdev_ms': statistics.stdev(timings) * 1000 if len(timings) > 1 else 0.0,
+        'peak_rss_kb': (rss_after - rss_before) if rss_before is not None else None,
+        'peak_python_kb': peak_python // 1024,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark image processing, search and serialization hot paths and save results as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            type=str,
+            default='',
+            help='Results file (default: benchmark-<git revision>.json)',
+        )
+        parser.add_argument('--compare', type=str, default='', help='Earlier results file to compare against')
+        parser.add_argument('--only', type=str, default='', help='Comma separated substrings of benchmark names')
+        parser.add_argument('--min-time', type=float, default=2.0, help='Minimum measured seconds per benchmark')
+        parser.add_argument('--min-iterations', type=int, default=5, help='Minimum iterations per benchmark')
+
+    def handle(self, *args, **options):
+        selected = BENCHMARKS
+        if options['only']:
+            patterns = [pattern.strip().lower() for pattern in options['only'].split(',')]
+            selected = [b for b in BENCHMARKS if any(p in b.name.lower() for p in patterns)]
+            if not selected:
+                raise CommandError('No benchmark matches --only')
+
+        revision = git_revision()
+        results = {
+            'revision': revision,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'pillow': PIL.__version__,
+            'platform': platform.platform(),
+            'benchmarks': {},
+        }
+
+        # fork: proces potomny dziedziczy tymczasową bazę i ustawienia, a szczyt RSS startuje od zera
+        context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+
+        self.stdout.write('Preparing throwaway database and inputs...')
+        with sandbox() as work_dir:
+            call_command('generate_fixture_data', guests=FIXTURE_GUESTS, tables=FIXTURE_TABLES,
+                         seed=INPUT_SEED, stdout=StringIO())
+
+            for benchmark_class in selected:
+                self.stdout.write(f'  {benchmark_class.name}...', ending='')
+                self.stdout.flush()
+                # Dane wejściowe przygotowuje rodzic - ich koszt nie wlicza się do szczytu pamięci
+                benchmark = benchmark_class(work_dir)
+                benchmark.setup()
+                args = (benchmark, options['min_time'], options['min_iterations'])
+                if context is not None:
+                    connections.close_all()
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                        row = executor.submit(measure, *args).result()
+                else:
+                    row = measure(*args)
+                results['benchmarks'][benchmark_class.name] = row
+                self.stdout.write(f' {row["ops_per_sec"]:.1f} ops/s')
+
+        previous = {}
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as f:
+                previous = json.load(f).get('benchmarks', {})
+
+        self.report(results, previous)
+
+        output = options['output'] or f'benchmark-{revision or "local"}.json'
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        self.stdout.write(self.style.SUCCESS(f'Results written to {output}'))
+
+    def report(self, results, previous):
+        self.stdout.write('\n' + '=' * 96)
+        self.stdout.write(f'BENCHMARK RESULTS ({results["revision"] or "working tree"})')
+        self.stdout.write('=' * 96)
+        self.stdout.write(
+            f'{"benchmark":<32} {"ops/s":>10} {"median ms":>10} {"stdev ms":>9} '
+            f'{"RSS KB":>9} {"py KB":>8} {"vs prev":>9}'
+        )
+        for name, row in results['benchmarks'].items():
+            change = ''
+            if name in previous and previous[name]['ops_per_sec']:
+                ratio = row['ops_per_sec'] / previous[name]['ops_per_sec']
+                change = f'{(ratio - 1) * 100:+.1f}%'
+            rss = row['peak_rss_kb'] if row['peak_rss_kb'] is not None else '-'
+            self.stdout.write(
+                f'{name:<32} {row["ops_per_sec"]:>10.1f} {row["median_ms"]:>10.2f} {row["stdev_ms"]:>9.2f} '
+                f'{rss:>9} {row["peak_python_kb"]:>8} {change:>9}'
+            )
@@ -0,0 +1,31 @@
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management.base import BaseCommand
+
+from wedding.precache import PRECACHE_MANIFEST_NAME, build_precache_manifest, source_files, write_precache_manifest
+
+
+class Command(BaseCommand):
+    help = (
+        'Write the service worker precache manifest (file URLs with content hashes and cache version). '
+        'collectstatic does this automatically; use this after collectstatic --no-post-process.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source',
+            action='store_true',
+            help='Hash the source static files instead of the collected STATIC_ROOT and only print the result',
+        )
+
+    def handle(self, *args, **options):
+        if options['source']:
+            manifest = build_precache_manifest(source_files())
+        else:
+            manifest = write_precache_manifest(staticfiles_storage)
+            self.stdout.write(f'Saved {PRECACHE_MANIFEST_NAME} in STATIC_ROOT')
+
+        for entry in manifest['files']:
+            self.stdout.write(f"  {entry['url']} ({entry['revision']})")
+        self.stdout.write(self.style.SUCCESS(
+            f"Cache version {manifest['version']} - {len(manifest['files'])} files"
+        ))
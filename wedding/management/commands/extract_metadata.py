@@ -0,0 +1,67 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+
+from wedding.exif import METADATA_FIELDS, apply_metadata, read_stored_metadata
+from wedding.models import Photo
+
+SAVE_EVERY = 500
+
+
+class Command(BaseCommand):
+    help = (
+        'Backfill EXIF metadata (capture time, dimensions, orientation, camera) for photos '
+        'uploaded before it was stored. Only file headers are parsed; photos without an EXIF '
+        'capture time keep their upload time as the chronological sort key.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Parallel file reads (default: 8)'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Re-read metadata for every photo, not only ones missing it'
+        )
+
+    def handle(self, *args, **options):
+        photos = Photo.objects.exclude(image='').only('id', 'image', 'upload_date', 'captured_at')
+        if not options['all']:
+            photos = photos.filter(width__isnull=True)
+        photos = list(photos.order_by('id'))
+
+        self.stdout.write(f'Photos to read: {len(photos)}')
+        started = time.perf_counter()
+        pending, updated, with_time, errors = [], 0, 0, 0
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            futures = {pool.submit(read_stored_metadata, photo.image.name): photo for photo in photos}
+            for done, future in enumerate(as_completed(futures), 1):
+                photo = futures[future]
+                try:
+                    metadata = future.result()
+                except Exception as e:
+                    errors += 1
+                    self.stdout.write(self.style.ERROR(f'Error reading {photo.image.name} (#{photo.id}): {e}'))
+                    continue
+                apply_metadata(photo, metadata)
+                with_time += metadata['taken_at'] is not None
+                pending.append(photo)
+                if len(pending) >= SAVE_EVERY:
+                    updated += Photo.objects.bulk_update(pending, METADATA_FIELDS)
+                    pending = []
+                if done % 100 == 0 or done == len(photos):
+                    self.stdout.write(f'  {done}/{len(photos)}')
+        if pending:
+            updated += Photo.objects.bulk_update(pending, METADATA_FIELDS)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Metadata extracted in {time.perf_counter() - started:.1f}s!\n'
+            f'Updated: {updated}\n'
+            f'With EXIF capture time: {with_time}\n'
+            f'Errors: {errors}'
+        ))
@@ -0,0 +1,66 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from wedding.media_gc import DELETE_BATCH_SIZE, MAX_ATTEMPTS, collect_garbage, find_orphans
+from wedding.models import StorageDeletion
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete photo files queued for removal (deleted photos, released blobs) from storage in '
+        'batches. With --reconcile, first list storage and queue files no photo refers to. '
+        'Run it periodically, e.g. nightly from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reconcile',
+            action='store_true',
+            help='Find orphaned files by diffing storage against the database'
+        )
+        parser.add_argument(
+            '--grace-hours',
+            type=int,
+            default=24,
+            help='Only treat files older than this as orphans (default: 24)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DELETE_BATCH_SIZE,
+            help=f'Files per delete call (default and Cloudinary maximum: {DELETE_BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would be deleted without deleting anything'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        if options['reconcile']:
+            orphans = find_orphans(timedelta(hours=options['grace_hours']))
+            self.stdout.write(f'Orphaned files in storage: {len(orphans)}')
+            for name in orphans[:20]:
+                self.stdout.write(f'  {name}')
+            if len(orphans) > 20:
+                self.stdout.write(f'  ... and {len(orphans) - 20} more')
+            if orphans and not dry_run:
+                StorageDeletion.queue(orphans, reason=StorageDeletion.ORPHAN)
+
+        batch_size = max(1, min(options['batch_size'], DELETE_BATCH_SIZE))
+        deleted, skipped, failed = collect_garbage(batch_size=batch_size, dry_run=dry_run)
+        stuck = StorageDeletion.objects.filter(attempts__gte=MAX_ATTEMPTS).count()
+
+        prefix = '[dry run] Would delete' if dry_run else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}: {deleted} files\n'
+            f'Still in use (dropped from queue): {skipped}\n'
+            f'Failed (will retry): {failed}'
+        ))
+        if stuck:
+            self.stdout.write(self.style.WARNING(
+                f'{stuck} files failed {MAX_ATTEMPTS} times and are no longer retried - see "Pliki do usunięcia" in the admin'
+            ))
@@ -0,0 +1,345 @@
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from PIL import Image
+
+from wedding.duplicates import dhash, format_hash
+from wedding.exif import ROTATED_ORIENTATIONS, apply_metadata, camera_name
+from wedding.models import WeddingInfo, Guest, Table, Photo
+from wedding.placeholders import compute_placeholder
+from wedding.seating import invalidate_seating_plan
+
+USERNAME_PREFIX = 'fixture_'
+PHOTO_DIR = 'photos/fixtures'
+TABLE_DESCRIPTION = 'Stół wygenerowany (dane testowe)'
+
+FEMALE_NAMES = [
+    'Anna', 'Katarzyna', 'Małgorzata', 'Agnieszka', 'Barbara', 'Ewa', 'Krystyna', 'Elżbieta',
+    'Zofia', 'Łucja', 'Jadwiga', 'Bożena', 'Grażyna', 'Halina', 'Józefa', 'Urszula',
+    'Wiesława', 'Danuta', 'Joanna', 'Magdalena', 'Aleksandra', 'Zuzanna', 'Maja', 'Hanna',
+    'Julia', 'Wiktoria', 'Oliwia', 'Natalia', 'Gabriela', 'Roksana', 'Jolanta', 'Teresa',
+]
+MALE_NAMES = [
+    'Piotr', 'Krzysztof', 'Tomasz', 'Paweł', 'Michał', 'Łukasz', 'Marcin', 'Grzegorz',
+    'Józef', 'Stanisław', 'Mikołaj', 'Bartłomiej', 'Wojciech', 'Jędrzej', 'Przemysław', 'Zbigniew',
+    'Mieczysław', 'Bolesław', 'Jarosław', 'Mirosław', 'Sławomir', 'Kacper', 'Maciej', 'Oskar',
+    'Jakub', 'Szymon', 'Filip', 'Antoni', 'Ignacy', 'Wiesław', 'Tadeusz', 'Dariusz',
+]
+# Nazwiska w formie męskiej - forma żeńska tworzona w feminine_surname()
+SURNAMES = [
+    'Nowak', 'Kowalski', 'Wiśniewski', 'Wójcik', 'Kowalczyk', 'Kamiński', 'Lewandowski',
+    'Zieliński', 'Szymański', 'Woźniak', 'Dąbrowski', 'Kozłowski', 'Jankowski', 'Mazur',
+    'Kwiatkowski', 'Krawczyk', 'Piotrowski', 'Grabowski', 'Nowakowski', 'Pawłowski', 'Michalski',
+    'Król', 'Wieczorek', 'Jabłoński', 'Wróbel', 'Zając', 'Stępień', 'Dudek', 'Żak', 'Gałązka',
+    'Stefański', 'Barański', 'Juzuń', 'Cadera', 'Sołtysiak', 'Łuczak', 'Ślusarczyk', 'Żółtowski',
+    'Chmielewski', 'Górecki', 'Sikorski', 'Ostrowski', 'Pietrzak', 'Kaczmarek', 'Wilczyński',
+]
+GUEST_GROUPS = [
+    'Rodzina Panny Młodej', 'Rodzina Pana Młodego', 'Przyjaciele', 'Znajomi z pracy', 'Sąsiedzi',
+]
+COMPANION_TYPE = 'osoba towarzysząca'
+
+# (szerokość, wysokość, waga) - przeważają zdjęcia z telefonów po kompresji komunikatorów
+PHOTO_SIZES = [
+    (800, 600, 3),
+    (1280, 960, 4),
+    (1600, 1200, 4),
+    (2048, 1536, 3),
+    (3024, 4032, 2),
+    (4032, 3024, 2),
+]
+EXIF_ORIENTATIONS = [1, 1, 1, 3, 6, 8]
+CAMERAS = [('Apple', 'iPhone 13'), ('samsung', 'SM-S911B'), ('Google', 'Pixel 7'), ('Canon', 'EOS R6')]
+
+
+def feminine_surname(surname):
+    for suffix, replacement in (('ski', 'ska'), ('cki', 'cka'), ('dzki', 'dzka')):
+        if surname.endswith(suffix):
+            return surname[:-len(suffix)] + replacement
+    return surname
+
+
+def render_photo(job):
+    """Generuje jeden plik zdjęcia (uruchamiane w puli procesów)"""
+    media_root, name, seed, width, height, orientation, taken_at, camera = job
+    rng = random.Random(seed)
+
+    # Gładki szum w niskiej rozdzielczości - szybko i z realistycznym rozmiarem JPEG
+    base = Image.linear_gradient('L').resize((width, height))
+    blobs = Image.effect_noise((max(width // 16, 1), max(height // 16, 1)), rng.randint(30, 80))
+    blobs = blobs.resize((width, height), Image.Resampling.BILINEAR)
+    channels = [base, blobs, base.transpose(Image.Transpose.FLIP_LEFT_RIGHT)]
+    rng.shuffle(channels)
+    image = Image.merge('RGB', channels)
+
+    exif = Image.Exif()
+    exif[0x0112] = orientation  # Orientation
+    exif[0x010F] = camera[0]  # Make
+    exif[0x0110] = camera[1]  # Model
+    exif[0x8769] = {0x9003: taken_at}  # DateTimeOriginal
+
+    path = os.path.join(media_root, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    buffer = BytesIO()
+    image.save(buffer, format='JPEG', quality=rng.randint(80, 92), exif=exif)
+    with open(path, 'wb') as f:
+        f.write(buffer.getvalue())
+    return name, len(buffer.getvalue())
+
+
+def render_fixture_photo(job):
+    """Generuje zdjęcie i liczy jego podgląd i hash (uruchamiane w puli procesów)"""
+    name, size = render_photo(job)
+    # To samo, co Photo.save i widok uploadu liczą z przesłanego pliku - bulk_create ich nie wywołuje
+    path = os.path.join(job[0], name)
+    placeholder, dominant_color = compute_placeholder(path)
+    return size, placeholder, dominant_color, format_hash(dhash(path))
+
+
+class Command(BaseCommand):
+    help = 'Bulk-create synthetic guests, tables and photos for scale and performance testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--guests', type=int, default=150, help='Number of guests to create')
+        parser.add_argument('--tables', type=int, default=15, help='Number of tables to create')
+        parser.add_argument('--photos', type=int, default=0, help='Number of photos to create')
+        parser.add_argument('--seed', type=int, default=2024, help='Random seed for repeatable data')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Processes used for image synthesis',
+        )
+        parser.add_argument(
+            '--max-dimension',
+            type=int,
+            default=0,
+            help='Limit the longer edge of generated photos (0 = realistic phone sizes)',
+        )
+        parser.add_argument('--approved-ratio', type=float, default=0.8, help='Share of approved photos')
+        parser.add_argument('--clear', action='store_true', help='Remove previously generated data first')
+
+    def handle(self, *args, **options):
+        if getattr(settings, 'USE_CLOUDINARY', False) and options['photos']:
+            raise CommandError('Refusing to generate photos into Cloudinary - run with USE_CLOUDINARY=False')
+
+        rng = random.Random(options['seed'])
+
+        if options['clear']:
+            self.clear()
+
+        if not WeddingInfo.objects.exists():
+            WeddingInfo.objects.create(
+                bride_name='Aleksandra',
+                groom_name='Bartłomiej',
+                wedding_date=date(2024, 6, 15),
+                venue_name='Pałac Romantyczny',
+                welcome_message='Dane testowe wygenerowane przez generate_fixture_data.',
+            )
+
+        with transaction.atomic():
+            tables = self.create_tables(rng, options['tables'])
+            guests_count = self.create_guests(rng, options['guests'], tables)
+        # bulk_create nie wysyła sygnałów - plan sali unieważniamy ręcznie
+        invalidate_seating_plan()
+        self.stdout.write(f'✓ Created {len(tables)} tables and {guests_count} guests')
+
+        if options['photos']:
+            photos_count = self.create_photos(rng, options)
+            self.stdout.write(f'✓ Created {photos_count} photos')
+
+        self.stdout.write(self.style.SUCCESS('Fixture data ready.'))
+
+    def clear(self):
+        photos = Photo.objects.filter(image__startswith=PHOTO_DIR + '/')
+        for name in photos.values_list('image', flat=True).iterator():
+            path = os.path.join(settings.MEDIA_ROOT, name)
+            if os.path.exists(path):
+                os.remove(path)
+        deleted_photos = photos.delete()[0]
+        deleted_users = User.objects.filter(username__startswith=USERNAME_PREFIX).delete()[0]
+        deleted_tables = Table.objects.filter(description=TABLE_DESCRIPTION).delete()[0]
+        self.stdout.write(
+            f'Removed previous fixture data ({deleted_photos} photos, '
+            f'{deleted_users} users with profiles, {deleted_tables} tables)'
+        )
+
+    def create_tables(self, rng, count):
+        """Stoły na siatce 900x600 - każdy w swojej komórce, więc nigdy się nie nakładają"""
+        if count <= 0:
+            return []
+
+        start = (Table.objects.aggregate(Max('number'))['number__max'] or 0) + 1
+        cols = math.ceil(math.sqrt(count * 1.5))
+        rows = math.ceil(count / cols)
+        cell_width = 800 / cols
+        cell_height = 500 / rows
+        size = max(min(cell_width, cell_height) * 0.6, 20)
+
+        tables = []
+        for index in range(count):
+            row, col = divmod(index, cols)
+            capacity = rng.choice([6, 8, 8, 10, 10, 12])
+            tables.append(Table(
+                number=start + index,
+                name=f'Stół {start + index}',
+                capacity=capacity,
+                description=TABLE_DESCRIPTION,
+                map_x=round(50 + cell_width * (col + 0.5), 1),
+                map_y=round(50 + cell_height * (row + 0.5), 1),
+                map_width=round(size, 1),
+                map_height=round(size, 1),
+                shape='circular',
+            ))
+        return Table.objects.bulk_create(tables)
+
+    def generate_people(self, rng, count):
+        """Gospodarstwa domowe: para o wspólnym nazwisku, czasem dzieci lub osoba towarzysząca"""
+        people = []
+        while len(people) < count:
+            surname = rng.choice(SURNAMES)
+            group = rng.choice(GUEST_GROUPS)
+            household = rng.choices(['single', 'couple', 'family', 'plus_one'], [3, 4, 2, 2])[0]
+
+            if household == 'single':
+                if rng.random() < 0.5:
+                    people.append((rng.choice(FEMALE_NAMES), feminine_surname(surname), group, False))
+                else:
+                    people.append((rng.choice(MALE_NAMES), surname, group, False))
+            elif household == 'plus_one':
+                # Gość z osobą towarzyszącą o innym nazwisku - wpisywani zaraz po sobie
+                people.append((rng.choice(MALE_NAMES), surname, group, True))
+                people.append((rng.choice(FEMALE_NAMES), feminine_surname(rng.choice(SURNAMES)),
+                               COMPANION_TYPE, False))
+            else:
+                people.append((rng.choice(FEMALE_NAMES), feminine_surname(surname), group, False))
+                people.append((rng.choice(MALE_NAMES), surname, group, False))
+                if household == 'family':
+                    for _ in range(rng.randint(1, 3)):
+                        if rng.random() < 0.5:
+                            people.append((rng.choice(FEMALE_NAMES), feminine_surname(surname), group, False))
+                        else:
+                            people.append((rng.choice(MALE_NAMES), surname, group, False))
+        return people[:count]
+
+    def create_guests(self, rng, count, tables):
+        if count <= 0:
+            return 0
+
+        offset = User.objects.filter(username__startswith=USERNAME_PREFIX).count()
+        password = make_password(None)
+        people = self.generate_people(rng, count)
+
+        users = [
+            User(
+                username=f'{USERNAME_PREFIX}{offset + index}',
+                first_name=first_name,
+                last_name=last_name,
+                email=f'{USERNAME_PREFIX}{offset + index}@example.com',
+                password=password,
+            )
+            for index, (first_name, last_name, _group, _plus_one) in enumerate(people)
+        ]
+        User.objects.bulk_create(users, batch_size=1000)
+        user_ids = dict(
+            User.objects.filter(username__in=[user.username for user in users]).values_list('username', 'id')
+        )
+
+        # Ok. 90% gości dostaje stół i krzesło, reszta czeka na przydział (jak "-1" w CSV)
+        seats = [
+            (table.number, chair)
+            for table in tables
+            for chair in range(1, table.capacity + 1)
+        ]
+        guests = []
+        for index, (user, person) in enumerate(zip(users, people)):
+            table_number, chair_position = (None, None)
+            if index < len(seats) and rng.random() < 0.9:
+                table_number, chair_position = seats[index]
+            guests.append(Guest(
+                user_id=user_ids[user.username],
+                table_number=table_number,
+                chair_position=chair_position,
+                guest_type=person[2],
+                plus_one=person[3],
+                confirmed=rng.random() < 0.95,
+            ))
+        Guest.objects.bulk_create(guests, batch_size=1000)
+        return len(guests)
+
+    def create_photos(self, rng, options):
+        count = options['photos']
+        max_dimension = options['max_dimension']
+        media_root = str(settings.MEDIA_ROOT)
+        offset = Photo.objects.filter(image__startswith=PHOTO_DIR + '/').count()
+        uploader_ids = list(
+            User.objects.filter(username__startswith=USERNAME_PREFIX).values_list('id', flat=True)[:500]
+        )
+        party_start = datetime(2024, 6, 15, 15, 0)
+
+        jobs = []
+        photos = []
+        sizes = [(width, height) for width, height, _weight in PHOTO_SIZES]
+        size_weights = [weight for _width, _height, weight in PHOTO_SIZES]
+        for index in range(count):
+            width, height = rng.choices(sizes, size_weights)[0]
+            if max_dimension and max(width, height) > max_dimension:
+                scale = max_dimension / max(width, height)
+                width, height = max(int(width * scale), 1), max(int(height * scale), 1)
+            taken_at = party_start + timedelta(seconds=rng.randint(0, 12 * 3600))
+            name = f'{PHOTO_DIR}/{offset + index:06d}.jpg'
+            orientation = rng.choice(EXIF_ORIENTATIONS)
+            camera = rng.choice(CAMERAS)
+            jobs.append((
+                media_root, name, options['seed'] * 1_000_003 + offset + index, width, height,
+                orientation, taken_at.strftime('%Y:%m:%d %H:%M:%S'), camera,
+            ))
+
+            approved = rng.random() < options['approved_ratio']
+            use_account = uploader_ids and rng.random() < 0.3
+            photo = Photo(
+                title=f'Zdjęcie z wesela {offset + index + 1}',
+                image=name,
+                category=rng.choice(Photo.CATEGORY_CHOICES)[0],
+                uploaded_by_id=rng.choice(uploader_ids) if use_account else None,
+                uploader_name='' if use_account else f'{rng.choice(FEMALE_NAMES + MALE_NAMES)} i {rng.choice(MALE_NAMES)}',
+                approved=approved,
+                featured=approved and rng.random() < 0.05,
+            )
+            # Metadane znamy z parametrów generowania - te same, które render_photo zapisuje w EXIF
+            rotated = orientation in ROTATED_ORIENTATIONS
+            apply_metadata(photo, {
+                'taken_at': timezone.make_aware(taken_at),
+                'width': height if rotated else width,
+                'height': width if rotated else height,
+                'orientation': orientation,
+                'camera': camera_name(*camera),
+            })
+            photos.append(photo)
+
+        total_bytes = 0
+        with ProcessPoolExecutor(max_workers=max(options['workers'], 1)) as executor:
+            results = executor.map(render_fixture_photo, jobs, chunksize=32)
+            for done, (photo, (size, placeholder, dominant_color, perceptual_hash)) in enumerate(
+                zip(photos, results), start=1
+            ):
+                photo.placeholder, photo.dominant_color = placeholder, dominant_color
+                photo.perceptual_hash = perceptual_hash
+                total_bytes += size
+                if done % 1000 == 0:
+                    self.stdout.write(f'  ... {done}/{count} images')
+
+        Photo.objects.bulk_create(photos, batch_size=1000)
+        self.stdout.write(f'  {total_bytes / 1024 / 1024:.1f} MB of images in {media_root}/{PHOTO_DIR}')
+        return len(photos)
@@ -0,0 +1,68 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+
+from wedding.models import Photo
+from wedding.placeholders import placeholder_for_photo
+
+SAVE_EVERY = 500
+PLACEHOLDER_FIELDS = ['placeholder', 'dominant_color']
+
+
+class Command(BaseCommand):
+    help = (
+        'Backfill the inline gallery placeholders (16px blurred preview and dominant colour) '
+        'for photos uploaded before they were stored. On Cloudinary only a 64px rendition is '
+        'downloaded per photo.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Parallel file reads (default: 8)'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Recompute placeholders for every photo, not only ones missing them'
+        )
+
+    def handle(self, *args, **options):
+        photos = Photo.objects.exclude(image='').only('id', 'image')
+        if not options['all']:
+            photos = photos.filter(placeholder='')
+        photos = list(photos.order_by('id'))
+
+        self.stdout.write(f'Photos to process: {len(photos)}')
+        started = time.perf_counter()
+        pending, updated, errors, total_bytes = [], 0, 0, 0
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            futures = {pool.submit(placeholder_for_photo, photo): photo for photo in photos}
+            for done, future in enumerate(as_completed(futures), 1):
+                photo = futures[future]
+                try:
+                    photo.placeholder, photo.dominant_color = future.result()
+                except Exception as e:
+                    errors += 1
+                    self.stdout.write(self.style.ERROR(f'Error for {photo.image.name} (#{photo.id}): {e}'))
+                    continue
+                total_bytes += len(photo.placeholder)
+                pending.append(photo)
+                if len(pending) >= SAVE_EVERY:
+                    updated += Photo.objects.bulk_update(pending, PLACEHOLDER_FIELDS)
+                    pending = []
+                if done % 100 == 0 or done == len(photos):
+                    self.stdout.write(f'  {done}/{len(photos)}')
+        if pending:
+            updated += Photo.objects.bulk_update(pending, PLACEHOLDER_FIELDS)
+
+        average = total_bytes / (len(photos) - errors) if len(photos) > errors else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Placeholders generated in {time.perf_counter() - started:.1f}s!\n'
+            f'Updated: {updated}\n'
+            f'Average size: {average:.0f} bytes (base64)\n'
+            f'Errors: {errors}'
+        ))
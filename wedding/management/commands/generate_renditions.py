@@ -0,0 +1,76 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+
+from wedding.models import Photo
+from wedding.renditions import RENDITIONS, mark_ready, request_renditions
+
+MARK_EVERY = 100
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate the photo renditions (thumbnail, optimized, full) ahead of time for photos '
+        'that do not have them yet - photos uploaded before eager generation, or ones whose '
+        'Cloudinary notification never arrived. Locally the renditions are rendered with Pillow.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Parallel requests (default: 8)'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Regenerate renditions for every photo, e.g. after changing RENDITIONS'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=0,
+            help='Process at most this many files'
+        )
+
+    def handle(self, *args, **options):
+        photos = Photo.objects.exclude(image='')
+        if not options['all']:
+            photos = photos.filter(renditions_ready=False)
+        # Zdjęcia współdzielące plik (PhotoBlob) wymagają jednego zamówienia
+        names = list(photos.order_by('image').values_list('image', flat=True).distinct())
+        if options['limit']:
+            names = names[:options['limit']]
+
+        self.stdout.write(f'Files to process: {len(names)} ({", ".join(RENDITIONS)})')
+        started = time.perf_counter()
+        ready, errors = [], 0
+        marked = 0
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            futures = {pool.submit(request_renditions, name, True): name for name in names}
+            for done, future in enumerate(as_completed(futures), 1):
+                name = futures[future]
+                try:
+                    if future.result():
+                        ready.append(name)
+                    else:
+                        errors += 1
+                        self.stdout.write(self.style.WARNING(f'Incomplete renditions: {name}'))
+                except Exception as e:
+                    errors += 1
+                    self.stdout.write(self.style.ERROR(f'Error for {name}: {e}'))
+                if len(ready) >= MARK_EVERY:
+                    marked += mark_ready(ready)
+                    ready = []
+                if done % 100 == 0 or done == len(names):
+                    self.stdout.write(f'  {done}/{len(names)}')
+        if ready:
+            marked += mark_ready(ready)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Renditions generated in {time.perf_counter() - started:.1f}s!\n'
+            f'Photos marked ready: {marked}\n'
+            f'Errors: {errors}'
+        ))
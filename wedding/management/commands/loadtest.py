@@ -0,0 +1,382 @@
+import contextlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from PIL import Image
+
+from wedding.models import Guest, Table, Photo
+from ._sandbox import sandbox
+
+# Domyślny rozkład ruchu w dniu wesela (wagi względne)
+DEFAULT_MIX = {
+    'landing': 1,
+    'home': 3,
+    'gallery': 4,
+    'search': 6,
+    'upload': 1,
+    'chair': 1,
+}
+
+# Kody odpowiedzi uznawane za poprawne dla każdego typu żądania
+EXPECTED_STATUS = {
+    'landing': (200, 302),
+    'home': (200,),
+    'gallery': (200,),
+    'search': (200,),
+    'upload': (200, 302),
+    # 409 = konflikt wersji stołu, czyli poprawnie odrzucona równoległa edycja
+    'chair': (200, 409),
+}
+
+
+class DjangoClientTransport:
+    """Wysyła żądania bezpośrednio do aplikacji (bez serwera HTTP)"""
+
+    def __init__(self):
+        self.client = Client(raise_request_exception=False)
+
+    def reset_session(self):
+        self.client.cookies.clear()
+
+    def get(self, path, params=None):
+        return self.client.get(path, params or {}).status_code
+
+    def post_form(self, path, data, files):
+        payload = dict(data)
+        payload['photos'] = [
+            SimpleUploadedFile(name, content, content_type='image/jpeg')
+            for name, content in files
+        ]
+        return self.client.post(path, payload).status_code
+
+    def post_json(self, path, payload):
+        response = self.client.post(path, json.dumps(payload), content_type='application/json')
+        return response.status_code, response.json()
+
+    def close(self):
+        connections.close_all()
+
+
+class HttpTransport:
+    """Wysyła żądania do działającego serwera (np. lokalny gunicorn)"""
+
+    def __init__(self, base_url):
+        import requests
+
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+
+    def reset_session(self):
+        self.session.cookies.clear()
+
+    def get(self, path, params=None):
+        response = self.session.get(self.base_url + path, params=params, allow_redirects=False)
+        return response.status_code
+
+    def post_form(self, path, data, files):
+        # Pobierz formularz, żeby dostać ciasteczko CSRF
+        self.session.get(self.base_url + path, allow_redirects=False)
+        token = self.session.cookies.get('csrftoken', '')
+        payload = dict(data, csrfmiddlewaretoken=token)
+        response = self.session.post(
+            self.base_url + path,
+            data=payload,
+            files=[('photos', (name, content, 'image/jpeg')) for name, content in files],
+            headers={'Referer': self.base_url + path, 'X-CSRFToken': token},
+            allow_redirects=False,
+        )
+        return response.status_code
+
+    def post_json(self, path, payload):
+        if 'csrftoken' not in self.session.cookies:
+            # Ciasteczko CSRF ustawia strona z mapą stołów
+            self.session.get(self.base_url + '/table-finder/', allow_redirects=False)
+        token = self.session.cookies.get('csrftoken', '')
+        response = self.session.post(
+            self.base_url + path,
+            json=payload,
+            headers={'Referer': self.base_url + path, 'X-CSRFToken': token},
+            allow_redirects=False,
+        )
+        return response.status_code, response.json()
+
+    def close(self):
+        self.session.close()
+
+
+class Command(BaseCommand):
+    help = 'Replay the event-day traffic mix against a local copy of the app and report latency per endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=20, help='Number of concurrent guests')
+        parser.add_argument('--duration', type=float, default=30.0, help='Test duration in seconds')
+        parser.add_argument(
+            '--mix',
+            type=str,
+            default='',
+            help='Traffic weights, e.g. "home=3,gallery=4,search=6,upload=1,chair=1,landing=1"',
+        )
+        parser.add_argument('--guests', type=int, default=150, help='Synthetic guests to create')
+        parser.add_argument('--tables', type=int, default=15, help='Synthetic tables to create')
+        parser.add_argument('--photos', type=int, default=200, help='Synthetic approved photos to create')
+        parser.add_argument('--seed', type=int, default=2024, help='Random seed for a repeatable run')
+        parser.add_argument(
+            '--url',
+            type=str,
+            default='',
+            help='Drive an already running local server instead of the in-process app '
+                 '(it must use the same database as this command)',
+        )
+        parser.add_argument('--token', type=str, default='', help='Access token (default: WEDDING_ACCESS_TOKEN)')
+        parser.add_argument('--output', type=str, default='', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        mix = self.parse_mix(options['mix'])
+        token = options['token'] or getattr(settings, 'WEDDING_ACCESS_TOKEN', 'DEMO2024')
+
+        if options['url']:
+            self.stdout.write(f'Driving {options["url"]} with {options["clients"]} clients...')
+            directory = self.load_directory()
+            if not directory:
+                raise CommandError('No guests in the database - run generate_fixture_data or setup_wedding first')
+            results = self.run(options, mix, token, directory, lambda: HttpTransport(options['url']))
+        else:
+            self.stdout.write('Creating throwaway database with synthetic data...')
+            with sandbox():
+                self.seed_data(options)
+                directory = self.load_directory()
+                self.stdout.write(f'Running {options["clients"]} clients for {options["duration"]:.0f}s...')
+                # Widoki drukują dużo informacji diagnostycznych - nie zalewamy nimi raportu
+                with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                    results = self.run(options, mix, token, directory, DjangoClientTransport)
+
+        self.report(results)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f'Results written to {options["output"]}')
+
+    def parse_mix(self, value):
+        if not value:
+            return dict(DEFAULT_MIX)
+
+        mix = {}
+        for part in value.split(','):
+            name, _, weight = part.partition('=')
+            name = name.strip()
+            if name not in DEFAULT_MIX:
+                raise CommandError(f'Unknown endpoint "{name}" (choose from: {", ".join(DEFAULT_MIX)})')
+            try:
+                mix[name] = float(weight)
+            except ValueError:
+                raise CommandError(f'Invalid weight for "{name}": {weight!r}')
+        return mix
+
+    def seed_data(self, options):
+        """Wypełnia tymczasową bazę danymi z generate_fixture_data"""
+        call_command(
+            'generate_fixture_data',
+            guests=options['guests'],
+            tables=options['tables'],
+            photos=options['photos'],
+            seed=options['seed'],
+            max_dimension=1280,
+            approved_ratio=1.0,
+            stdout=StringIO(),
+        )
+
+    def load_directory(self):
+        """Lista gości używana przez klientów do wyszukiwania i przesadzania"""
+        tables = {number: (capacity, version) for number, capacity, version in
+                  Table.objects.values_list('number', 'capacity', 'version')}
+        return [
+            {
+                'id': guest_id,
+                'name': f'{first_name} {last_name}',
+                'table_number': table_number,
+                'capacity': tables.get(table_number, (8, 1))[0],
+                'version': tables.get(table_number, (8, 1))[1],
+            }
+            for guest_id, first_name, last_name, table_number in Guest.objects.values_list(
+                'id', 'user__first_name', 'user__last_name', 'table_number'
+            )
+        ]
+
+    def run(self, options, mix, token, directory, transport_factory):
+        names = [name for name, weight in mix.items() if weight > 0]
+        weights = [mix[name] for name in names]
+        if not names:
+            raise CommandError('Traffic mix is empty')
+
+        tables_guests = defaultdict(list)
+        for guest in directory:
+            if guest['table_number'] is not None:
+                tables_guests[guest['table_number']].append(guest)
+        seated_tables = sorted(tables_guests)
+        if not seated_tables and mix.get('chair'):
+            raise CommandError('No seated guests to rearrange - drop "chair" from --mix')
+
+        rng = random.Random(options['seed'])
+        upload_images = [make_jpeg(rng, rng.choice([1600, 2400, 4000]), rng.choice([1200, 1800, 3000]))
+                         for _ in range(4)]
+        start_event = threading.Event()
+
+        def client_loop(index):
+            client_rng = random.Random(options['seed'] + index)
+            transport = transport_factory()
+            samples = []
+            versions = {number: guests[0]['version'] for number, guests in tables_guests.items()}
+
+            def timed(endpoint, call, *call_args):
+                started = time.perf_counter()
+                result = None
+                try:
+                    result = call(*call_args)
+                    status = result[0] if isinstance(result, tuple) else result
+                    ok = status in EXPECTED_STATUS[endpoint]
+                except Exception:
+                    status, ok = None, False
+                samples.append((endpoint, time.perf_counter() - started, ok, started))
+                return result
+
+            start_event.wait()
+            deadline = time.perf_counter() + options['duration']
+            timed('landing', transport.get, '/', {'token': token})
+
+            try:
+                while time.perf_counter() < deadline:
+                    endpoint = client_rng.choices(names, weights)[0]
+
+                    if endpoint == 'landing':
+                        transport.reset_session()
+                        timed('landing', transport.get, '/', {'token': token})
+                    elif endpoint == 'home':
+                        timed('home', transport.get, '/')
+                    elif endpoint == 'gallery':
+                        params = {'page': client_rng.randint(1, 5)}
+                        if client_rng.random() < 0.3:
+                            params['category'] = client_rng.choice(Photo.CATEGORY_CHOICES)[0]
+                        timed('gallery', transport.get, '/gallery/', params)
+                    elif endpoint == 'search':
+                        # Wyszukiwanie "w trakcie pisania" - kilka kolejnych prefiksów
+                        name = client_rng.choice(directory)['name']
+                        for length in range(2, min(len(name), 6) + 1):
+                            timed('search', transport.get, '/ajax/table-search/', {'q': name[:length]})
+                    elif endpoint == 'upload':
+                        files = [
+                            (f'IMG_{client_rng.randint(1000, 9999)}.jpg', client_rng.choice(upload_images))
+                            for _ in range(client_rng.randint(1, 4))
+                        ]
+                        data = {'uploader_name': f'Gość {index}', 'category': 'party', 'description': ''}
+                        timed('upload', transport.post_form, '/upload/', data, files)
+                    elif endpoint == 'chair':
+                        # Koordynator przestawia cały stół jednym żądaniem
+                        table_number = client_rng.choice(seated_tables)
+                        table_guests = tables_guests[table_number]
+                        capacity = max(table_guests[0]['capacity'], len(table_guests))
+                        chairs = client_rng.sample(range(1, capacity + 1), len(table_guests))
+                        payload = {
+                            'moves': [
+                                {'guest_id': guest['id'], 'chair_position': chair}
+                                for guest, chair in zip(table_guests, chairs)
+                            ],
+                            'versions': {table_number: versions[table_number]},
+                        }
+                        result = timed('chair', transport.post_json, '/ajax/update-chair-positions/', payload)
+                        if result and result[1].get('versions'):
+                            # Po konflikcie kolejna edycja startuje od aktualnej wersji
+                            versions.update({int(k): v for k, v in result[1]['versions'].items()})
+            finally:
+                transport.close()
+            return samples
+
+        with ThreadPoolExecutor(max_workers=options['clients']) as executor:
+            futures = [executor.submit(client_loop, index) for index in range(options['clients'])]
+            wall_started = time.perf_counter()
+            start_event.set()
+            samples = [sample for future in futures for sample in future.result()]
+            wall_time = time.perf_counter() - wall_started
+
+        return summarize(samples, wall_time, options)
+
+    def report(self, results):
+        self.stdout.write('\n' + '=' * 86)
+        self.stdout.write('LOAD TEST RESULTS')
+        self.stdout.write('=' * 86)
+        self.stdout.write(
+            f'{"endpoint":<10} {"requests":>9} {"errors":>7} {"err %":>7} {"req/s":>9} '
+            f'{"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"max ms":>9}'
+        )
+        for name, row in list(results['endpoints'].items()) + [('TOTAL', results['total'])]:
+            line = (
+                f'{name:<10} {row["requests"]:>9} {row["errors"]:>7} {row["error_rate"] * 100:>6.1f}% '
+                f'{row["throughput"]:>9.1f} {row["p50_ms"]:>9.1f} {row["p95_ms"]:>9.1f} '
+                f'{row["p99_ms"]:>9.1f} {row["max_ms"]:>9.1f}'
+            )
+            if row['errors']:
+                line = self.style.WARNING(line)
+            self.stdout.write(line)
+        self.stdout.write(
+            f'\nClients: {results["clients"]}, wall time: {results["wall_time"]:.1f}s'
+        )
+
+
+def make_jpeg(rng, width, height):
+    """Generuje syntetyczne zdjęcie JPEG (gradient + szum, żeby kompresja była realistyczna)"""
+    base = Image.linear_gradient('L').resize((width, height))
+    noise = Image.effect_noise((width, height), rng.randint(20, 60))
+    image = Image.merge('RGB', (base, noise, base.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    buffer = BytesIO()
+    image.save(buffer, format='JPEG', quality=85)
+    return buffer.getvalue()
+
+
+def percentile(sorted_values, pct):
+    """Percentyl metodą najbliższej rangi"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+def summarize(samples, wall_time, options):
+    grouped = defaultdict(list)
+    for endpoint, duration, ok, _started in samples:
+        grouped[endpoint].append((duration, ok))
+
+    def stats(rows):
+        durations = sorted(duration * 1000 for duration, _ok in rows)
+        errors = sum(1 for _duration, ok in rows if not ok)
+        return {
+            'requests': len(rows),
+            'errors': errors,
+            'error_rate': errors / len(rows) if rows else 0.0,
+            'throughput': len(rows) / wall_time if wall_time else 0.0,
+            'p50_ms': percentile(durations, 50),
+            'p95_ms': percentile(durations, 95),
+            'p99_ms': percentile(durations, 99),
+            'max_ms': durations[-1] if durations else 0.0,
+        }
+
+    return {
+        'clients': options['clients'],
+        'duration': options['duration'],
+        'wall_time': wall_time,
+        'seed': options['seed'],
+        'endpoints': {name: stats(rows) for name, rows in sorted(grouped.items())},
+        'total': stats([row for rows in grouped.values() for row in rows]),
+    }
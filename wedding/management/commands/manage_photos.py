@@ -1,4 +1,10 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
 from django.core.management.base import BaseCommand
+from wedding.imaging import downscale_batch, process_workers
+from wedding.duplicates import MultiIndexHash, hash_photo_source, invalidate_hash_index, max_distance
 from wedding.models import Photo
 from django.utils import timezone
 from datetime import timedelta
@@ -37,6 +43,32 @@ class Command(BaseCommand):
             type=int,
             help='Automatycznie wyróżnij X najnowszych zdjęć',
         )
+        parser.add_argument(
+            '--find-duplicates',
+            action='store_true',
+            help='Policz brakujące hashe obrazów i oznacz powtórzone zdjęcia',
+        )
+        parser.add_argument(
+            '--rehash',
+            action='store_true',
+            help='Z --find-duplicates: przelicz hashe wszystkich zdjęć, nie tylko brakujące',
+        )
+        parser.add_argument(
+            '--delete-duplicates',
+            action='store_true',
+            help='Z --find-duplicates: usuń oznaczone duplikaty, które nie zostały zatwierdzone',
+        )
+        parser.add_argument(
+            '--optimize-local',
+            action='store_true',
+            help='Zmniejsz lokalnie zapisane zdjęcia większe niż PHOTO_MAX_DIMENSION (pula procesów)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Liczba procesów liczących hashe',
+        )
 
     def handle(self, *args, **options):
         if options['stats']:
@@ -51,6 +83,10 @@ class Command(BaseCommand):
             self.approve_recent_photos(options['approve_recent'])
         elif options['feature_best']:
             self.feature_best_photos(options['feature_best'])
+        elif options['find_duplicates']:
+            self.find_duplicates(options)
+        elif options['optimize_local']:
+            self.optimize_local(options)
         else:
             self.show_help()
 
@@ -117,7 +153,7 @@ class Command(BaseCommand):
         
         confirm = input(f'❓ Zatwierdzić wszystkie {count} oczekujących zdjęć? [y/N]: ')
         if confirm.lower() in ['y', 'yes', 'tak', 't']:
-            pending.update(approved=True)
+            pending.approve()
             self.stdout.write(
                 self.style.SUCCESS(f'✅ Zatwierdzono {count} zdjęć!')
             )
@@ -144,7 +180,7 @@ class Command(BaseCommand):
         
         confirm = input(f'\n❓ Zatwierdzić wszystkie? [y/N]: ')
         if confirm.lower() in ['y', 'yes', 'tak', 't']:
-            photos.update(approved=True)
+            photos.approve()
             self.stdout.write(
                 self.style.SUCCESS(f'✅ Zatwierdzono {count} zdjęć od "{uploader_name}"!')
             )
@@ -179,7 +215,7 @@ class Command(BaseCommand):
         
         confirm = input(f'\n❓ Zatwierdzić wszystkie {count} zdjęć? [y/N]: ')
         if confirm.lower() in ['y', 'yes', 'tak', 't']:
-            photos.update(approved=True)
+            photos.approve()
             self.stdout.write(
                 self.style.SUCCESS(f'✅ Zatwierdzono {count} zdjęć z ostatnich {hours} godzin!')
             )
@@ -213,6 +249,100 @@ class Command(BaseCommand):
         else:
             self.stdout.write('❌ Anulowano')
 
+    def optimize_local(self, options):
+        """Zmniejsza zbyt duże lokalne pliki zdjęć w ograniczonej puli procesów i pokazuje statystyki"""
+        if getattr(settings, 'USE_CLOUDINARY', False):
+            self.stdout.write('❌ Zdjęcia są w Cloudinary - zmniejszanie dotyczy tylko plików lokalnych')
+            return
+        
+        max_dimension = settings.PHOTO_MAX_DIMENSION
+        names = Photo.objects.exclude(image='').values_list('image', flat=True).distinct()
+        jobs = [
+            (path, path, (max_dimension, max_dimension), 95)
+            for path in (os.path.join(settings.MEDIA_ROOT, name) for name in names)
+            if os.path.exists(path)
+        ]
+        workers = process_workers(options['workers'])
+        self.stdout.write(f'🖼️ Sprawdzam {len(jobs)} plików ({workers} procesów)...')
+        saved, errors, stats = downscale_batch(jobs, workers=workers)
+        for path, error in errors:
+            self.stdout.write(self.style.WARNING(f'   ⚠️ {path}: {error}'))
+        
+        summary = stats.as_dict()
+        self.stdout.write(self.style.SUCCESS(f'✅ Zmniejszono {len(saved)} zdjęć (błędy: {len(errors)})'))
+        self.stdout.write(
+            f'⏱️ Średnio {summary["mean_ms"]} ms na zdjęcie, największy obraz w pamięci '
+            f'{summary["peak_image_mb"]} MB, szczyt procesu {summary["peak_rss_mb"]} MB'
+        )
+
+    def find_duplicates(self, options):
+        """Uzupełnia hashe obrazów (w puli procesów) i oznacza powtórzone zdjęcia"""
+        photos = Photo.objects.exclude(image='')
+        if not options['rehash']:
+            photos = photos.filter(perceptual_hash='')
+        
+        jobs = [(photo.id, self.hash_source(photo)) for photo in photos.only('id', 'image')]
+        if jobs:
+            self.stdout.write(f'🔍 Liczę hashe {len(jobs)} zdjęć ({options["workers"]} procesów)...')
+            hashed, failed = [], 0
+            with ProcessPoolExecutor(max_workers=max(options['workers'], 1)) as executor:
+                for done, (photo_id, value, error) in enumerate(
+                    executor.map(hash_photo_source, jobs, chunksize=16), start=1
+                ):
+                    if error:
+                        failed += 1
+                        self.stdout.write(self.style.WARNING(f'   ⚠️ Zdjęcie {photo_id}: {error}'))
+                    else:
+                        hashed.append(Photo(id=photo_id, perceptual_hash=value))
+                    if done % 500 == 0:
+                        self.stdout.write(f'   ... {done}/{len(jobs)}')
+            Photo.objects.bulk_update(hashed, ['perceptual_hash'], batch_size=1000)
+            self.stdout.write(f'✅ Policzono {len(hashed)} hashy' + (f', błędy: {failed}' if failed else ''))
+        
+        # Od najstarszych: pierwsze zdjęcie z grupy podobnych jest oryginałem, kolejne - jego duplikatami
+        index = MultiIndexHash(max_distance())
+        changes = []
+        duplicates = 0
+        rows = (
+            Photo.objects.exclude(perceptual_hash='')
+            .order_by('upload_date', 'id')
+            .values_list('id', 'perceptual_hash', 'duplicate_of_id')
+        )
+        for photo_id, value, current in rows.iterator():
+            value = int(value, 16)
+            matches = index.search(value)
+            original = min(matches)[1] if matches else None
+            if original is None:
+                index.add(value, photo_id)
+            else:
+                duplicates += 1
+            if original != current:
+                changes.append(Photo(id=photo_id, duplicate_of_id=original))
+        
+        Photo.objects.bulk_update(changes, ['duplicate_of'], batch_size=1000)
+        invalidate_hash_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'📸 Duplikatów: {duplicates} (zmienione oznaczenia: {len(changes)}, oryginałów: {index.size})'
+        ))
+        
+        if options['delete_duplicates']:
+            pending = Photo.objects.filter(duplicate_of__isnull=False, approved=False)
+            count = pending.count()
+            if count == 0:
+                return
+            confirm = input(f'\n❓ Usunąć {count} niezatwierdzonych duplikatów? [y/N]: ')
+            if confirm.lower() in ['y', 'yes', 'tak', 't']:
+                pending.delete()
+                self.stdout.write(self.style.SUCCESS(f'🗑️ Usunięto {count} duplikatów'))
+            else:
+                self.stdout.write('❌ Anulowano')
+
+    def hash_source(self, photo):
+        """Plik lokalny albo mała wersja z Cloudinary - do hasha wystarczy kilkaset pikseli"""
+        if getattr(settings, 'USE_CLOUDINARY', False):
+            return photo.get_cloudinary_url(width=256, height=256, crop='limit', fetch_format='jpg')
+        return photo.image.path
+
     def show_help(self):
         """Pokazuje pomoc"""
         self.stdout.write(self.style.SUCCESS('📸 Manager Zdjęć Weselnych'))
@@ -224,10 +354,14 @@ class Command(BaseCommand):
         self.stdout.write('  --approve-by-uploader NAME Zatwierdź od konkretnej osoby')
         self.stdout.write('  --approve-recent HOURS     Zatwierdź z ostatnich X godzin')
         self.stdout.write('  --feature-best N           Wyróżnij N najnowszych zdjęć')
+        self.stdout.write('  --find-duplicates          Znajdź i oznacz powtórzone zdjęcia')
+        self.stdout.write('      [--rehash] [--delete-duplicates] [--workers N]')
+        self.stdout.write('  --optimize-local           Zmniejsz zbyt duże lokalne pliki zdjęć [--workers N]')
         self.stdout.write('')
         self.stdout.write('Przykłady:')
         self.stdout.write('  python manage.py manage_photos --stats')
         self.stdout.write('  python manage.py manage_photos --approve-all')
         self.stdout.write('  python manage.py manage_photos --approve-by-uploader "Anna"')
         self.stdout.write('  python manage.py manage_photos --approve-recent 2')
-        self.stdout.write('  python manage.py manage_photos --feature-best 5')
\ No newline at end of file
+        self.stdout.write('  python manage.py manage_photos --feature-best 5')
+        self.stdout.write('  python manage.py manage_photos --find-duplicates --workers 4')
\ No newline at end of file
@@ -1,4 +1,5 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from wedding.layout import DEFAULT_AISLE, LayoutError, auto_layout
 from wedding.models import Table
 
 class Command(BaseCommand):
@@ -13,9 +14,27 @@ class Command(BaseCommand):
         parser.add_argument(
             '--layout',
             type=str,
-            choices=['default', 'classic', 'modern'],
+            choices=['default', 'classic', 'modern', 'auto'],
             default='default',
-            help='Choose table layout style',
+            help='Choose table layout style ("auto" computes positions for the existing tables)',
+        )
+        parser.add_argument(
+            '--aisle',
+            type=float,
+            default=DEFAULT_AISLE,
+            help='Minimum gap between tables for the auto layout',
+        )
+        parser.add_argument(
+            '--fixed',
+            type=str,
+            default='',
+            help='Comma separated table numbers the auto layout keeps in place (e.g. the head table)',
+        )
+        parser.add_argument(
+            '--dance-floor',
+            type=str,
+            default='',
+            help='Area kept free by the auto layout as "x,y,width,height" (centre and size)',
         )
 
     def handle(self, *args, **options):
@@ -24,6 +43,10 @@ class Command(BaseCommand):
         
         self.stdout.write(f'Setting up table positions with "{layout}" layout...')
 
+        if layout == 'auto':
+            self.handle_auto(options)
+            return
+
         # Define table positions based on layout
         if layout == 'default':
             positions = self.get_default_positions()
@@ -86,6 +109,31 @@ class Command(BaseCommand):
         self.stdout.write('2. Test the interactive map')
         self.stdout.write('3. Adjust colors and shapes as needed')
 
+    def handle_auto(self, options):
+        try:
+            fixed_numbers = {int(number) for number in options['fixed'].split(',') if number.strip()}
+            anchors = []
+            if options['dance_floor']:
+                x, y, width, height = (float(value) for value in options['dance_floor'].split(','))
+                anchors.append((x, y, width, height))
+        except ValueError:
+            raise CommandError('--fixed expects table numbers and --dance-floor expects "x,y,width,height"')
+
+        tables = list(Table.objects.all())
+        movable = [table for table in tables if table.number not in fixed_numbers]
+        fixed = [table for table in tables if table.number in fixed_numbers]
+
+        try:
+            scale = auto_layout(movable, fixed_tables=fixed, extra_anchors=anchors, aisle=options['aisle'])
+        except LayoutError as e:
+            raise CommandError(str(e))
+
+        for table in movable:
+            self.stdout.write(f'✓ Table {table.number} at ({table.map_x}, {table.map_y})')
+        if scale < 1:
+            self.stdout.write(self.style.WARNING(f'Tables scaled to {scale:.0%} of their size to fit the room'))
+        self.stdout.write(self.style.SUCCESS(f'Positioned {len(movable)} tables ({len(fixed)} kept in place)'))
+
     def get_default_positions(self):
         """Chessboard pattern layout with rectangular perimeter tables"""
         return [
@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from wedding.seating import DEFAULT_TIME_LIMIT, SeatingConflict, solve_seating
+
+
+class Command(BaseCommand):
+    help = 'Automatically assign tables and chairs (families and groups together, companions next to partners)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Keep the current seating and move as few guests as possible (e.g. after RSVP changes)',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Show the changes without saving them')
+        parser.add_argument(
+            '--time-limit',
+            type=float,
+            default=DEFAULT_TIME_LIMIT,
+            help='Seconds spent improving the greedy solution',
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the local search')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            changes, unplaced = solve_seating(
+                incremental=options['incremental'],
+                time_limit=options['time_limit'],
+                seed=options['seed'],
+                dry_run=options['dry_run'],
+            )
+        except SeatingConflict as e:
+            self.stdout.write(self.style.ERROR(f'{e} - run the command again'))
+            return
+        elapsed = time.perf_counter() - started
+
+        for guest, before, after in changes:
+            self.stdout.write(f'{guest.full_name}: {self.format_seat(before)} -> {self.format_seat(after)}')
+
+        if unplaced:
+            self.stdout.write(self.style.WARNING(
+                f'\nNot enough seats for {len(unplaced)} guests: '
+                + ', '.join(guest.full_name for guest in unplaced)
+            ))
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('DRY RUN - No changes were made'))
+        self.stdout.write(self.style.SUCCESS(f'{len(changes)} guests moved in {elapsed:.2f}s'))
+
+    def format_seat(self, seat):
+        table_number, chair_position = seat
+        if table_number is None:
+            return 'no table'
+        return f'table {table_number}, chair {chair_position or "-"}'
@@ -0,0 +1,167 @@
+"""Sprzątanie plików zdjęć w storage.
+
+Usunięcie zdjęcia tylko dopisuje jego plik do kolejki StorageDeletion (w tej
+samej transakcji), więc akcje w adminie nie czekają na Cloudinary. Komenda
+gc_media usuwa pliki z kolejki paczkami: w Cloudinary jednym wywołaniem
+delete_resources na 100 plików, lokalnie przez storage.delete.
+
+Uzgadnianie (reconcile) listuje pliki w storage i porównuje je z bazą -
+pliki, do których nie odwołuje się żadne zdjęcie ani PhotoBlob, a są starsze
+niż okres karencji (wysyłane właśnie zdjęcia mają już plik, ale jeszcze nie
+wiersz w bazie), trafiają do tej samej kolejki.
+"""
+import os
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from .models import Photo, PhotoBlob, StorageDeletion
+from .renditions import RENDITIONS_PREFIX
+
+DELETE_BATCH_SIZE = 100      # limit delete_resources w Cloudinary
+MAX_ATTEMPTS = 5
+MEDIA_PREFIX = 'photos/'
+CLOUDINARY_PAGE_SIZE = 500
+
+
+def use_cloudinary():
+    return getattr(settings, 'USE_CLOUDINARY', False)
+
+
+def storage_key(name):
+    """Nazwa porównywalna z listą storage - w Cloudinary public_id bez wersji i rozszerzenia"""
+    name = name.replace('https:/res.cloudinary.com', 'https://res.cloudinary.com')
+    if not use_cloudinary():
+        return name
+    if '/upload/' in name:
+        name = name.split('/upload/', 1)[1].split('?')[0]
+        first, _, rest = name.partition('/')
+        if first.startswith('v') and first[1:].isdigit():
+            name = rest
+        name = os.path.splitext(name)[0]
+    return name
+
+
+def referenced_keys(names):
+    """Które z podanych nazw są nadal używane przez zdjęcia albo pliki PhotoBlob"""
+    names = list(names)
+    used = set(Photo.objects.filter(image__in=names).values_list('image', flat=True))
+    used |= set(PhotoBlob.objects.filter(name__in=names).values_list('name', flat=True))
+    return used
+
+
+def delete_files(names):
+    """Usuwa pliki ze storage; zwraca {nazwa: błąd} dla tych, których nie udało się usunąć"""
+    errors = {}
+    if use_cloudinary():
+        import cloudinary.api
+
+        public_ids = {storage_key(name): name for name in names}
+        try:
+            response = cloudinary.api.delete_resources(list(public_ids), invalidate=True)
+        except Exception as e:
+            return {name: str(e) for name in names}
+        # "not_found" też jest sukcesem - pliku i tak już nie ma
+        for public_id, status in response.get('deleted', {}).items():
+            if status not in ('deleted', 'not_found') and public_id in public_ids:
+                errors[public_ids[public_id]] = status
+        return errors
+
+    for name in names:
+        try:
+            default_storage.delete(name)
+        except Exception as e:
+            errors[name] = str(e)
+    return errors
+
+
+def collect_garbage(batch_size=DELETE_BATCH_SIZE, dry_run=False):
+    """Przetwarza całą kolejkę; zwraca (usunięte, pominięte bo używane, błędy)"""
+    deleted = skipped = failed = 0
+    last_id = 0
+    while True:
+        batch = list(
+            StorageDeletion.objects.filter(id__gt=last_id, attempts__lt=MAX_ATTEMPTS)
+            .order_by('id')[:batch_size]
+        )
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        # Plik mógł wrócić do użycia (np. ten sam plik przesłany ponownie) - takich nie ruszamy
+        used = referenced_keys(entry.name for entry in batch)
+        in_use = [entry for entry in batch if entry.name in used]
+        to_delete = [entry for entry in batch if entry.name not in used]
+        skipped += len(in_use)
+        if dry_run:
+            deleted += len(to_delete)
+            continue
+        StorageDeletion.objects.filter(id__in=[entry.id for entry in in_use]).delete()
+
+        errors = delete_files([entry.name for entry in to_delete]) if to_delete else {}
+        done = [entry.id for entry in to_delete if entry.name not in errors]
+        StorageDeletion.objects.filter(id__in=done).delete()
+        deleted += len(done)
+
+        for entry in to_delete:
+            if entry.name in errors:
+                entry.attempts += 1
+                entry.last_error = errors[entry.name][:1000]
+                failed += 1
+        StorageDeletion.objects.bulk_update(
+            [entry for entry in to_delete if entry.name in errors], ['attempts', 'last_error']
+        )
+    return deleted, skipped, failed
+
+
+def storage_files(prefix=MEDIA_PREFIX):
+    """(nazwa, czas utworzenia) wszystkich plików zdjęć w storage"""
+    if use_cloudinary():
+        import cloudinary.api
+        from cloudinary_storage import app_settings
+
+        storage_prefix = app_settings.PREFIX.strip('/')
+        full_prefix = f'{storage_prefix}/{prefix}' if storage_prefix else prefix
+        cursor = None
+        while True:
+            options = {'type': 'upload', 'prefix': full_prefix, 'max_results': CLOUDINARY_PAGE_SIZE}
+            if cursor:
+                options['next_cursor'] = cursor
+            response = cloudinary.api.resources(**options)
+            for resource in response.get('resources', []):
+                created = datetime.fromisoformat(resource['created_at'].replace('Z', '+00:00'))
+                yield resource['public_id'], created
+            cursor = response.get('next_cursor')
+            if not cursor:
+                break
+        return
+
+    directories, files = default_storage.listdir(prefix)
+    for name in files:
+        path = f'{prefix}{name}'
+        yield path, default_storage.get_created_time(path)
+    for directory in directories:
+        yield from storage_files(f'{prefix}{directory}/')
+
+
+def find_orphans(grace=timedelta(hours=24)):
+    """Pliki w storage, do których nie odwołuje się baza, starsze niż okres karencji"""
+    known = {storage_key(name) for name in Photo.objects.exclude(image='').values_list('image', flat=True)}
+    known |= {storage_key(name) for name in PhotoBlob.objects.values_list('name', flat=True)}
+    known |= {storage_key(name) for name in StorageDeletion.objects.values_list('name', flat=True)}
+    cutoff = timezone.now() - grace
+    orphans = [
+        name for name, created in storage_files()
+        if name not in known and created < cutoff
+    ]
+    # Lokalne warianty (renditions/<plik bez rozszerzenia>/<wariant>.webp) - sieroty, gdy nie ma już ich zdjęcia;
+    # w Cloudinary warianty nie są osobnymi plikami i znikają razem ze zdjęciem
+    if not use_cloudinary() and default_storage.exists(RENDITIONS_PREFIX):
+        known_stems = {os.path.splitext(name)[0] for name in known}
+        orphans += [
+            name for name, created in storage_files(RENDITIONS_PREFIX)
+            if name[len(RENDITIONS_PREFIX):].rsplit('/', 1)[0] not in known_stems and created < cutoff
+        ]
+    return orphans
@@ -0,0 +1,27 @@
+"""Storage zdjęć w Cloudinary zamawiający warianty przy wysyłaniu.
+
+Osobny moduł, bo cloudinary_storage przy imporcie wymaga CLOUDINARY_STORAGE
+w ustawieniach - ładujemy go tylko, gdy USE_CLOUDINARY jest włączone.
+"""
+import os
+
+import cloudinary.uploader
+from cloudinary_storage.storage import MediaCloudinaryStorage
+
+from .renditions import eager_upload_options
+
+
+class EagerMediaCloudinaryStorage(MediaCloudinaryStorage):
+    """Upload z opcjami eager - warianty z wedding/renditions.py powstają w tle od razu po wysłaniu"""
+
+    def _upload(self, name, content):
+        options = {
+            'use_filename': True,
+            'resource_type': self._get_resource_type(name),
+            'tags': self.TAG,
+            **eager_upload_options(),
+        }
+        folder = os.path.dirname(name)
+        if folder:
+            options['folder'] = folder
+        return cloudinary.uploader.upload(content, **options)
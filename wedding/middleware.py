@@ -2,6 +2,7 @@ from django.http import HttpResponseRedirect, HttpResponse
 from django.urls import reverse
 from django.contrib import messages
 from django.conf import settings
+from django.utils.cache import add_never_cache_headers
 import hashlib
 import hmac
 
@@ -12,10 +13,14 @@ class WeddingAccessMiddleware:
         self.get_response = get_response
 
     def __call__(self, request):
-        # Pomijamy sprawdzanie dla admina i plików statycznych
+        # Pomijamy sprawdzanie dla admina i plików statycznych (service worker to też plik statyczny,
+        # a przeglądarka pobiera go ponownie przy aktualizacji, także po wygaśnięciu sesji).
+        # Webhook Cloudinary nie ma sesji - sprawdza podpis powiadomienia
         if (request.path.startswith('/admin/') or 
             request.path.startswith('/static/') or 
-            request.path.startswith('/media/')):
+            request.path.startswith('/media/') or
+            request.path == '/sw.js' or
+            request.path == '/api/cloudinary/notifications/'):
             return self.get_response(request)
         
         # Sprawdzamy czy użytkownik ma ważny token w sesji
@@ -169,7 +174,10 @@ class WeddingAccessMiddleware:
         </body>
         </html>
         """
-        return HttpResponse(html_content, content_type='text/html')
+        response = HttpResponse(html_content, content_type='text/html')
+        # Service worker nie może zapamiętać tej strony zamiast właściwej
+        response['Cache-Control'] = 'no-store'
+        return response
 
 
 class WeddingSetupMiddleware:
@@ -182,7 +190,8 @@ class WeddingSetupMiddleware:
         # Skip for admin and static files
         if (request.path.startswith('/admin/') or 
             request.path.startswith('/static/') or
-            request.path.startswith('/media/')):
+            request.path.startswith('/media/') or
+            request.path == '/sw.js'):
             response = self.get_response(request)
             return response
         
@@ -196,4 +205,29 @@ class WeddingSetupMiddleware:
                 )
         
         response = self.get_response(request)
-        return response
\ No newline at end of file
+        return response
+
+
+class MessagesNoStoreMiddleware:
+    """Strony, które wyświetliły komunikaty (django.contrib.messages), nie trafiają do żadnego cache
+    
+    Komunikat ma się pokazać raz - service worker zapisujący takie strony pokazywałby go
+    przy kolejnych wizytach. "no-store" pomija też w sw.js.
+    
+    Odświeżenie strony w tle przez service worker (nagłówek X-SW-Revalidate) nie zużywa
+    komunikatów - użytkownik widzi wtedy kopię z cache, a komunikat dostanie po przeładowaniu.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        storage = getattr(request, '_messages', None)
+        # used - szablon przeszedł po komunikatach (pusta lista nie liczy się jako wyświetlenie)
+        if storage is not None and storage.used:
+            add_never_cache_headers(response)
+            if request.headers.get('X-SW-Revalidate'):
+                # MessageMiddleware (zewnętrzne) zapisze je z powrotem na następne żądanie
+                storage.used = False
+        return response
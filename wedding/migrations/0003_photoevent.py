@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wedding', '0002_guest_chair_position'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PhotoEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('approved', 'Zatwierdzone'), ('featured', 'Wyróżnione')], max_length=20, verbose_name='Rodzaj')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('photo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='wedding.photo', verbose_name='Zdjęcie')),
+            ],
+            options={
+                'verbose_name': 'Zdarzenie zdjęcia',
+                'verbose_name_plural': 'Zdarzenia zdjęć',
+                'ordering': ['id'],
+            },
+        ),
+    ]
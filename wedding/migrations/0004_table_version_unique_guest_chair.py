@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:49
+
+from django.db import migrations, models
+
+
+def release_duplicate_chairs(apps, schema_editor):
+    """Przed dodaniem ograniczenia zwalniamy zdublowane krzesła (zostaje gość o najniższym id)"""
+    Guest = apps.get_model('wedding', 'Guest')
+    seen = set()
+    duplicates = []
+    for guest_id, table_number, chair_position in Guest.objects.filter(
+        table_number__isnull=False, chair_position__isnull=False
+    ).order_by('id').values_list('id', 'table_number', 'chair_position'):
+        if (table_number, chair_position) in seen:
+            duplicates.append(guest_id)
+        else:
+            seen.add((table_number, chair_position))
+    Guest.objects.filter(id__in=duplicates).update(chair_position=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wedding', '0003_photoevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='table',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='Wersja rozsadzenia'),
+        ),
+        migrations.RunPython(release_duplicate_chairs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='guest',
+            constraint=models.UniqueConstraint(condition=models.Q(('chair_position__isnull', False), ('table_number__isnull', False)), fields=('table_number', 'chair_position'), name='unique_guest_chair'),
+        ),
+    ]
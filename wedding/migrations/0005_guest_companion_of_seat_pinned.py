@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wedding', '0004_table_version_unique_guest_chair'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='guest',
+            name='companion_of',
+            field=models.ForeignKey(blank=True, help_text='Dla osób towarzyszących - automatyczne rozsadzanie posadzi je obok tej osoby', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='companions', to='wedding.guest', verbose_name='Towarzyszy gościowi'),
+        ),
+        migrations.AddField(
+            model_name='guest',
+            name='seat_pinned',
+            field=models.BooleanField(default=False, help_text='Automatyczne rozsadzanie nie zmieni stołu ani krzesła tego gościa', verbose_name='Miejsce przypięte'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wedding', '0005_guest_companion_of_seat_pinned'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, help_text='Ustawiane automatycznie, gdy to samo zdjęcie zostało już przesłane', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='wedding.photo', verbose_name='Duplikat zdjęcia'),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='perceptual_hash',
+            field=models.CharField(blank=True, editable=False, max_length=16, verbose_name='Hash obrazu'),
+        ),
+    ]
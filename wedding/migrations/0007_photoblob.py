@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wedding', '0006_photo_perceptual_hash_duplicate_of'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PhotoBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True, verbose_name='SHA-256')),
+                ('name', models.CharField(max_length=255, verbose_name='Plik w storage')),
+                ('size', models.PositiveBigIntegerField(default=0, verbose_name='Rozmiar (bajty)')),
+                ('ref_count', models.PositiveIntegerField(default=0, verbose_name='Liczba zdjęć')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Plik zdjęcia',
+                'verbose_name_plural': 'Pliki zdjęć',
+            },
+        ),
+        migrations.AlterField(
+            model_name='photo',
+            name='image',
+            field=models.ImageField(max_length=255, upload_to='photos/%Y/%m/', verbose_name='Zdjęcie'),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='blob',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='photos', to='wedding.photoblob', verbose_name='Plik'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:09
+
+import uuid
+from datetime import timedelta
+
+from django.db import migrations, models
+
+BATCH_GAP = timedelta(minutes=5)
+
+
+def assign_legacy_batches(apps, schema_editor):
+    """Starym zdjęciom nadajemy partie tak, jak zgadywał je admin: ta sama osoba, przerwy do 5 minut"""
+    Photo = apps.get_model('wedding', 'Photo')
+    photos = []
+    previous = None
+    for photo in Photo.objects.exclude(uploader_name='').order_by('uploader_name', 'upload_date').only(
+        'id', 'uploader_name', 'upload_date'
+    ):
+        if (previous is None or photo.uploader_name != previous.uploader_name
+                or photo.upload_date - previous.upload_date > BATCH_GAP):
+            batch_id = uuid.uuid4()
+        photo.batch_id = batch_id
+        photos.append(photo)
+        previous = photo
+    Photo.objects.bulk_update(photos, ['batch_id'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wedding', '0007_photoblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='batch_id',
+            field=models.UUIDField(blank=True, db_index=True, editable=False, null=True, verbose_name='Partia'),
+        ),
+        migrations.RunPython(assign_legacy_batches, migrations.RunPython.noop),
+    ]
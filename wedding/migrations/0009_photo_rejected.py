@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wedding', '0008_photo_batch_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='rejected',
+            field=models.BooleanField(default=False, verbose_name='Odrzucone'),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['approved', 'rejected', 'id'], name='photo_moderation_queue'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wedding', '0009_photo_rejected'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StorageDeletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Plik w storage')),
+                ('reason', models.CharField(choices=[('deleted', 'Usunięte zdjęcie'), ('orphan', 'Plik bez zdjęcia w bazie')], default='deleted', max_length=20, verbose_name='Powód')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Próby usunięcia')),
+                ('last_error', models.TextField(blank=True, verbose_name='Ostatni błąd')),
+            ],
+            options={
+                'verbose_name': 'Plik do usunięcia',
+                'verbose_name_plural': 'Pliki do usunięcia',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wedding', '0010_storagedeletion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='renditions_ready',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Warianty gotowe'),
+        ),
+    ]
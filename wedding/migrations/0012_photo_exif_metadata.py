@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:33
+
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+
+def copy_upload_dates(apps, schema_editor):
+    """Do czasu uzupełnienia EXIF (extract_metadata) stare zdjęcia są w kolejności przesłania"""
+    Photo = apps.get_model('wedding', 'Photo')
+    Photo.objects.update(captured_at=F('upload_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wedding', '0011_photo_renditions_ready'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='camera',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='Aparat'),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='captured_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Czas zdjęcia'),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Wysokość'),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='orientation',
+            field=models.PositiveSmallIntegerField(default=1, editable=False, verbose_name='Orientacja EXIF'),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='taken_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Data zrobienia (EXIF)'),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Szerokość'),
+        ),
+        migrations.RunPython(copy_upload_dates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['approved', 'captured_at', 'id'], name='photo_capture_order'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wedding', '0012_photo_exif_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='dominant_color',
+            field=models.CharField(blank=True, editable=False, max_length=7, verbose_name='Dominujący kolor'),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='placeholder',
+            field=models.TextField(blank=True, editable=False, verbose_name='Podgląd (LQIP)'),
+        ),
+    ]
@@ -1,13 +1,14 @@
 # wedding/models.py - Szybka poprawka konfliktu
 
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
-from PIL import Image
 # Importy dla Cloudinary
 from django.conf import settings
-import cloudinary
-import cloudinary.uploader
+from django.utils import timezone
 from cloudinary import CloudinaryImage
+from django.core.files.storage import default_storage
+from .renditions import RENDITIONS, derived_files, local_rendition_name
+from .utils import optimize_local_image
 
 class WeddingInfo(models.Model):
     bride_name = models.CharField(max_length=100, verbose_name="Imię Panny Młodej")
@@ -37,12 +38,34 @@ class Guest(models.Model):
     guest_type = models.CharField(max_length=50, blank=True, verbose_name="Typ gościa")
     dietary_requirements = models.TextField(blank=True, verbose_name="Wymagania dietetyczne")
     plus_one = models.BooleanField(default=False, verbose_name="Osoba towarzysząca")
+    companion_of = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='companions',
+        verbose_name="Towarzyszy gościowi",
+        help_text="Dla osób towarzyszących - automatyczne rozsadzanie posadzi je obok tej osoby"
+    )
+    seat_pinned = models.BooleanField(
+        default=False,
+        verbose_name="Miejsce przypięte",
+        help_text="Automatyczne rozsadzanie nie zmieni stołu ani krzesła tego gościa"
+    )
     confirmed = models.BooleanField(default=True, verbose_name="Potwierdzony")
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         verbose_name = "Gość"
         verbose_name_plural = "Goście"
+        constraints = [
+            # Jedno krzesło = jeden gość
+            models.UniqueConstraint(
+                fields=['table_number', 'chair_position'],
+                condition=models.Q(table_number__isnull=False, chair_position__isnull=False),
+                name='unique_guest_chair',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.user.first_name} {self.user.last_name}"
@@ -74,6 +97,9 @@ class Table(models.Model):
     color = models.CharField(max_length=7, default='#d4c4a8', verbose_name="Kolor", help_text="Kolor w formacie hex np. #d4c4a8")
     border_color = models.CharField(max_length=7, default='#b8a082', verbose_name="Kolor obramowania", help_text="Kolor obramowania hex")
     
+    # Zwiększana przy każdej zmianie rozsadzenia - odrzuca edycje z nieaktualnej mapy
+    version = models.PositiveIntegerField(default=1, editable=False, verbose_name="Wersja rozsadzenia")
+    
     class Meta:
         verbose_name = "Stół"
         verbose_name_plural = "Stoły"
@@ -96,6 +122,73 @@ class Table(models.Model):
             return int((self.guests_count / self.capacity) * 100)
         return 0
 
+class PhotoBlob(models.Model):
+    """Plik zdjęcia w storage, współdzielony przez zdjęcia o identycznej treści - patrz wedding/blobs.py"""
+    sha256 = models.CharField(max_length=64, unique=True, verbose_name="SHA-256")
+    name = models.CharField(max_length=255, verbose_name="Plik w storage")
+    size = models.PositiveBigIntegerField(default=0, verbose_name="Rozmiar (bajty)")
+    ref_count = models.PositiveIntegerField(default=0, verbose_name="Liczba zdjęć")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Plik zdjęcia"
+        verbose_name_plural = "Pliki zdjęć"
+    
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count})"
+
+class StorageDeletion(models.Model):
+    """Plik do usunięcia ze storage - kolejkę przetwarza komenda gc_media (patrz wedding/media_gc.py)"""
+    DELETED = 'deleted'
+    ORPHAN = 'orphan'
+    REASON_CHOICES = [
+        (DELETED, 'Usunięte zdjęcie'),
+        (ORPHAN, 'Plik bez zdjęcia w bazie'),
+    ]
+    
+    name = models.CharField(max_length=255, unique=True, verbose_name="Plik w storage")
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES, default=DELETED, verbose_name="Powód")
+    created_at = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Próby usunięcia")
+    last_error = models.TextField(blank=True, verbose_name="Ostatni błąd")
+    
+    class Meta:
+        ordering = ['id']
+        verbose_name = "Plik do usunięcia"
+        verbose_name_plural = "Pliki do usunięcia"
+    
+    def __str__(self):
+        return self.name
+    
+    @classmethod
+    def queue(cls, names, reason=DELETED):
+        """Dopisuje pliki do kolejki (w bieżącej transakcji - wycofane usunięcie nie zostawia wpisu)"""
+        names = [name for name in names if name]
+        cls.objects.bulk_create([cls(name=name, reason=reason) for name in names], ignore_conflicts=True)
+        return len(names)
+
+class PhotoQuerySet(models.QuerySet):
+    """Zbiorcze zmiany statusu zdjęć, które zapisują też zdarzenia dla live feedu"""
+
+    def approve(self):
+        with transaction.atomic():
+            ids = [photo_id for photo_id, approved in self.values_list('id', 'approved') if not approved]
+            Photo.objects.filter(id__in=ids).update(approved=True, rejected=False)
+            PhotoEvent.record(ids, PhotoEvent.APPROVED)
+        return len(ids)
+
+    def feature(self):
+        with transaction.atomic():
+            rows = list(self.values_list('id', 'approved', 'featured'))
+            # Wyróżnione musi być zatwierdzone (i zdejmujemy ewentualne odrzucenie z kolejki moderacji)
+            count = Photo.objects.filter(id__in=[row[0] for row in rows]).update(
+                featured=True, approved=True, rejected=False
+            )
+            PhotoEvent.record([photo_id for photo_id, approved, _ in rows if not approved], PhotoEvent.APPROVED)
+            PhotoEvent.record([photo_id for photo_id, _, featured in rows if not featured], PhotoEvent.FEATURED)
+        return count
+
+
 class Photo(models.Model):
     CATEGORY_CHOICES = [
         ('ceremony', '💒 Ceremonia'),
@@ -109,7 +202,17 @@ class Photo(models.Model):
     
     title = models.CharField(max_length=200, verbose_name="Tytuł")
     description = models.TextField(blank=True, verbose_name="Opis")
-    image = models.ImageField(upload_to='photos/%Y/%m/', verbose_name="Zdjęcie")
+    image = models.ImageField(upload_to='photos/%Y/%m/', max_length=255, verbose_name="Zdjęcie")
+    # Nowe pliki zapisujemy pod skrótem treści - identyczne przesłania współdzielą jeden plik
+    blob = models.ForeignKey(
+        PhotoBlob,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='photos',
+        verbose_name="Plik"
+    )
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES, default='other', verbose_name="Kategoria")
     
     # NAPRAWIONY: Dodałem related_name żeby uniknąć konfliktu z cloudinary.Photo
@@ -132,16 +235,62 @@ class Photo(models.Model):
     
     approved = models.BooleanField(default=False, verbose_name="Zatwierdzone")
     featured = models.BooleanField(default=False, verbose_name="Wyróżnione")
+    # Odrzucone w kolejce moderacji - znika z kolejki, ale plik zostaje (można cofnąć w adminie)
+    rejected = models.BooleanField(default=False, verbose_name="Odrzucone")
     upload_date = models.DateTimeField(auto_now_add=True)
+    # Wspólny identyfikator wszystkich zdjęć wysłanych jednym formularzem
+    batch_id = models.UUIDField(null=True, blank=True, editable=False, db_index=True, verbose_name="Partia")
+    
+    # dHash (16 znaków hex) do wykrywania powtórzonych zdjęć - patrz wedding/duplicates.py
+    perceptual_hash = models.CharField(max_length=16, blank=True, editable=False, verbose_name="Hash obrazu")
+    # Metadane z nagłówka pliku odczytane przy wysyłaniu - patrz wedding/exif.py
+    taken_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="Data zrobienia (EXIF)")
+    # Klucz kolejności chronologicznej: czas z EXIF, a bez niego czas przesłania
+    captured_at = models.DateTimeField(default=timezone.now, editable=False, verbose_name="Czas zdjęcia")
+    width = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Szerokość")
+    height = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Wysokość")
+    orientation = models.PositiveSmallIntegerField(default=1, editable=False, verbose_name="Orientacja EXIF")
+    camera = models.CharField(max_length=100, blank=True, editable=False, verbose_name="Aparat")
+    # Podgląd 16 px (JPEG w base64) i dominujący kolor do natychmiastowego narysowania siatki - patrz wedding/placeholders.py
+    placeholder = models.TextField(blank=True, editable=False, verbose_name="Podgląd (LQIP)")
+    dominant_color = models.CharField(max_length=7, blank=True, editable=False, verbose_name="Dominujący kolor")
+    
+    # Warianty (miniatura, zoptymalizowane, pełne) wygenerowane z góry - patrz wedding/renditions.py
+    renditions_ready = models.BooleanField(default=False, editable=False, verbose_name="Warianty gotowe")
+    duplicate_of = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='duplicates',
+        verbose_name="Duplikat zdjęcia",
+        help_text="Ustawiane automatycznie, gdy to samo zdjęcie zostało już przesłane"
+    )
+    
+    objects = PhotoQuerySet.as_manager()
     
     class Meta:
         verbose_name = "Zdjęcie"
         verbose_name_plural = "Zdjęcia"
         ordering = ['-upload_date']
+        indexes = [
+            # Kolejka moderacji: oczekujące zdjęcia stronicowane po id
+            models.Index(fields=['approved', 'rejected', 'id'], name='photo_moderation_queue'),
+            # Galeria i API w kolejności zrobienia zdjęć, stronicowane po kluczu (captured_at, id)
+            models.Index(fields=['approved', 'captured_at', 'id'], name='photo_capture_order'),
+        ]
     
     def __str__(self):
         return self.title
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Zapamiętujemy stan z bazy, żeby save() wiedział czy zdjęcie właśnie zatwierdzono
+        instance._saved_flags = (instance.__dict__.get('approved'), instance.__dict__.get('featured'))
+        instance._saved_image_name = instance.__dict__.get('image')
+        return instance
+    
     @property
     def uploader_display_name(self):
         """Zwraca nazwę osoby przesyłającej - użytkownika lub anonimową"""
@@ -197,49 +346,153 @@ class Photo(models.Model):
                 fixed_url = fixed_url.replace('https:/res.cloudinary.com', 'https://res.cloudinary.com')
             return fixed_url
     
+    def get_rendition_url(self, rendition):
+        """URL wariantu zdjęcia - ta sama transformacja, którą Cloudinary generuje przy uploadzie"""
+        if self.image and self.renditions_ready and not getattr(settings, 'USE_CLOUDINARY', False):
+            # Lokalnie warianty wyrenderował Pillow obok zdjęcia
+            return default_storage.url(local_rendition_name(self.image.name, rendition))
+        return self.get_cloudinary_url(**RENDITIONS[rendition])
+    
     def get_thumbnail_url(self):
         """URL do miniaturki zdjęcia w bardzo wysokiej jakości (800x800)"""
-        return self.get_cloudinary_url(
-            width=800,
-            height=800,
-            crop='fill',
-            quality='auto:best',
-            fetch_format='auto',
-            dpr='auto'  # Automatyczne dostosowanie do gęstości pikseli
-        )
+        return self.get_rendition_url('thumbnail')
     
     def get_optimized_url(self):
         """URL do zoptymalizowanego zdjęcia w bardzo wysokiej jakości (1800px szerokość)"""
-        return self.get_cloudinary_url(
-            width=1800,
-            quality='auto:best',
-            fetch_format='auto',
-            dpr='auto'  # Automatyczne dostosowanie do gęstości pikseli
-        )
+        return self.get_rendition_url('optimized')
     
     def get_full_size_url(self):
         """URL do pełnego zdjęcia w najwyższej jakości"""
-        return self.get_cloudinary_url(
-            quality='auto:best',
-            fetch_format='auto',
-            dpr='auto'  # Automatyczne dostosowanie do gęstości pikseli
+        return self.get_rendition_url('full')
+    
+    def get_placeholder_url(self):
+        """Podgląd 16 px jako data URI - wstawiany bezpośrednio w HTML/JSON, bez osobnego żądania"""
+        return f'data:image/jpeg;base64,{self.placeholder}' if self.placeholder else ''
+    
+    @property
+    def placeholder_style(self):
+        """Styl kafelka: dominujący kolor i rozmyty podgląd, zanim dojdzie właściwe zdjęcie"""
+        style = f'background-color: {self.dominant_color};' if self.dominant_color else ''
+        if self.placeholder:
+            style += f' background-image: url({self.get_placeholder_url()});'
+        return style.strip()
+    
+    def as_payload(self, placeholder=True):
+        """Dane zdjęcia dla przeglądarki - API galerii i lightbox na stronach
+        
+        placeholder=False pomija podgląd 16 px - na stronach ma go już kafelek w stylu.
+        """
+        optimized_url = self.get_optimized_url() or self.image.url if self.image else None
+        payload = {
+            'id': self.id,
+            'title': self.title,
+            'description': self.description,
+            'image_url': optimized_url,
+            'full_image_url': self.get_full_size_url() or optimized_url if self.image else None,
+            'category': self.category,
+            'category_display': self.get_category_display(),
+            'uploaded_by': self.uploader_display_name,
+            'upload_date': self.upload_date.isoformat(),
+            # Metadane z EXIF zapisane przy wysyłaniu - klient zna proporcje przed pobraniem zdjęcia
+            'taken_at': self.taken_at.isoformat() if self.taken_at else None,
+            'captured_at': self.captured_at.isoformat(),
+            'width': self.width,
+            'height': self.height,
+            'camera': self.camera,
+            'dominant_color': self.dominant_color,
+        }
+        if placeholder:
+            # Podgląd 16 px - kafelek ma obraz, zanim przyjdzie właściwe zdjęcie
+            payload['placeholder'] = self.get_placeholder_url()
+        return payload
+    
+    def copy_blob_dimensions(self, blob):
+        """Wymiary i orientacja zapisanego pliku - współdzielony plik mógł już zostać zmniejszony przy pierwszym uploadzie"""
+        stored = (
+            Photo.objects.filter(blob=blob, width__isnull=False)
+            .exclude(pk=self.pk)
+            .values('width', 'height', 'orientation')
+            .first()
         )
+        if stored is None and not getattr(settings, 'USE_CLOUDINARY', False):
+            # Plik bez innych zdjęć (np. czekający na gc_media) - czytamy sam nagłówek
+            from .exif import read_stored_metadata
+            try:
+                metadata = read_stored_metadata(blob.name)
+            except Exception as e:
+                print(f"Nie udało się odczytać metadanych zapisanego pliku: {e}")
+                return
+            stored = {field: metadata[field] for field in ('width', 'height', 'orientation')}
+        if stored:
+            self.width, self.height, self.orientation = stored['width'], stored['height'], stored['orientation']
     
     def save(self, *args, **kwargs):
+        was_approved, was_featured = getattr(self, '_saved_flags', (False, False))
+        previous_blob_id = self.blob_id
+        new_blob = False
+        if self.image and not self.image._committed:
+            # Metadane z nagłówka przesłanego pliku - jedyny raz, kiedy go czytamy
+            from .exif import apply_metadata, read_metadata
+            try:
+                apply_metadata(self, read_metadata(self.image.file))
+            except Exception as e:
+                print(f"Nie udało się odczytać metadanych zdjęcia: {e}")
+            # Podgląd liczymy raz, z przesłanego pliku w skali 1/8 - strony i API tylko go wstawiają
+            from .placeholders import compute_placeholder
+            try:
+                self.placeholder, self.dominant_color = compute_placeholder(self.image.file)
+            except Exception as e:
+                print(f"Nie udało się wygenerować podglądu zdjęcia: {e}")
+            # Nowy plik - zapis pod skrótem SHA-256, a przy identycznym pliku tylko nowa referencja
+            from .blobs import acquire_blob
+            blob, new_blob = acquire_blob(self.image.file)
+            self.blob = blob
+            self.image = blob.name
+            if not new_blob:
+                self.copy_blob_dimensions(blob)
+            # Ten sam plik przesłany ponownie ma już warianty, jeśli ma je poprzednie zdjęcie
+            self.renditions_ready = not new_blob and Photo.objects.filter(
+                blob=blob, renditions_ready=True
+            ).exists()
         super().save(*args, **kwargs)
+        self._saved_flags = (self.approved, self.featured)
         
-        # Optymalizacja zdjęć tylko dla lokalnego środowiska - dla Cloudinary ta optymalizacja jest niepotrzebna
-        if self.image and not getattr(settings, 'USE_CLOUDINARY', False):
+        if previous_blob_id and previous_blob_id != self.blob_id:
+            # Podmieniony plik (np. w adminie) - zwalniamy poprzedni
+            from .blobs import release_blob
+            release_blob(previous_blob_id)
+        elif not previous_blob_id and self.blob_id and getattr(self, '_saved_image_name', None):
+            # Stary plik sprzed przechowywania po skrócie - do usunięcia przez gc_media
+            StorageDeletion.queue([self._saved_image_name, *derived_files(self._saved_image_name)])
+        self._saved_image_name = self.image.name
+        
+        if self.approved and was_approved is False:
+            PhotoEvent.record([self.id], PhotoEvent.APPROVED)
+        if self.featured and was_featured is False:
+            PhotoEvent.record([self.id], PhotoEvent.FEATURED)
+        
+        # Optymalizacja zdjęć tylko dla lokalnego środowiska - dla Cloudinary ta optymalizacja jest niepotrzebna,
+        # a zdjęcia zmniejszone już w przeglądarce (presized) i pliki już wcześniej zapisane pomijamy
+        if (new_blob and not getattr(settings, 'USE_CLOUDINARY', False)
+                and not getattr(self, 'presized', False)):
             try:
-                img = Image.open(self.image.path)
-                if img.height > 2400 or img.width > 2400:
-                    # Zwiększamy maksymalny rozmiar dla lepszej jakości
-                    output_size = (2400, 2400)
-                    img.thumbnail(output_size, Image.Resampling.LANCZOS)
-                    # Zwiększamy jakość do 95%
-                    img.save(self.image.path, optimize=True, quality=95)
+                # Maksymalnie PHOTO_MAX_DIMENSION (2400px) przy jakości 95% - zachowujemy wysoką jakość
+                max_dimension = getattr(settings, 'PHOTO_MAX_DIMENSION', 2400)
+                if optimize_local_image(self.image.path, max_size=(max_dimension, max_dimension), quality=95):
+                    # Zmniejszony plik ma już obrót zapisany w pikselach - wymiary z jego nagłówka
+                    from .imaging import image_size
+                    self.width, self.height = image_size(self.image.path)
+                    self.orientation = 1
+                    Photo.objects.filter(pk=self.pk).update(
+                        width=self.width, height=self.height, orientation=self.orientation
+                    )
             except Exception as e:
                 print(f"Błąd przy optymalizacji zdjęcia: {e}")
+        
+        if new_blob:
+            # W Cloudinary warianty zamówił już upload (eager), lokalnie renderujemy je od razu
+            from .renditions import request_for_new_upload
+            self.renditions_ready = request_for_new_upload(self)
     
     # METODY DO OBSŁUGI URL-I CLOUDINARY (FALLBACK)
     def get_cloudinary_url_simple(self, size='medium'):
@@ -259,16 +512,52 @@ class Photo(models.Model):
                 if self.image.url and 'https:/res.cloudinary.com' in str(self.image.url):
                     return str(self.image.url).replace('https:/res.cloudinary.com', 'https://res.cloudinary.com')
         return ""
+
+class PhotoEvent(models.Model):
+    """Dziennik zmian zdjęć dla live feedu - id rekordu jest numerem zdarzenia SSE"""
+    APPROVED = 'approved'
+    FEATURED = 'featured'
+    KIND_CHOICES = [
+        (APPROVED, 'Zatwierdzone'),
+        (FEATURED, 'Wyróżnione'),
+    ]
     
-    def delete(self, *args, **kwargs):
-        """Nadpisana metoda usuwania, aby także usuwać zdjęcia z Cloudinary."""
-        if self.image:
-            try:
-                # Usuń zdjęcie z Cloudinary
-                cloudinary.uploader.destroy(self.image.name, invalidate=True)
-            except Exception as e:
-                print(f"Błąd przy usuwaniu zdjęcia z Cloudinary: {e}")
-        super().delete(*args, **kwargs)
+    photo = models.ForeignKey(Photo, on_delete=models.CASCADE, related_name='events', verbose_name="Zdjęcie")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name="Rodzaj")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['id']
+        verbose_name = "Zdarzenie zdjęcia"
+        verbose_name_plural = "Zdarzenia zdjęć"
+    
+    def __str__(self):
+        return f"#{self.id} {self.kind} ({self.photo_id})"
+    
+    @classmethod
+    def record(cls, photo_ids, kind):
+        """Zapisuje zdarzenia dla podanych zdjęć i przesuwa licznik w cache"""
+        if not photo_ids:
+            return []
+        events = cls.objects.bulk_create([cls(photo_id=photo_id, kind=kind) for photo_id in photo_ids])
+        from .live_feed import bump_event_sequence
+        transaction.on_commit(bump_event_sequence)
+        return events
+    
+    def as_payload(self):
+        """Kompaktowa postać zdarzenia wysyłana do przeglądarek"""
+        photo = self.photo
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'photo': {
+                'id': photo.id,
+                'title': photo.title,
+                'category': photo.category,
+                'uploaded_by': photo.uploader_display_name,
+                'thumbnail_url': (photo.get_thumbnail_url() or photo.image.url) if photo.image else None,
+            },
+        }
 
 class ScheduleEvent(models.Model):
     title = models.CharField(max_length=200, verbose_name="Tytuł")
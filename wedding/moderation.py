@@ -0,0 +1,125 @@
+"""Kolejka moderacji zdjęć dla obsługi w trakcie wesela.
+
+Oczekujące zdjęcia pobieramy stronami po kluczu (id > ostatnie widziane id),
+więc kolejna strona kosztuje tyle samo niezależnie od tego, ile zdjęć już
+przejrzano. Decyzje z przeglądarki przychodzą paczkami i zapisujemy je jednym
+UPDATE z CASE - niezależnie od tego, ile zdjęć zatwierdzono, wyróżniono czy
+odrzucono w paczce.
+"""
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+
+from .models import Photo, PhotoEvent
+
+QUEUE_PAGE_SIZE = 60
+MAX_QUEUE_PAGE_SIZE = 200
+MAX_DECISIONS = 500
+
+APPROVE = 'approve'
+FEATURE = 'feature'
+REJECT = 'reject'
+ACTIONS = (APPROVE, FEATURE, REJECT)
+
+
+class ModerationError(ValueError):
+    """Nieprawidłowa paczka decyzji"""
+
+
+def pending_photos():
+    return Photo.objects.filter(approved=False, rejected=False)
+
+
+def thumbnail_url(photo):
+    """Mała miniatura do siatki - 320 px zamiast 800 px z get_thumbnail_url()"""
+    return photo.get_cloudinary_url(width=320, height=320, crop='fill', quality='auto', fetch_format='auto')
+
+
+def queue_page(after=0, limit=QUEUE_PAGE_SIZE):
+    """Strona kolejki: zdjęcia o id > after w kolejności przesłania i kursor następnej strony"""
+    limit = max(1, min(limit, MAX_QUEUE_PAGE_SIZE))
+    photos = list(
+        pending_photos()
+        .filter(id__gt=after)
+        .select_related('uploaded_by')
+        .order_by('id')[:limit + 1]
+    )
+    has_more = len(photos) > limit
+    photos = photos[:limit]
+    return {
+        'photos': [
+            {
+                'id': photo.id,
+                'title': photo.title,
+                'thumbnail_url': thumbnail_url(photo),
+                'full_url': photo.get_optimized_url(),
+                'uploader': photo.uploader_display_name,
+                'category': photo.get_category_display(),
+                'upload_date': photo.upload_date.isoformat(),
+                'duplicate_of': photo.duplicate_of_id,
+            }
+            for photo in photos
+        ],
+        'next_after': photos[-1].id if photos else after,
+        'has_more': has_more,
+    }
+
+
+def parse_decisions(raw_decisions):
+    """{id: akcja} z listy [{"id", "action"}] - przy kilku decyzjach dla zdjęcia wygrywa ostatnia"""
+    if not isinstance(raw_decisions, list) or not raw_decisions:
+        raise ModerationError('Brak decyzji do zapisania')
+    if len(raw_decisions) > MAX_DECISIONS:
+        raise ModerationError(f'Za dużo decyzji naraz (maksymalnie {MAX_DECISIONS})')
+
+    decisions = {}
+    for raw in raw_decisions:
+        try:
+            photo_id = int(raw['id'])
+            action = raw['action']
+        except (KeyError, TypeError, ValueError):
+            raise ModerationError('Nieprawidłowy format decyzji')
+        if action not in ACTIONS:
+            raise ModerationError(f'Nieznana akcja: {action}')
+        decisions[photo_id] = action
+    return decisions
+
+
+def apply_decisions(decisions):
+    """Zapisuje decyzje jednym UPDATE i dopisuje zdarzenia live feedu; zwraca liczniki akcji"""
+    ids_by_action = {action: [] for action in ACTIONS}
+    for photo_id, action in decisions.items():
+        ids_by_action[action].append(photo_id)
+    approved_ids = ids_by_action[APPROVE] + ids_by_action[FEATURE]
+    featured_ids = ids_by_action[FEATURE]
+    rejected_ids = ids_by_action[REJECT]
+
+    with transaction.atomic():
+        current = {
+            photo_id: (approved, featured)
+            for photo_id, approved, featured in Photo.objects.select_for_update()
+            .filter(id__in=list(decisions))
+            .values_list('id', 'approved', 'featured')
+        }
+        Photo.objects.filter(id__in=list(current)).update(
+            approved=Case(
+                When(id__in=approved_ids, then=Value(True)),
+                When(id__in=rejected_ids, then=Value(False)),
+                default=F('approved'),
+            ),
+            featured=Case(
+                When(id__in=featured_ids, then=Value(True)),
+                When(id__in=rejected_ids, then=Value(False)),
+                default=F('featured'),
+            ),
+            rejected=Case(
+                When(id__in=rejected_ids, then=Value(True)),
+                default=Value(False),
+            ),
+        )
+        PhotoEvent.record([i for i in approved_ids if i in current and not current[i][0]], PhotoEvent.APPROVED)
+        PhotoEvent.record([i for i in featured_ids if i in current and not current[i][1]], PhotoEvent.FEATURED)
+
+    return {
+        action: len([photo_id for photo_id in ids if photo_id in current])
+        for action, ids in ids_by_action.items()
+    }
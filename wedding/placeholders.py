@@ -0,0 +1,63 @@
+"""Podglądy zdjęć (LQIP) do natychmiastowego narysowania galerii.
+
+Dla każdego zdjęcia raz, przy wysyłaniu, liczymy miniaturę 16 px (JPEG
+w base64, kilkaset bajtów) i dominujący kolor. Szablony i API wstawiają je
+od razu w HTML/JSON razem z wymiarami zdjęcia, więc siatka ma od początku
+pełny układ i rozmyte podglądy, a właściwe zdjęcia dochodzą na ich miejsce.
+
+Miniaturę liczymy z dekodowania JPEG w skali 1/8 (wedding/imaging.py) -
+kilkanaście ms nawet dla zdjęcia 12 MP. Starsze zdjęcia uzupełnia komenda
+generate_placeholders.
+"""
+import base64
+from io import BytesIO
+
+from django.conf import settings
+
+from .imaging import load_downscaled
+
+PLACEHOLDER_SIZE = 16
+PLACEHOLDER_QUALITY = 60
+SOURCE_SIZE = 64            # tyle pobieramy z Cloudinary przy uzupełnianiu starych zdjęć
+
+
+def compute_placeholder(source):
+    """(JPEG 16 px w base64, dominujący kolor '#rrggbb') z pliku, ścieżki albo strumienia"""
+    try:
+        image = load_downscaled(source, (PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    finally:
+        if hasattr(source, 'seek'):
+            source.seek(0)
+
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=PLACEHOLDER_QUALITY, optimize=True)
+    placeholder = base64.b64encode(buffer.getvalue()).decode('ascii')
+
+    # Najczęstszy z czterech kolorów - średnia z całego zdjęcia bywa szarobura
+    palette = image.quantize(colors=4)
+    _count, index = max(palette.getcolors())
+    red, green, blue = palette.getpalette()[index * 3:index * 3 + 3]
+    return placeholder, f'#{red:02x}{green:02x}{blue:02x}'
+
+
+def placeholder_source(photo):
+    """Źródło do policzenia podglądu zapisanego zdjęcia - w Cloudinary mała wersja zamiast całego pliku"""
+    if getattr(settings, 'USE_CLOUDINARY', False):
+        import requests
+
+        url = photo.get_cloudinary_url(width=SOURCE_SIZE, height=SOURCE_SIZE, crop='limit', format='jpg')
+        response = requests.get(url, timeout=10)
+        response.raise_for_status()
+        return BytesIO(response.content)
+
+    from .backup import open_source
+
+    source = open_source(photo.image.name)
+    try:
+        return BytesIO(source.read())
+    finally:
+        source.close()
+
+
+def placeholder_for_photo(photo):
+    return compute_placeholder(placeholder_source(photo))
@@ -0,0 +1,102 @@
+"""Lista plików statycznych, które service worker pobiera do cache przy instalacji.
+
+Każdy plik dostaje rewizję (skrót treści), a wersja cache to skrót wszystkich
+rewizji - zmiana dowolnego pliku po wdrożeniu daje nową nazwę cache, nowy
+service worker pobiera aktualne pliki, a przy aktywacji usuwa stare cache.
+
+Manifest zapisujemy w STATIC_ROOT podczas collectstatic (PrecacheStaticFilesStorage)
+albo komendą build_precache_manifest. Bez collectstatic (DEBUG) liczymy go na
+bieżąco z plików źródłowych.
+"""
+import hashlib
+import json
+from fnmatch import fnmatch
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.base import ContentFile
+
+PRECACHE_MANIFEST_NAME = 'precache-manifest.json'
+PRECACHE_PATTERNS = [
+    'manifest.json',
+    'wedding/css/*.css',
+    'wedding/js/*.js',
+    'wedding/images/*',
+]
+# fnmatch: "*" obejmuje też "/", więc podkatalogi wykluczamy jawnie
+PRECACHE_EXCLUDE = [
+    'wedding/css/admin/*',
+    'wedding/js/*test*.js',
+    'wedding/js/admin_*.js',
+    'wedding/js/table_map.js',  # stara wersja mapy, zastąpiona przez table_map_leaflet.js
+]
+
+_loaded_manifest = None
+
+
+def is_precached(path):
+    path = path.replace('\\', '/')
+    return (any(fnmatch(path, pattern) for pattern in PRECACHE_PATTERNS)
+            and not any(fnmatch(path, pattern) for pattern in PRECACHE_EXCLUDE))
+
+
+def build_precache_manifest(files):
+    """files - pary (ścieżka, storage); zwraca {'version': ..., 'files': [{'url', 'revision'}]}"""
+    revisions = {}
+    for path, storage in files:
+        path = path.replace('\\', '/')
+        if path in revisions or not is_precached(path):
+            continue
+        digest = hashlib.md5()
+        with storage.open(path) as f:
+            for chunk in f.chunks():
+                digest.update(chunk)
+        revisions[path] = digest.hexdigest()[:12]
+
+    version = hashlib.md5(json.dumps(sorted(revisions.items())).encode()).hexdigest()[:12]
+    return {
+        'version': version,
+        'files': [
+            {'url': staticfiles_storage.url(path), 'revision': revision}
+            for path, revision in sorted(revisions.items())
+        ],
+    }
+
+
+def source_files():
+    """Pliki statyczne prosto z finderów (katalog static/ i aplikacje)"""
+    for finder in finders.get_finders():
+        yield from finder.list(['CVS', '.*', '*~'])
+
+
+def collected_files(storage, directory=''):
+    """Pliki już zebrane w STATIC_ROOT"""
+    directories, filenames = storage.listdir(directory)
+    for name in filenames:
+        yield f'{directory}/{name}' if directory else name, storage
+    for name in directories:
+        yield from collected_files(storage, f'{directory}/{name}' if directory else name)
+
+
+def write_precache_manifest(storage, files=None):
+    manifest = build_precache_manifest(files if files is not None else collected_files(storage))
+    if storage.exists(PRECACHE_MANIFEST_NAME):
+        storage.delete(PRECACHE_MANIFEST_NAME)
+    storage.save(PRECACHE_MANIFEST_NAME, ContentFile(json.dumps(manifest, indent=2).encode()))
+    return manifest
+
+
+def load_precache_manifest():
+    """Manifest z collectstatic; w DEBUG albo bez collectstatic - liczony z plików źródłowych"""
+    global _loaded_manifest
+
+    if settings.DEBUG:
+        return build_precache_manifest(source_files())
+    if _loaded_manifest is None:
+        try:
+            with staticfiles_storage.open(PRECACHE_MANIFEST_NAME) as f:
+                _loaded_manifest = json.loads(f.read().decode())
+        except (OSError, ValueError):
+            _loaded_manifest = build_precache_manifest(source_files())
+    return _loaded_manifest
@@ -0,0 +1,198 @@
+"""Warianty zdjęć (miniatura, zoptymalizowane, pełne) generowane z góry.
+
+Cloudinary generuje transformację przy pierwszym żądaniu adresu, co przy
+zimnym cache trwa kilka sekund - płacił za to pierwszy gość w galerii. Teraz
+zamawiamy te same transformacje przy wysyłaniu zdjęcia (eager, asynchronicznie),
+a Cloudinary po ich wygenerowaniu woła nasz webhook, który oznacza zdjęcie
+jako gotowe (Photo.renditions_ready). Zdjęcia sprzed tej zmiany uzupełnia
+komenda generate_renditions.
+
+Wariantów z f_auto i dpr_auto nie da się wygenerować z góry (zależą od
+przeglądarki), więc warianty mają konkretny format (WebP) i gęstość - adres
+w galerii to dokładnie ta sama transformacja, którą zamówiliśmy.
+
+Bez Cloudinary (lokalnie, w testach) te same warianty renderuje Pillow do
+storage (renditions/<plik>/<wariant>.webp) i z nich korzystają get_*_url().
+Przy uploadzie robi to jeden wątek w tle, już po odpowiedzi - do tego czasu
+adresy wskazują oryginał. Warianty przerwane restartem serwera uzupełnia
+generate_renditions.
+"""
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .imaging import open_image
+
+RENDITIONS = {
+    'thumbnail': {'width': 800, 'height': 800, 'crop': 'fill', 'quality': 'auto:best', 'format': 'webp'},
+    'optimized': {'width': 1800, 'quality': 'auto:best', 'format': 'webp'},
+    'full': {'quality': 'auto:best', 'format': 'webp'},
+}
+RENDITIONS_PREFIX = 'renditions/'
+LOCAL_QUALITY = 90          # odpowiednik q_auto:best dla lokalnego WebP
+
+
+def use_cloudinary():
+    return getattr(settings, 'USE_CLOUDINARY', False)
+
+
+def eager_upload_options():
+    """Opcje uploadu Cloudinary zamawiające wszystkie warianty w tle"""
+    options = {
+        'eager': list(RENDITIONS.values()),
+        'eager_async': True,
+    }
+    notification_url = getattr(settings, 'CLOUDINARY_EAGER_NOTIFICATION_URL', '')
+    if notification_url:
+        options['eager_notification_url'] = notification_url
+    return options
+
+
+def local_rendition_name(image_name, rendition):
+    return f'{RENDITIONS_PREFIX}{os.path.splitext(image_name)[0]}/{rendition}.webp'
+
+
+def derived_files(image_name):
+    """Pliki wariantów do usunięcia razem z plikiem zdjęcia (Cloudinary usuwa swoje sam)"""
+    if use_cloudinary() or not image_name:
+        return []
+    return [local_rendition_name(image_name, rendition) for rendition in RENDITIONS]
+
+
+def transform(image, options):
+    """Lokalny odpowiednik transformacji Cloudinary (c_fill i domyślne c_scale)"""
+    width, height = options.get('width'), options.get('height')
+    if options.get('crop') == 'fill' and width and height:
+        return ImageOps.fit(image, (width, height), Image.Resampling.LANCZOS)
+    if width:
+        return image.resize((width, max(1, round(image.height * width / image.width))), Image.Resampling.LANCZOS)
+    return image
+
+
+def render_local_renditions(image_name):
+    """Renderuje warianty pliku zdjęcia do lokalnego storage"""
+    with default_storage.open(image_name, 'rb') as f:
+        source = ImageOps.exif_transpose(open_image(f)).convert('RGB')
+
+    for rendition, options in RENDITIONS.items():
+        buffer = BytesIO()
+        transform(source, options).save(buffer, 'WEBP', quality=LOCAL_QUALITY, method=4)
+        name = local_rendition_name(image_name, rendition)
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def request_renditions(image_name, wait=False):
+    """Zamawia warianty pliku; zwraca True, gdy są już gotowe (lokalnie albo przy wait=True)"""
+    if not use_cloudinary():
+        render_local_renditions(image_name)
+        return True
+
+    import cloudinary.uploader
+
+    options = eager_upload_options()
+    if wait:
+        # Komenda generate_renditions czeka na wynik - nie potrzebuje webhooka
+        options['eager_async'] = False
+        options.pop('eager_notification_url', None)
+    response = cloudinary.uploader.explicit(image_name, type='upload', **options)
+    return wait and len(response.get('eager', [])) == len(RENDITIONS)
+
+
+def mark_ready(image_names):
+    """Oznacza zdjęcia z podanymi plikami (także współdzielonymi) jako mające gotowe warianty"""
+    from .models import Photo
+
+    return Photo.objects.filter(image__in=list(image_names), renditions_ready=False).update(renditions_ready=True)
+
+
+_local_pool = None
+_local_pool_lock = threading.Lock()
+
+
+def local_pool():
+    """Jeden wątek na proces - renderowanie nie zabiera procesora równoległym żądaniom"""
+    global _local_pool
+    with _local_pool_lock:
+        if _local_pool is None:
+            _local_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='renditions')
+    return _local_pool
+
+
+def wait_for_local_renditions():
+    """Czeka na zlecone warianty (np. przed usunięciem tymczasowej bazy w loadtest)"""
+    global _local_pool
+    with _local_pool_lock:
+        pool, _local_pool = _local_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+def render_and_mark_ready(image_name):
+    try:
+        render_local_renditions(image_name)
+    except Exception as e:
+        print(f"Nie udało się wygenerować wariantów pliku {image_name}: {e}")
+        return False
+    mark_ready([image_name])
+    return True
+
+
+def render_in_background(image_name):
+    try:
+        return render_and_mark_ready(image_name)
+    finally:
+        # Wątek puli nie przechodzi przez cykl żądania - sam zamyka swoje połączenie z bazą
+        connection.close()
+
+
+def request_for_new_upload(photo):
+    """Po zapisaniu nowego pliku: lokalnie zlecamy warianty wątkowi w tle, w Cloudinary zamówił je już upload
+
+    Zwraca, czy warianty są już gotowe - zwykle nie: flagę ustawi wątek albo webhook Cloudinary.
+    """
+    if use_cloudinary():
+        return False
+    if getattr(settings, 'LOCAL_RENDITIONS_SYNC', False):
+        return render_and_mark_ready(photo.image.name)
+    # Po commicie - wątek musi widzieć zapisane zdjęcie, żeby oznaczyć je jako gotowe
+    image_name = photo.image.name
+    transaction.on_commit(lambda: local_pool().submit(render_in_background, image_name))
+    return False
+
+
+class NotificationError(Exception):
+    """Powiadomienie Cloudinary z błędnym podpisem albo treścią"""
+
+
+def handle_notification(body, timestamp, signature):
+    """Webhook eager z Cloudinary: po sprawdzeniu podpisu oznacza zdjęcie jako gotowe; zwraca liczbę zdjęć"""
+    import cloudinary
+    from cloudinary.utils import verify_notification_signature
+
+    if not cloudinary.config().api_secret:
+        raise NotificationError('Brak konfiguracji Cloudinary')
+    try:
+        valid = verify_notification_signature(body.decode(), int(timestamp), signature)
+        data = json.loads(body)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise NotificationError('Nieprawidłowe powiadomienie')
+    if not valid:
+        raise NotificationError('Nieprawidłowy podpis')
+
+    if data.get('notification_type') != 'eager' or not data.get('public_id'):
+        return 0
+    eager = data.get('eager') or []
+    if len(eager) < len(RENDITIONS) or any(item.get('status') == 'failed' for item in eager):
+        # Nie wszystkie warianty powstały - zostawiamy zdjęcie dla generate_renditions
+        return 0
+    return mark_ready([data['public_id']])
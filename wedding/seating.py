@@ -0,0 +1,585 @@
+"""Logika rozsadzania gości przy stołach.
+
+Zmiany miejsc idą przez apply_chair_moves: wszystkie przesunięcia z jednego
+żądania zapisujemy w jednej transakcji, blokując wiersze gości i stołów
+(select_for_update), a numer wersji stołu odrzuca edycje zrobione na
+nieaktualnym widoku mapy.
+"""
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Guest, Table
+
+PLAN_VERSION_CACHE_KEY = 'seating_plan:version'
+PLAN_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+class SeatingError(ValueError):
+    """Nieprawidłowe żądanie przesadzenia (błędne dane, brak miejsca)"""
+
+
+class SeatingConflict(Exception):
+    """Ktoś inny zmienił stół w międzyczasie - klient musi odświeżyć widok"""
+
+    def __init__(self, message, versions):
+        super().__init__(message)
+        self.versions = versions
+
+
+def parse_moves(raw_moves):
+    """Zamienia listę słowników z JSON-a na krotki (guest_id, table_number, chair_position, czy_podano_stół)"""
+    if not isinstance(raw_moves, list) or not raw_moves:
+        raise SeatingError('Brak przesunięć do zapisania')
+
+    moves = []
+    for raw in raw_moves:
+        if not isinstance(raw, dict):
+            raise SeatingError('Nieprawidłowy format przesunięcia')
+        try:
+            guest_id = int(raw['guest_id'])
+            chair_position = raw.get('chair_position')
+            chair_position = int(chair_position) if chair_position is not None else None
+            # Brak table_number = zostaje przy obecnym stole
+            table_number = int(raw['table_number']) if raw.get('table_number') is not None else None
+        except (KeyError, TypeError, ValueError):
+            raise SeatingError('Nieprawidłowe dane przesunięcia')
+        moves.append((guest_id, table_number, chair_position, 'table_number' in raw))
+
+    guest_ids = [move[0] for move in moves]
+    if len(set(guest_ids)) != len(guest_ids):
+        raise SeatingError('Ten sam gość występuje kilka razy')
+    return moves
+
+
+def parse_versions(raw_versions):
+    if raw_versions is None:
+        return None
+    if not isinstance(raw_versions, dict):
+        raise SeatingError('Nieprawidłowe wersje stołów')
+    try:
+        return {int(number): int(version) for number, version in raw_versions.items()}
+    except (TypeError, ValueError):
+        raise SeatingError('Nieprawidłowe wersje stołów')
+
+
+def apply_chair_moves(moves, versions=None):
+    """Zapisuje przesunięcia atomowo.
+
+    moves - wynik parse_moves, versions - {numer stołu: wersja widziana przez klienta}
+    albo None, gdy wywołujący świadomie pomija kontrolę wersji.
+    Zwraca aktualne wersje wszystkich dotkniętych stołów.
+    """
+    try:
+        with transaction.atomic():
+            return _apply_chair_moves(moves, versions)
+    except IntegrityError:
+        # Równoległy zapis zdążył zająć krzesło między naszym odczytem a zapisem
+        raise SeatingConflict('Miejsce zostało właśnie zajęte', current_versions(_touched_tables(moves)))
+
+
+def _apply_chair_moves(moves, versions):
+    if connection.vendor == 'sqlite':
+        # SQLite ignoruje select_for_update, a podniesienie blokady odczytu do zapisu
+        # w trakcie transakcji kończy się od razu "database is locked". Pusty UPDATE
+        # na starcie bierze blokadę zapisu (z czekaniem), zanim cokolwiek przeczytamy.
+        Table.objects.filter(number__lt=0).update(version=F('version'))
+
+    # Stała kolejność blokad (goście po id, potem stoły po numerze) chroni przed zakleszczeniem
+    guest_ids = sorted(move[0] for move in moves)
+    guests = {
+        guest.id: guest
+        for guest in Guest.objects.select_for_update().filter(id__in=guest_ids).order_by('id')
+    }
+    missing = set(guest_ids) - set(guests)
+    if missing:
+        raise SeatingError(f'Nie znaleziono gości: {", ".join(map(str, sorted(missing)))}')
+
+    targets = {}
+    for guest_id, table_number, chair_position, has_table in moves:
+        guest = guests[guest_id]
+        new_table = table_number if has_table else guest.table_number
+        targets[guest_id] = (new_table, chair_position)
+
+    touched = {guest.table_number for guest in guests.values()} | {table for table, _ in targets.values()}
+    touched.discard(None)
+    tables = {
+        table.number: table
+        for table in Table.objects.select_for_update().filter(number__in=touched).order_by('number')
+    }
+
+    if versions is not None:
+        stale = [number for number in tables if versions.get(number) != tables[number].version]
+        if stale:
+            raise SeatingConflict(
+                f'Układ stołu {", ".join(map(str, sorted(stale)))} zmienił się w międzyczasie',
+                {number: table.version for number, table in tables.items()},
+            )
+
+    for guest_id, (table_number, chair_position) in targets.items():
+        if chair_position is not None and table_number is None:
+            raise SeatingError('Nie można przypisać krzesła bez stołu')
+        if table_number is not None and table_number not in tables:
+            raise SeatingError(f'Stół {table_number} nie istnieje')
+        if chair_position is not None and not 1 <= chair_position <= tables[table_number].capacity:
+            raise SeatingError(f'Stół {table_number} nie ma krzesła {chair_position}')
+
+    # Sprawdzamy stan końcowy - zamiany miejsc w obrębie żądania są dozwolone
+    taken = {
+        (table_number, chair_position): guest_id
+        for guest_id, table_number, chair_position in Guest.objects.filter(
+            table_number__in=touched, chair_position__isnull=False
+        ).exclude(id__in=guest_ids).values_list('id', 'table_number', 'chair_position')
+    }
+    for guest_id, seat in targets.items():
+        if seat[1] is None:
+            continue
+        if seat in taken:
+            raise SeatingConflict(
+                f'Krzesło {seat[1]} przy stole {seat[0]} jest już zajęte',
+                {number: table.version for number, table in tables.items()},
+            )
+        taken[seat] = guest_id
+
+    # Najpierw zwalniamy krzesła, potem zapisujemy nowe - inaczej zamiana dwóch
+    # gości naruszyłaby unikalność (table_number, chair_position) w połowie zapisu
+    Guest.objects.filter(id__in=guest_ids).update(chair_position=None)
+    for guest_id, (table_number, chair_position) in targets.items():
+        guests[guest_id].table_number = table_number
+        guests[guest_id].chair_position = chair_position
+    Guest.objects.bulk_update(guests.values(), fields=['table_number', 'chair_position'])
+
+    bump_table_versions(tables)
+    return {number: table.version + 1 for number, table in tables.items()}
+
+
+def bump_table_versions(table_numbers):
+    """Oznacza stoły jako zmienione (np. po edycji gościa w panelu admina)"""
+    table_numbers = [number for number in table_numbers if number is not None]
+    if table_numbers:
+        Table.objects.filter(number__in=table_numbers).update(version=F('version') + 1)
+        transaction.on_commit(invalidate_seating_plan)
+
+
+# --- Wersja planu sali (ETag endpointu z planem) ------------------------------
+
+def seating_plan_version():
+    """Znacznik bieżącego planu sali - milisekundy ostatniej zmiany (służy też jako Last-Modified)"""
+    version = cache.get(PLAN_VERSION_CACHE_KEY)
+    if version is None:
+        version = int(time.time() * 1000)
+        cache.set(PLAN_VERSION_CACHE_KEY, version, PLAN_CACHE_TIMEOUT)
+    return version
+
+
+def invalidate_seating_plan():
+    previous = cache.get(PLAN_VERSION_CACHE_KEY) or 0
+    cache.set(PLAN_VERSION_CACHE_KEY, max(int(time.time() * 1000), previous + 1), PLAN_CACHE_TIMEOUT)
+
+
+@receiver([post_save, post_delete], sender=Guest)
+@receiver([post_save, post_delete], sender=Table)
+@receiver(post_save, sender=User)
+def seating_plan_changed(sender, **kwargs):
+    # Po commicie - inaczej równoległe żądanie zbuduje plan ze starych danych pod nowym znacznikiem
+    transaction.on_commit(invalidate_seating_plan)
+
+
+def _touched_tables(moves):
+    guest_tables = Guest.objects.filter(id__in=[move[0] for move in moves]).values_list('table_number', flat=True)
+    touched = set(guest_tables) | {move[1] for move in moves if move[3]}
+    touched.discard(None)
+    return touched
+
+
+def current_versions(table_numbers):
+    return dict(Table.objects.filter(number__in=table_numbers).values_list('number', 'version'))
+
+
+# --- Automatyczne rozsadzanie ---------------------------------------------
+
+COMPANION_MARKER = 'towarzysz'
+# Wagi funkcji kosztu: rozdzielona rodzina jest gorsza niż mieszanie grup przy stole,
+# a w trybie przyrostowym każda przesadzona osoba też kosztuje
+SPLIT_FAMILY_COST = 10
+MIXED_GROUP_COST = 3
+MOVED_GUEST_COST = 4
+DEFAULT_TIME_LIMIT = 0.5
+
+
+def is_companion(guest):
+    """Osoba towarzysząca - z CSV ("*osoba towarzysząca*") albo z nazwy nadanej przez import_guests"""
+    return (
+        COMPANION_MARKER in (guest.guest_type or '').lower()
+        or guest.user.first_name.lower().startswith('osoba towarzysz')
+    )
+
+
+def family_key(last_name):
+    """Wspólny klucz dla żeńskiej i męskiej formy nazwiska (Kowalska/Kowalski)"""
+    name = last_name.strip().lower()
+    for feminine, masculine in (('cka', 'cki'), ('dzka', 'dzki'), ('ska', 'ski')):
+        if name.endswith(feminine):
+            return name[:-len(feminine)] + masculine
+    return name
+
+
+class SeatingSolver:
+    """Heurystyczne rozsadzanie: zachłanny przydział rodzin do stołów + lokalne przeszukiwanie.
+
+    Atomem jest gość razem ze swoimi osobami towarzyszącymi (zawsze ten sam stół,
+    sąsiednie krzesła). Atomy jednej rodziny (nazwisko, albo rodzina partnera dla
+    osoby towarzyszącej) staramy się trzymać przy jednym stole, a przy stole -
+    gości z tej samej grupy (guest_type). Goście z seat_pinned, spoza movable_ids
+    albo niepotwierdzeni bez przypiętego miejsca nie są przesadzani.
+    """
+
+    def __init__(self, guests, tables, movable_ids=None, incremental=False,
+                 time_limit=DEFAULT_TIME_LIMIT, seed=0):
+        self.guests = sorted(guests, key=lambda guest: guest.id)
+        self.capacity = {table.number: table.capacity for table in tables}
+        self.movable_ids = set(movable_ids) if movable_ids is not None else None
+        self.incremental = incremental
+        self.time_limit = time_limit
+        self.rng = random.Random(seed)
+        self.unplaced = []
+
+    def solve(self):
+        """Zwraca {guest_id: (stół, krzesło)} dla wszystkich gości"""
+        self._classify()
+        self._build_atoms()
+        self._initial_assignment()
+        self._local_search()
+        return self._assign_chairs()
+
+    # Podział gości ----------------------------------------------------------
+
+    def _classify(self):
+        self.by_id = {guest.id: guest for guest in self.guests}
+        self.fixed = {}  # guest_id -> stół
+        self.free = []
+        self.result = {}
+
+        for guest in self.guests:
+            seated = guest.table_number in self.capacity
+            if guest.seat_pinned or (self.movable_ids is not None and guest.id not in self.movable_ids):
+                if seated:
+                    self.fixed[guest.id] = guest.table_number
+                else:
+                    self.result[guest.id] = (guest.table_number, guest.chair_position)
+            elif guest.confirmed:
+                self.free.append(guest)
+            else:
+                # Odwołał przyjazd - zwalniamy miejsce
+                self.result[guest.id] = (None, None)
+
+    def _build_atoms(self):
+        parent = {guest.id: guest.id for guest in self.guests}
+
+        def find(guest_id):
+            while parent[guest_id] != guest_id:
+                parent[guest_id] = parent[parent[guest_id]]
+                guest_id = parent[guest_id]
+            return guest_id
+
+        def union(a, b):
+            parent[find(a)] = find(b)
+
+        # Partner osoby towarzyszącej: jawne companion_of, a bez niego poprzedni
+        # gość w kolejności importu (CSV wpisuje osobę towarzyszącą zaraz po partnerze)
+        self.partner = {}
+        previous = None
+        for guest in self.guests:
+            if is_companion(guest):
+                partner_id = guest.companion_of_id if guest.companion_of_id in self.by_id else previous
+                if partner_id is not None:
+                    self.partner[guest.id] = partner_id
+                    union(guest.id, partner_id)
+            else:
+                previous = guest.id
+
+        families = {}
+        for guest in self.guests:
+            if guest.id not in self.partner:
+                key = family_key(guest.user.last_name)
+                if key in families:
+                    union(guest.id, families[key])
+                else:
+                    families[key] = guest.id
+
+        self.family = {guest.id: find(guest.id) for guest in self.guests}
+        self.group = {}
+        for guest in self.guests:
+            lead = self._lead(guest.id)
+            self.group[guest.id] = (self.by_id[lead].guest_type or '').strip().lower()
+
+        # Atomy z ruchomych gości; osoba towarzysząca przypiętego partnera dostaje jego stół
+        atoms = {}
+        for guest in self.free:
+            lead = self._lead(guest.id)
+            if lead in self.fixed:
+                self.fixed[guest.id] = self.fixed[lead]
+                continue
+            atoms.setdefault(lead, []).append(guest.id)
+        self.atoms = [sorted(members, key=lambda guest_id: guest_id != lead) for lead, members in atoms.items()]
+
+    def _lead(self, guest_id):
+        seen = set()
+        while guest_id in self.partner and guest_id not in seen:
+            seen.add(guest_id)
+            guest_id = self.partner[guest_id]
+        return guest_id
+
+    # Przydział stołów -------------------------------------------------------
+
+    def _initial_assignment(self):
+        self.load = {number: 0 for number in self.capacity}
+        self.family_tables = {}   # rodzina -> {stół: liczba osób}
+        self.table_groups = {number: {} for number in self.capacity}
+        for guest_id, table_number in self.fixed.items():
+            self._add_guest(guest_id, table_number)
+
+        self.atom_table = [None] * len(self.atoms)
+        pending = list(range(len(self.atoms)))
+
+        if self.incremental:
+            # Zostawiamy na miejscu wszystkich, którzy siedzą razem przy istniejącym stole
+            remaining = []
+            for index in pending:
+                tables = {self.by_id[guest_id].table_number for guest_id in self.atoms[index]}
+                table_number = tables.pop() if len(tables) == 1 else None
+                if table_number in self.capacity and self._fits(index, table_number):
+                    self._place(index, table_number)
+                else:
+                    remaining.append(index)
+            pending = remaining
+
+        # Największe rodziny najpierw, rodziny jednej grupy obok siebie
+        families = {}
+        for index in pending:
+            families.setdefault(self.family[self.atoms[index][0]], []).append(index)
+        order = sorted(
+            families.values(),
+            key=lambda indexes: (-sum(len(self.atoms[i]) for i in indexes), self.group[self.atoms[indexes[0]][0]]),
+        )
+        for indexes in order:
+            size = sum(len(self.atoms[i]) for i in indexes)
+            table_number = self._best_table(indexes, size)
+            if table_number is not None:
+                for index in indexes:
+                    self._place(index, table_number)
+                continue
+            # Rodzina nie mieści się przy jednym stole - rozkładamy ją atomami
+            for index in sorted(indexes, key=lambda i: -len(self.atoms[i])):
+                table_number = self._best_table([index], len(self.atoms[index]))
+                if table_number is None:
+                    self.unplaced.extend(self.atoms[index])
+                else:
+                    self._place(index, table_number)
+
+    def _best_table(self, indexes, size):
+        members = [guest_id for index in indexes for guest_id in self.atoms[index]]
+        family = self.family[members[0]]
+        group = self.group[members[0]]
+        best, best_score = None, None
+        for table_number, capacity in self.capacity.items():
+            free_seats = capacity - self.load[table_number]
+            if free_seats < size:
+                continue
+            score = (
+                20 * self.family_tables.get(family, {}).get(table_number, 0)
+                + 5 * self.table_groups[table_number].get(group, 0)
+                - MIXED_GROUP_COST * len(self.table_groups[table_number])
+                - (free_seats - size) * 0.1
+            )
+            if self.incremental:
+                score += MOVED_GUEST_COST * sum(
+                    1 for guest_id in members if self.by_id[guest_id].table_number == table_number
+                )
+            if best_score is None or score > best_score:
+                best, best_score = table_number, score
+        return best
+
+    def _fits(self, index, table_number):
+        return self.load[table_number] + len(self.atoms[index]) <= self.capacity[table_number]
+
+    def _add_guest(self, guest_id, table_number, delta=1):
+        self.load[table_number] += delta
+        family_tables = self.family_tables.setdefault(self.family[guest_id], {})
+        family_tables[table_number] = family_tables.get(table_number, 0) + delta
+        if not family_tables[table_number]:
+            del family_tables[table_number]
+        groups = self.table_groups[table_number]
+        group = self.group[guest_id]
+        groups[group] = groups.get(group, 0) + delta
+        if not groups[group]:
+            del groups[group]
+
+    def _place(self, index, table_number):
+        self.atom_table[index] = table_number
+        for guest_id in self.atoms[index]:
+            self._add_guest(guest_id, table_number)
+
+    def _unplace(self, index):
+        table_number = self.atom_table[index]
+        self.atom_table[index] = None
+        for guest_id in self.atoms[index]:
+            self._add_guest(guest_id, table_number, delta=-1)
+
+    # Lokalne przeszukiwanie ---------------------------------------------------
+
+    def _local_cost(self, indexes, tables):
+        """Koszt ograniczony do rodzin atomów i stołów, których dotyczy ruch"""
+        families = {self.family[self.atoms[index][0]] for index in indexes}
+        cost = SPLIT_FAMILY_COST * sum(max(len(self.family_tables.get(family, {})) - 1, 0) for family in families)
+        cost += MIXED_GROUP_COST * sum(max(len(self.table_groups[table]) - 1, 0) for table in tables)
+        if self.incremental:
+            cost += MOVED_GUEST_COST * sum(
+                1 for index in indexes for guest_id in self.atoms[index]
+                if self.by_id[guest_id].table_number != self.atom_table[index]
+            )
+        return cost
+
+    def _local_search(self):
+        placed = [index for index, table in enumerate(self.atom_table) if table is not None]
+        tables = list(self.capacity)
+        if len(placed) < 2 or len(tables) < 2:
+            return
+
+        deadline = time.perf_counter() + self.time_limit
+        iterations = 0
+        while iterations < 200000:
+            iterations += 1
+            if not iterations % 256 and time.perf_counter() > deadline:
+                break
+
+            a = self.rng.choice(placed)
+            source = self.atom_table[a]
+            if self.rng.random() < 0.5:
+                # Przeniesienie atomu na inny stół z wolnym miejscem
+                target = self.rng.choice(tables)
+                if target == source or not self._fits(a, target):
+                    continue
+                before = self._local_cost([a], [source, target])
+                self._unplace(a)
+                self._place(a, target)
+                if self._local_cost([a], [source, target]) > before:
+                    self._unplace(a)
+                    self._place(a, source)
+            else:
+                # Zamiana dwóch atomów między stołami
+                b = self.rng.choice(placed)
+                target = self.atom_table[b]
+                if target == source:
+                    continue
+                size_a, size_b = len(self.atoms[a]), len(self.atoms[b])
+                if (self.load[source] - size_a + size_b > self.capacity[source]
+                        or self.load[target] - size_b + size_a > self.capacity[target]):
+                    continue
+                before = self._local_cost([a, b], [source, target])
+                self._unplace(a)
+                self._unplace(b)
+                self._place(a, target)
+                self._place(b, source)
+                if self._local_cost([a, b], [source, target]) > before:
+                    self._unplace(a)
+                    self._unplace(b)
+                    self._place(a, source)
+                    self._place(b, target)
+
+    # Krzesła --------------------------------------------------------------------
+
+    def _assign_chairs(self):
+        seated = {number: [] for number in self.capacity}
+        for guest_id, table_number in self.fixed.items():
+            seated[table_number].append(guest_id)
+        # Kolejność przy stole: rodzinami, a w atomie partner przed osobą towarzyszącą
+        for index in sorted(range(len(self.atoms)), key=lambda i: (self.family[self.atoms[i][0]], i)):
+            if self.atom_table[index] is not None:
+                seated[self.atom_table[index]].extend(self.atoms[index])
+        for guest_id in self.unplaced:
+            self.result[guest_id] = (None, None)
+
+        for table_number, members in seated.items():
+            capacity = self.capacity[table_number]
+            chairs = {}
+            taken = set()
+
+            def keep(guest_id):
+                guest = self.by_id[guest_id]
+                chair = guest.chair_position
+                if guest.table_number == table_number and chair and 1 <= chair <= capacity and chair not in taken:
+                    chairs[guest_id] = chair
+                    taken.add(chair)
+
+            # Przypięci zawsze, a w trybie przyrostowym także pozostali, którzy nie zmienili stołu
+            for guest_id in members:
+                if guest_id in self.fixed:
+                    keep(guest_id)
+            if self.incremental:
+                for guest_id in members:
+                    if guest_id not in chairs:
+                        keep(guest_id)
+
+            cursor = 1
+            for guest_id in members:
+                if guest_id in chairs:
+                    continue
+                anchor = chairs.get(self.partner.get(guest_id))
+                if anchor is not None:
+                    chair = self._nearest_free(anchor, capacity, taken)
+                else:
+                    chair = self._nearest_free(cursor, capacity, taken, forward_only=True)
+                if chair is None:
+                    self.result[guest_id] = (None, None)
+                    continue
+                chairs[guest_id] = chair
+                taken.add(chair)
+                cursor = chair % capacity + 1
+
+            for guest_id, chair in chairs.items():
+                self.result[guest_id] = (table_number, chair)
+        return self.result
+
+    @staticmethod
+    def _nearest_free(start, capacity, taken, forward_only=False):
+        """Najbliższe wolne krzesło licząc po okręgu stołu (krzesło N sąsiaduje z 1)"""
+        for distance in range(capacity):
+            offsets = (distance,) if forward_only or distance == 0 else (distance, -distance)
+            for offset in offsets:
+                chair = (start - 1 + offset) % capacity + 1
+                if chair not in taken:
+                    return chair
+        return None
+
+
+def solve_seating(movable_ids=None, incremental=False, time_limit=DEFAULT_TIME_LIMIT, seed=0, dry_run=False):
+    """Liczy rozsadzenie i zapisuje zmiany jednym zbiorczym zapisem.
+
+    Zwraca (lista zmian [(gość, (stół, krzesło) przed, po)], goście bez miejsca).
+    """
+    guests = list(Guest.objects.select_related('user'))
+    tables = list(Table.objects.all())
+    solver = SeatingSolver(guests, tables, movable_ids=movable_ids, incremental=incremental,
+                           time_limit=time_limit, seed=seed)
+    result = solver.solve()
+
+    by_id = {guest.id: guest for guest in guests}
+    changes = [
+        (by_id[guest_id], (by_id[guest_id].table_number, by_id[guest_id].chair_position), seat)
+        for guest_id, seat in result.items()
+        if (by_id[guest_id].table_number, by_id[guest_id].chair_position) != seat
+    ]
+    unplaced = [by_id[guest_id] for guest_id in solver.unplaced]
+
+    if changes and not dry_run:
+        moves = [(guest.id, table, chair, True) for guest, _before, (table, chair) in changes]
+        # Wersje z chwili odczytu - równoległa edycja na mapie przerwie zapis zamiast zostać nadpisana
+        apply_chair_moves(moves, versions={table.number: table.version for table in tables})
+    return changes, unplaced
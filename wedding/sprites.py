@@ -0,0 +1,111 @@
+"""Arkusze miniatur (sprite sheets) dla listy zdjęć w adminie.
+
+Zamiast osobnego obrazka 800x800 dla każdego wiersza listy składamy małe
+podglądy całej strony w jeden plik WebP, a wiersze pokazują swój fragment
+przez background-position. Adres arkusza zawiera skrót z id i nazw plików
+zdjęć strony - ta sama strona dostaje ten sam adres (przeglądarka trzyma go
+w cache na stałe), a zmiana zdjęć na stronie daje nowy adres.
+
+Arkusz generujemy dopiero przy pierwszym pobraniu adresu i trzymamy w cache.
+"""
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+SPRITE_TILE = 60            # rozmiar podglądu na liście (px CSS)
+SPRITE_SCALE = 2            # rysujemy w 2x dla ekranów o dużej gęstości pikseli
+SPRITE_COLUMNS = 10
+SPRITE_QUALITY = 75
+SPRITE_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+MAX_SPRITE_PHOTOS = 200     # strona listy ma 100 wierszy, zapas na "pokaż wszystkie" małych list
+SOURCE_WORKERS = 8
+PLACEHOLDER_COLOR = (237, 232, 221)
+
+
+def sprite_key(photos):
+    # Kolejność ma znaczenie - od niej zależy położenie kafelków
+    signature = '|'.join(f'{photo.id}:{photo.image.name}' for photo in photos)
+    return hashlib.sha1(signature.encode()).hexdigest()[:20]
+
+
+def sprite_url(photos):
+    key = sprite_key(photos)
+    ids = ','.join(str(photo.id) for photo in photos)
+    return f"{reverse('admin:wedding_photo_sprite', args=[key])}?ids={ids}"
+
+
+def assign_sprite_tiles(photos):
+    """Dopisuje każdemu zdjęciu photo.sprite_tile = (adres arkusza, x, y, szerokość, wysokość arkusza)"""
+    photos = [photo for photo in photos if photo.image][:MAX_SPRITE_PHOTOS]
+    if not photos:
+        return
+    url = sprite_url(photos)
+    columns = min(len(photos), SPRITE_COLUMNS)
+    rows = (len(photos) + SPRITE_COLUMNS - 1) // SPRITE_COLUMNS
+    for index, photo in enumerate(photos):
+        photo.sprite_tile = (
+            url,
+            -(index % SPRITE_COLUMNS) * SPRITE_TILE,
+            -(index // SPRITE_COLUMNS) * SPRITE_TILE,
+            columns * SPRITE_TILE,
+            rows * SPRITE_TILE,
+        )
+
+
+def load_tile(photo):
+    """Kwadratowy podgląd zdjęcia w rozmiarze kafelka albo None, gdy nie da się go wczytać"""
+    size = SPRITE_TILE * SPRITE_SCALE
+    try:
+        if getattr(settings, 'USE_CLOUDINARY', False):
+            import requests
+
+            # Cloudinary od razu przycina i zmniejsza - pobieramy kilka KB zamiast całego zdjęcia
+            url = photo.get_cloudinary_url(width=size, height=size, crop='fill', quality='auto', format='jpg')
+            response = requests.get(url, timeout=10)
+            response.raise_for_status()
+            image = Image.open(BytesIO(response.content))
+        else:
+            image = Image.open(photo.image.path)
+            image.draft('RGB', (size, size))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        return ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+    except Exception as e:
+        print(f"Nie udało się wczytać podglądu zdjęcia {photo.id}: {e}")
+        return None
+
+
+def render_sprite(photos):
+    size = SPRITE_TILE * SPRITE_SCALE
+    columns = min(len(photos), SPRITE_COLUMNS)
+    rows = (len(photos) + SPRITE_COLUMNS - 1) // SPRITE_COLUMNS
+    sheet = Image.new('RGB', (columns * size, rows * size), PLACEHOLDER_COLOR)
+
+    # Wczytywanie to głównie czekanie na dysk albo sieć (Cloudinary) - wystarczą wątki
+    with ThreadPoolExecutor(max_workers=SOURCE_WORKERS) as executor:
+        for index, tile in enumerate(executor.map(load_tile, photos)):
+            if tile is not None:
+                sheet.paste(tile, ((index % SPRITE_COLUMNS) * size, (index // SPRITE_COLUMNS) * size))
+
+    buffer = BytesIO()
+    sheet.save(buffer, 'WEBP', quality=SPRITE_QUALITY, method=4)
+    return buffer.getvalue()
+
+
+def sprite_sheet(photo_ids):
+    """(klucz, bajty WebP) arkusza dla zdjęć w podanej kolejności - z cache albo generowany"""
+    from .models import Photo
+
+    by_id = Photo.objects.only('id', 'image').in_bulk(photo_ids[:MAX_SPRITE_PHOTOS])
+    photos = [by_id[photo_id] for photo_id in photo_ids[:MAX_SPRITE_PHOTOS] if photo_id in by_id]
+    key = sprite_key(photos)
+    cache_key = f'photo_sprite:{key}'
+    body = cache.get(cache_key)
+    if body is None:
+        body = render_sprite(photos) if photos else b''
+        cache.set(cache_key, body, SPRITE_CACHE_TIMEOUT)
+    return key, body
@@ -0,0 +1,14 @@
+from django.contrib.staticfiles.storage import StaticFilesStorage
+
+from .precache import PRECACHE_MANIFEST_NAME, write_precache_manifest
+
+
+class PrecacheStaticFilesStorage(StaticFilesStorage):
+    """Po collectstatic zapisuje manifest plików do precache dla service workera"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            return
+        # paths: {ścieżka docelowa: (storage źródłowy, ścieżka źródłowa)}
+        write_precache_manifest(self, [(path, self) for path in paths])
+        yield PRECACHE_MANIFEST_NAME, PRECACHE_MANIFEST_NAME, True
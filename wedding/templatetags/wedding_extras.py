@@ -3,6 +3,7 @@ from django.utils.safestring import mark_safe
 from django.core.serializers.json import DjangoJSONEncoder
 import json
 import re
+import uuid
 
 register = template.Library()
 
@@ -56,10 +57,13 @@ def table_occupancy(table_number):
 
 @register.inclusion_tag('wedding/includes/photo_grid.html')
 def photo_grid(photos, cols=3):
-    """Render photo grid"""
+    """Render photo grid (strona musi dołączyć includes/lightbox.html)"""
+    photos = list(photos)
     return {
         'photos': photos,
-        'cols': cols
+        'cols': cols,
+        'lightbox_id': f'photo-grid-{uuid.uuid4().hex[:8]}',
+        'lightbox_photos': [photo.as_payload(placeholder=False) for photo in photos],
     }
 
 @register.inclusion_tag('wedding/includes/table_map.html')
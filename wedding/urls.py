@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import views, api_views
 
 app_name = 'wedding'
 
@@ -9,8 +9,10 @@ urlpatterns = [
     
     # Główne strony aplikacji
     path('', views.home, name='home'),
+    path('sw.js', views.service_worker, name='service_worker'),
     path('upload/', views.upload_photo, name='upload'),
     path('gallery/', views.gallery, name='gallery'),
+    path('gallery/download/', views.download_album, name='download_album'),
     path('table-finder/', views.table_finder, name='table_finder'),
     path('debug-data/', views.debug_data, name='debug_data'),  # Debug view for data inspection
     path('schedule/', views.schedule, name='schedule'),
@@ -19,9 +21,24 @@ urlpatterns = [
     # AJAX endpoints
     path('ajax/table-search/', views.ajax_table_search, name='ajax_table_search'),
     path('ajax/update-chair-position/', views.ajax_update_chair_position, name='ajax_update_chair_position'),
+    path('ajax/update-chair-positions/', views.ajax_update_chair_positions, name='ajax_update_chair_positions'),
+    
+    # Zdjęcia galerii (numery stron albo ?sort=taken z kursorem)
+    path('api/photos/', api_views.api_photos, name='api_photos'),
+    
+    # Live feed zdjęć (SSE + polling fallback)
+    path('api/photos/stream/', api_views.api_photo_stream, name='api_photo_stream'),
+    path('api/photos/events/', api_views.api_photo_events, name='api_photo_events'),
+    path('api/seating-plan/', api_views.api_seating_plan, name='api_seating_plan'),
+    path('api/guest-directory/', api_views.api_guest_directory, name='api_guest_directory'),
+    path('api/guest-directory/version/', api_views.api_guest_directory_version, name='api_guest_directory_version'),
+    path('api/cloudinary/notifications/', api_views.api_cloudinary_notification, name='api_cloudinary_notification'),
     
     # Admin utilities (dla organizatorów)
     path('admin-tools/qr-generator/', views.generate_qr_code, name='qr_generator'),
+    path('admin-tools/moderation/', views.moderation_queue, name='moderation_queue'),
+    path('admin-tools/moderation/queue/', api_views.api_moderation_queue, name='api_moderation_queue'),
+    path('admin-tools/moderation/decisions/', api_views.api_moderation_decisions, name='api_moderation_decisions'),
 ]
 
 # Usuwamy:
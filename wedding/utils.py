@@ -1,8 +1,8 @@
 import os
-from PIL import Image, ImageOps
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
 from io import BytesIO
+from .imaging import load_downscaled, save_downscaled
 
 def create_thumbnail(image_field, size=(300, 300)):
     """Create thumbnail for uploaded image"""
@@ -10,18 +10,8 @@ def create_thumbnail(image_field, size=(300, 300)):
         return None
     
     try:
-        # Open the image
-        image = Image.open(image_field)
-        
-        # Fix orientation based on EXIF data
-        image = ImageOps.exif_transpose(image)
-        
-        # Convert to RGB if necessary
-        if image.mode in ("RGBA", "P"):
-            image = image.convert("RGB")
-        
-        # Create thumbnail
-        image.thumbnail(size, Image.Resampling.LANCZOS)
+        # Decoded straight at the nearest JPEG scale, EXIF orientation applied, converted to RGB
+        image = load_downscaled(image_field, size)
         
         # Save to BytesIO
         thumb_io = BytesIO()
@@ -46,21 +36,11 @@ def resize_image(image_field, max_size=(1200, 1200)):
         return
     
     try:
-        # Open the image
-        image = Image.open(image_field.path)
-        
-        # Fix orientation
-        image = ImageOps.exif_transpose(image)
-        
-        # Check if resize is needed
-        if image.height > max_size[1] or image.width > max_size[0]:
-            # Resize maintaining aspect ratio
-            image.thumbnail(max_size, Image.Resampling.LANCZOS)
-            
-            # Save back to the same file
-            if image.mode in ("RGBA", "P"):
-                image = image.convert("RGB")
-            
-            image.save(image_field.path, 'JPEG', quality=90)
+        # Only images larger than max_size are decoded and rewritten (with EXIF orientation applied)
+        save_downscaled(image_field.path, image_field.path, max_size, quality=90, format='JPEG', mode='RGB', only_if_larger=True)
     except Exception as e:
-        print(f"Error resizing image: {e}")
\ No newline at end of file
+        print(f"Error resizing image: {e}")
+
+def optimize_local_image(path, max_size=(2400, 2400), quality=95):
+    """Zmniejsza zapisane lokalnie zdjęcie, jeśli przekracza max_size (używane w Photo.save)"""
+    return save_downscaled(path, path, max_size, quality=quality, only_if_larger=True, optimize=True)
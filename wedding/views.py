@@ -3,21 +3,29 @@ from django.contrib import messages
 from django.db.models import Q, Case, When, IntegerField
 from django.db.models.functions import Concat
 from django.db.models import Value
-from django.http import JsonResponse, HttpResponse
+from django.http import FileResponse, JsonResponse, HttpResponse, StreamingHttpResponse
 from django.core.paginator import Paginator
 from django.views.decorators.http import require_http_methods
-from django.views.decorators.csrf import csrf_exempt
 from django.core.serializers.json import DjangoJSONEncoder
 from django.conf import settings
 from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.staticfiles import finders
 import json
 import os
 import re
+import uuid
 import qrcode
 from io import BytesIO
 import base64
 from .models import WeddingInfo, Photo, Guest, Table, ScheduleEvent, MenuItem
 from .forms import MultiPhotoUploadForm, TableSearchForm
+from .album import album_photos, album_version, archive_name, cached_archive, stream_and_cache
+from .duplicates import check_duplicate
+from .exif import CursorError, capture_cursor, capture_page
+from .live_feed import latest_event_id
+from .moderation import pending_photos, queue_page
+from .precache import load_precache_manifest
+from .seating import SeatingConflict, SeatingError, apply_chair_moves, parse_moves, parse_versions
 
 def home(request):
     try:
@@ -25,13 +33,18 @@ def home(request):
     except WeddingInfo.DoesNotExist:
         wedding_info = None
     
-    featured_photos = Photo.objects.filter(approved=True, featured=True)[:4]
-    recent_photos = Photo.objects.filter(approved=True).order_by('-upload_date')[:8]
+    photos = Photo.objects.filter(approved=True).select_related('uploaded_by')
+    featured_photos = list(photos.filter(featured=True)[:4])
+    recent_photos = list(photos.order_by('-upload_date')[:8])
     
     context = {
         'wedding_info': wedding_info,
         'featured_photos': featured_photos,
         'recent_photos': recent_photos,
+        # Dane dla wspólnego lightboxa - pełne zdjęcie pobiera się dopiero po otwarciu
+        'featured_lightbox': [photo.as_payload(placeholder=False) for photo in featured_photos],
+        'recent_lightbox': [photo.as_payload(placeholder=False) for photo in recent_photos],
+        'last_photo_event_id': latest_event_id(),
     }
     return render(request, 'wedding/home.html', context)
 
@@ -46,9 +59,16 @@ def upload_photo(request):
             description = form.cleaned_data.get('description', '').strip()
             
             uploaded_count = 0
+            rejected_duplicates = 0
+            batch_id = uuid.uuid4()
             
             for uploaded_file in files:
                 try:
+                    perceptual_hash, duplicate_of_id = check_duplicate(uploaded_file)
+                    if duplicate_of_id and settings.PHOTO_DUPLICATE_ACTION == 'reject':
+                        rejected_duplicates += 1
+                        continue
+                    
                     # Automatyczne generowanie tytułu z nazwy pliku
                     title = generate_title_from_filename(uploaded_file.name)
                     
@@ -59,8 +79,13 @@ def upload_photo(request):
                         image=uploaded_file,
                         category=category,
                         uploader_name=uploader_name,
-                        uploaded_by=request.user if request.user.is_authenticated else None
+                        uploaded_by=request.user if request.user.is_authenticated else None,
+                        perceptual_hash=perceptual_hash,
+                        duplicate_of_id=duplicate_of_id,
+                        batch_id=batch_id
                     )
+                    # Zmniejszone w przeglądarce (wymiary sprawdził formularz) - bez ponownego zmniejszania
+                    photo.presized = getattr(uploaded_file, 'presized', False)
                     photo.save()
                     uploaded_count += 1
                     
@@ -68,19 +93,26 @@ def upload_photo(request):
                     print(f"Błąd przy zapisywaniu {uploaded_file.name}: {e}")
                     continue
             
+            if rejected_duplicates:
+                messages.info(request, f'Pominięto {rejected_duplicates} zdjęć, które zostały już wcześniej przesłane.')
+            
             if uploaded_count > 0:
                 if uploaded_count == 1:
                     messages.success(request, 'Zdjęcie zostało przesłane! Czeka na zatwierdzenie.')
                 else:
                     messages.success(request, f'Przesłano {uploaded_count} zdjęć! Czekają na zatwierdzenie.')
-            else:
+            elif not rejected_duplicates:
                 messages.error(request, 'Nie udało się przesłać żadnego zdjęcia. Spróbuj ponownie.')
                 
             return redirect('wedding:gallery')
     else:
         form = MultiPhotoUploadForm()
     
-    return render(request, 'wedding/upload.html', {'form': form})
+    return render(request, 'wedding/upload.html', {
+        'form': form,
+        'photo_max_dimension': settings.PHOTO_MAX_DIMENSION,
+        'photo_upload_quality': settings.PHOTO_UPLOAD_QUALITY,
+    })
 
 def generate_title_from_filename(filename):
     """Generuje ładny tytuł z nazwy pliku"""
@@ -104,27 +136,138 @@ def generate_title_from_filename(filename):
     else:
         return "Zdjęcie z wesela"
 
+def search_guests(query):
+    """Wyszukuje gości po imieniu, nazwisku, pełnym imieniu i nazwisku lub loginie"""
+    return Guest.objects.annotate(
+        full_name_concat=Concat('user__first_name', Value(' '), 'user__last_name')
+    ).filter(
+        # Szuka po połączeniu imienia i nazwiska (główne kryterium)
+        Q(full_name_concat__icontains=query) |
+        # Lub po imieniu jeśli wpisano tylko imię
+        Q(user__first_name__icontains=query) |
+        # Lub po nazwisku jeśli wpisano tylko nazwisko
+        Q(user__last_name__icontains=query) |
+        # Lub po username jako fallback
+        Q(user__username__icontains=query)
+    ).select_related('user')
+
+def build_tables_data():
+    """Zwraca stoły (z listą gości dla szablonu) oraz dane planu sali dla JavaScript"""
+    tables = list(Table.objects.all().order_by('number'))
+    
+    tables_data = []
+    for table in tables:
+        guest_list = Guest.objects.filter(
+            table_number=table.number
+        ).select_related('user').order_by('user__first_name')
+        
+        table.guest_list = guest_list  # For template rendering
+        
+        # Prepare JSON-serializable data for JavaScript
+        guests_json = []
+        for guest in guest_list:
+            guests_json.append({
+                'id': guest.id,
+                'full_name': guest.full_name,
+                'guest_type': guest.guest_type or 'Gość',
+                'chair_position': guest.chair_position,
+                'user': {
+                    'first_name': guest.user.first_name,
+                    'last_name': guest.user.last_name
+                }
+            })
+        
+        # Create table data with positioning info
+        tables_data.append({
+            'number': table.number,
+            'name': table.name,
+            'description': table.description,
+            'capacity': table.capacity,
+            'version': table.version,
+            'guests_count': guest_list.count(),
+            'guest_list': guests_json,
+            # Positioning data from database (with fallbacks)
+            'map_x': float(table.map_x) if table.map_x else 300.0,
+            'map_y': float(table.map_y) if table.map_y else 300.0,
+            'map_width': float(table.map_width) if table.map_width else 85.0,
+            'map_height': float(table.map_height) if table.map_height else 85.0,
+            'shape': table.shape or 'circular',
+            'color': table.color or '#d4c4a8',
+            'border_color': table.border_color or '#b8a082',
+        })
+    
+    return tables, tables_data
+
 def gallery(request):
     category = request.GET.get('category', '')
-    photos_list = Photo.objects.filter(approved=True)
+    # 'taken' - chronologicznie według czasu zrobienia (EXIF), domyślnie najnowsze przesłane
+    sort = request.GET.get('sort', '')
+    if sort != 'taken':
+        sort = ''
+    photos_list = Photo.objects.filter(approved=True).select_related('uploaded_by')
     
     if category:
         photos_list = photos_list.filter(category=category)
     
-    paginator = Paginator(photos_list, 12)
-    page_number = request.GET.get('page')
-    photos = paginator.get_page(page_number)
+    next_cursor = ''
+    if sort == 'taken':
+        # Strony po kluczu (captured_at, id) - bez OFFSET i bez przesunięć, gdy dochodzą nowe zdjęcia
+        try:
+            photos, next_cursor = capture_page(photos_list, request.GET.get('after', ''))
+        except CursorError:
+            photos, next_cursor = capture_page(photos_list)
+    else:
+        paginator = Paginator(photos_list, 12)
+        page_number = request.GET.get('page')
+        photos = paginator.get_page(page_number)
     
     categories = Photo.CATEGORY_CHOICES
+    is_continuation = bool(sort and request.GET.get('after'))
     
     context = {
         'photos': photos,
         'categories': categories,
         'current_category': category,
+        'current_sort': sort,
+        'next_cursor': next_cursor,
+        # Lightbox cofa się przed pierwsze zdjęcie strony od jego kursora (?order=desc w API)
+        'previous_cursor': capture_cursor(photos[0]) if is_continuation and photos else '',
+        'is_continuation': is_continuation,
+        'lightbox_photos': [photo.as_payload(placeholder=False) for photo in photos],
         'total_photos': photos_list.count(),
+        'last_photo_event_id': latest_event_id(),
     }
     return render(request, 'wedding/gallery.html', context)
 
+@require_http_methods(["GET"])
+def download_album(request):
+    """ZIP ze wszystkimi zatwierdzonymi zdjęciami (opcjonalnie ?category= i ?uploader=)
+    
+    Pierwsze pobranie danej wersji albumu idzie strumieniowo prosto ze storage, kolejne
+    dostają gotowy plik z dysku - do czasu zatwierdzenia lub usunięcia któregoś zdjęcia.
+    """
+    category = request.GET.get('category', '')
+    if category not in dict(Photo.CATEGORY_CHOICES):
+        category = ''
+    uploader = request.GET.get('uploader', '').strip()
+    
+    photos = album_photos(category, uploader)
+    if not photos.exists():
+        messages.info(request, 'Brak zatwierdzonych zdjęć do pobrania.')
+        return redirect('wedding:gallery')
+    
+    name = archive_name(category, uploader, album_version(photos))
+    filename = f"album-weselny{'-' + category if category else ''}.zip"
+    path = cached_archive(name)
+    if path:
+        response = FileResponse(open(path, 'rb'), as_attachment=True, filename=filename, content_type='application/zip')
+    else:
+        response = StreamingHttpResponse(stream_and_cache(photos, name), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Cache-Control'] = 'private, no-store'
+    response['X-Accel-Buffering'] = 'no'  # nginx nie buforuje całego archiwum przed wysłaniem
+    return response
+
 def table_finder(request):
     """Naprawione wyszukiwanie stolika"""
     print("=== DEBUG TABLE FINDER START ===")
@@ -142,14 +285,7 @@ def table_finder(request):
             
             if query:
                 # Ulepszone wyszukiwanie - obsługuje pełne imię i nazwisko
-                guests = Guest.objects.annotate(
-                    full_name_concat=Concat('user__first_name', Value(' '), 'user__last_name')
-                ).filter(
-                    Q(user__first_name__icontains=query) |
-                    Q(user__last_name__icontains=query) |
-                    Q(user__username__icontains=query) |
-                    Q(full_name_concat__icontains=query)  # Wyszukiwanie po pełnym imieniu i nazwisku
-                ).select_related('user')
+                guests = search_guests(query)
                 
                 print(f"Znaleziono {guests.count()} gości")
                 
@@ -168,55 +304,7 @@ def table_finder(request):
                             table_info = None
                             print(f"Stół {guest_info.table_number} nie istnieje w bazie")
     
-    # Get all tables with their guests for the seating plan
-    tables = Table.objects.all().order_by('number')
-    print(f"Found {tables.count()} tables in database")
-    
-    # Prepare tables data for JavaScript
-    tables_data = []
-    for table in tables:
-        guest_list = Guest.objects.filter(
-            table_number=table.number
-        ).select_related('user').order_by('user__first_name')
-        
-        table.guest_list = guest_list  # For template rendering
-        
-        print(f"Processing table {table.number}: {guest_list.count()} guests")
-        
-        # Prepare JSON-serializable data for JavaScript
-        guests_json = []
-        for guest in guest_list:
-            guests_json.append({
-                'id': guest.id,
-                'full_name': guest.full_name,
-                'guest_type': guest.guest_type or 'Gość',
-                'chair_position': guest.chair_position,
-                'user': {
-                    'first_name': guest.user.first_name,
-                    'last_name': guest.user.last_name
-                }
-            })
-        
-        # Create table data with positioning info
-        table_dict = {
-            'number': table.number,
-            'name': table.name,
-            'description': table.description,
-            'capacity': table.capacity,
-            'guests_count': guest_list.count(),
-            'guest_list': guests_json,
-            # Positioning data from database (with fallbacks)
-            'map_x': float(table.map_x) if hasattr(table, 'map_x') and table.map_x else 300.0,
-            'map_y': float(table.map_y) if hasattr(table, 'map_y') and table.map_y else 300.0,
-            'map_width': float(table.map_width) if hasattr(table, 'map_width') and table.map_width else 85.0,
-            'map_height': float(table.map_height) if hasattr(table, 'map_height') and table.map_height else 85.0,
-            'shape': getattr(table, 'shape', 'circular'),
-            'color': getattr(table, 'color', '#d4c4a8'),
-            'border_color': getattr(table, 'border_color', '#b8a082'),
-        }
-        
-        tables_data.append(table_dict)
-        print(f"Table {table.number} data: x={table_dict['map_x']}, y={table_dict['map_y']}, shape={table_dict['shape']}")
+    # Plan sali (stoły z gośćmi) pobiera JS z api_seating_plan - strona niesie tylko wynik wyszukiwania
     
     # Prepare current guest info for JavaScript
     guest_info_json = None
@@ -231,13 +319,10 @@ def table_finder(request):
     
     # Convert to JSON strings
     try:
-        tables_json_str = json.dumps(tables_data, cls=DjangoJSONEncoder)
         guest_info_json_str = json.dumps(guest_info_json, cls=DjangoJSONEncoder)
-        print(f"Tables JSON length: {len(tables_json_str)}")
         print(f"Guest info JSON: {guest_info_json_str}")
     except Exception as e:
         print(f"JSON serialization error: {e}")
-        tables_json_str = "[]"
         guest_info_json_str = "null"
     
     context = {
@@ -245,8 +330,6 @@ def table_finder(request):
         'guest_info': guest_info,
         'table_info': table_info,
         'table_guests': table_guests,
-        'tables': tables,
-        'tables_json': tables_json_str,
         'guest_info_json': guest_info_json_str,
     }
     
@@ -279,18 +362,7 @@ def ajax_table_search(request):
     
     if len(query) >= 2:
         # Lepsze wyszukiwanie - szuka pełnego imienia i nazwiska
-        guests = Guest.objects.annotate(
-            full_name_concat=Concat('user__first_name', Value(' '), 'user__last_name')
-        ).filter(
-            # Szuka po połączeniu imienia i nazwiska (główne kryterium)
-            Q(full_name_concat__icontains=query) |
-            # Lub po imieniu jeśli wpisano tylko imię
-            Q(user__first_name__icontains=query) |
-            # Lub po nazwisku jeśli wpisano tylko nazwisko
-            Q(user__last_name__icontains=query) |
-            # Lub po username jako fallback
-            Q(user__username__icontains=query)
-        ).select_related('user')
+        guests = search_guests(query)
         
         print(f"AJAX found {guests.count()} guests")
         
@@ -338,6 +410,15 @@ def ajax_table_search(request):
     return JsonResponse(results)
 
 
+@staff_member_required
+def moderation_queue(request):
+    """Kolejka moderacji z klawiatury - siatka oczekujących zdjęć, decyzje wysyłane paczkami"""
+    return render(request, 'wedding/moderation.html', {
+        'queue': queue_page(),
+        'pending_count': pending_photos().count(),
+    })
+
+
 @staff_member_required
 def generate_qr_code(request):
     """Generuje QR kod dla dostępu do aplikacji weselnej"""
@@ -542,10 +623,9 @@ def generate_qr_code(request):
     
     return HttpResponse(html_content)
 
-@csrf_exempt
 @require_http_methods(["POST"])
 def ajax_update_chair_position(request):
-    """Aktualizacja pozycji krzesła gościa przy stole"""
+    """Aktualizacja pozycji krzesła gościa przy stole (pojedynczy gość, bez kontroli wersji)"""
     try:
         data = json.loads(request.body)
         guest_id = data.get('guest_id')
@@ -558,8 +638,8 @@ def ajax_update_chair_position(request):
             })
         
         guest = get_object_or_404(Guest, id=guest_id)
-        guest.chair_position = chair_position
-        guest.save()
+        moves = parse_moves([{'guest_id': guest.id, 'chair_position': chair_position}])
+        apply_chair_moves(moves)
         
         return JsonResponse({
             'success': True,
@@ -571,60 +651,51 @@ def ajax_update_chair_position(request):
             'success': False,
             'message': 'Nieprawidłowe dane JSON'
         })
+    except (SeatingError, SeatingConflict) as e:
+        return JsonResponse({
+            'success': False,
+            'message': str(e)
+        })
     except Exception as e:
         return JsonResponse({
             'success': False,
             'message': f'Błąd: {str(e)}'
         })
 
-def debug_data(request):
-    """Debug view to inspect data being passed to JavaScript"""
-    # Reuse the same logic as table_finder but render debug template
-    tables = Table.objects.all().order_by('number')
-    print(f"Found {tables.count()} tables in database")
+@require_http_methods(["POST"])
+def ajax_update_chair_positions(request):
+    """Zbiorcza zmiana miejsc - wszystkie przesunięcia w jednej transakcji z kontrolą wersji stołów
     
-    tables_data = []
-    for table in tables:
-        guest_list = Guest.objects.filter(
-            table_number=table.number
-        ).select_related('user').order_by('user__first_name')
-        
-        print(f"Processing table {table.number}: {guest_list.count()} guests")
-        
-        # Prepare JSON-serializable data for JavaScript
-        guests_json = []
-        for guest in guest_list:
-            guests_json.append({
-                'id': guest.id,
-                'full_name': guest.full_name,
-                'guest_type': guest.guest_type or 'Gość',
-                'chair_position': guest.chair_position,
-                'user': {
-                    'first_name': guest.user.first_name,
-                    'last_name': guest.user.last_name
-                }
-            })
+    Oczekuje JSON: {"moves": [{"guest_id", "chair_position", "table_number"?}], "versions": {"<stół>": wersja}}
+    """
+    try:
+        data = json.loads(request.body)
+        moves = parse_moves(data.get('moves'))
+        versions = parse_versions(data.get('versions'))
+        if versions is None:
+            raise SeatingError('Brak wersji stołów')
         
-        # Create table data with positioning info
-        table_dict = {
-            'number': table.number,
-            'name': table.name,
-            'description': table.description,
-            'capacity': table.capacity,
-            'guests_count': guest_list.count(),
-            'guest_list': guests_json,
-            # Positioning data from database (with fallbacks)
-            'map_x': float(table.map_x) if hasattr(table, 'map_x') and table.map_x else 300.0,
-            'map_y': float(table.map_y) if hasattr(table, 'map_y') and table.map_y else 300.0,
-            'map_width': float(table.map_width) if hasattr(table, 'map_width') and table.map_width else 85.0,
-            'map_height': float(table.map_height) if hasattr(table, 'map_height') and table.map_height else 85.0,
-            'shape': getattr(table, 'shape', 'circular'),
-            'color': getattr(table, 'color', '#d4c4a8'),
-            'border_color': getattr(table, 'border_color', '#b8a082'),
-        }
+        new_versions = apply_chair_moves(moves, versions)
         
-        tables_data.append(table_dict)
-        print(f"Table {table.number} has {len(guests_json)} guests in JSON data")
+        return JsonResponse({
+            'success': True,
+            'message': f'Zapisano {len(moves)} zmian miejsc',
+            'versions': new_versions,
+        })
+    
+    except (json.JSONDecodeError, AttributeError):
+        return JsonResponse({'success': False, 'message': 'Nieprawidłowe dane JSON'}, status=400)
+    except SeatingError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    except SeatingConflict as e:
+        # Klient powinien pobrać aktualny układ i powtórzyć zmianę
+        return JsonResponse({'success': False, 'message': str(e), 'versions': e.versions}, status=409)
+
+def debug_data(request):
+    """Debug view to inspect data being passed to JavaScript"""
+    # Reuse the same logic as table_finder but render debug template
+    tables, tables_data = build_tables_data()
+    print(f"Found {len(tables)} tables in database")
     
     # Convert to JSON strings
     try:
@@ -656,4 +727,18 @@ def debug_token(request):
         'session_token': session_token,
         'session_verified': session_verified,
         'validation_result': token_from_url == expected_token if token_from_url else False
-    })
\ No newline at end of file
+    })
+
+
+def service_worker(request):
+    """Service worker z listą plików do precache - z głównej ścieżki, żeby obejmował całą aplikację"""
+    manifest = load_precache_manifest()
+    with open(finders.find('sw.js'), encoding='utf-8') as f:
+        source = f.read()
+    
+    body = f'self.PRECACHE_MANIFEST = {json.dumps(manifest)};\n\n{source}'
+    response = HttpResponse(body, content_type='application/javascript; charset=utf-8')
+    # Przeglądarka i tak sprawdza service workera przy nawigacji - nie może utknąć w cache HTTP
+    response['Cache-Control'] = 'no-cache'
+    response['Service-Worker-Allowed'] = '/'
+    return response
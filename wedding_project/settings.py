@@ -65,6 +65,7 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'wedding.middleware.WeddingAccessMiddleware',
     'wedding.middleware.WeddingSetupMiddleware',
+    'wedding.middleware.MessagesNoStoreMiddleware',
 ]
 
 ROOT_URLCONF = 'wedding_project.urls'
@@ -123,13 +124,15 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
+# collectstatic zapisuje przy okazji manifest plików dla service workera (precache-manifest.json)
+STATICFILES_STORAGE = 'wedding.storage.PrecacheStaticFilesStorage'
 
 # === MEDIA FILES CONFIGURATION ===
 USE_CLOUDINARY = config('USE_CLOUDINARY', default=False, cast=bool)
 
 if USE_CLOUDINARY:
-    # Production - Cloudinary Storage
-    DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
+    # Production - Cloudinary Storage (z wariantami zdjęć zamawianymi przy uploadzie)
+    DEFAULT_FILE_STORAGE = 'wedding.media_storage.EagerMediaCloudinaryStorage'
     
     CLOUDINARY_STORAGE = {
         'CLOUD_NAME': config('CLOUDINARY_CLOUD_NAME'),
@@ -264,6 +267,32 @@ FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024   # 50MB for multiple files
 FILE_UPLOAD_PERMISSIONS = 0o644
 
+# Zdjęcia gości: dłuższy bok po zmniejszeniu (w przeglądarce przed wysłaniem i na serwerze)
+# oraz jakość JPEG przy zmniejszaniu w przeglądarce (0-1)
+PHOTO_MAX_DIMENSION = config('PHOTO_MAX_DIMENSION', default=2400, cast=int)
+PHOTO_UPLOAD_QUALITY = config('PHOTO_UPLOAD_QUALITY', default=0.9, cast=float)
+
+# Przetwarzanie zdjęć na serwerze (wedding/imaging.py): limit pikseli sprawdzany przed dekodowaniem
+# i liczba procesów przy przetwarzaniu paczek zdjęć
+PHOTO_MAX_PIXELS = config('PHOTO_MAX_PIXELS', default=64_000_000, cast=int)
+PHOTO_PROCESS_WORKERS = config('PHOTO_PROCESS_WORKERS', default=4, cast=int)
+
+# Powtórzone zdjęcia: maksymalna odległość Hamminga dHash (0-64) i co zrobić z duplikatem -
+# 'flag' (zapisz i oznacz dla moderatora) albo 'reject' (nie zapisuj)
+PHOTO_DUPLICATE_DISTANCE = config('PHOTO_DUPLICATE_DISTANCE', default=6, cast=int)
+PHOTO_DUPLICATE_ACTION = config('PHOTO_DUPLICATE_ACTION', default='flag')
+
+# Adres webhooka, który Cloudinary woła po wygenerowaniu wariantów zdjęcia (pełny URL do
+# /api/cloudinary/notifications/); pusty - warianty i tak powstają, a flagę ustawia generate_renditions
+CLOUDINARY_EAGER_NOTIFICATION_URL = config('CLOUDINARY_EAGER_NOTIFICATION_URL', default='')
+
+# Bez Cloudinary warianty renderuje wątek w tle, po zapisaniu zdjęcia; True - w trakcie żądania
+# (testy, które od razu sprawdzają pliki wariantów)
+LOCAL_RENDITIONS_SYNC = config('LOCAL_RENDITIONS_SYNC', default=False, cast=bool)
+
+# Gotowe archiwa ZIP albumu do pobrania (lokalny dysk serwera, nie storage zdjęć)
+PHOTO_ARCHIVE_CACHE_DIR = config('PHOTO_ARCHIVE_CACHE_DIR', default=str(BASE_DIR / 'cache' / 'albums'))
+
 # Cache configuration (optional, for better performance)
 if not DEBUG:
     CACHES = {